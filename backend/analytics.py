@@ -0,0 +1,171 @@
+from dataclasses import dataclass
+from datetime import date
+from typing import List
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from models import DailySchedule
+from scheduling import circular_diff, time_to_minutes
+from utils import STATUS_CODES
+
+WEEKDAYS = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+DEFAULT_ON_TIME_MINUTES = 15
+
+
+@dataclass
+class HabitHistory:
+    """A user's scheduled history as parallel NumPy columns (one entry per daily_schedules row)."""
+    start: date
+    end: date
+    task_names: List[str]
+    task_idx: np.ndarray  # int, index into task_names
+    day: np.ndarray  # int, days since `start`
+    weekday: np.ndarray  # int, 0 = Monday
+    status: np.ndarray  # int, utils.STATUS_CODES
+    scheduled: np.ndarray  # float minutes of day (UTC)
+    goal: np.ndarray  # float minutes of day (UTC), NaN if no goal
+    actual: np.ndarray  # float minutes of day (UTC), NaN if not completed
+
+
+def load_history(db: Session, user_id: int, start: date, end: date) -> HabitHistory:
+    """One columns-only query over (user_id, log_date) turned straight into arrays; ad-hoc rows are skipped."""
+    rows = db.query(
+        DailySchedule.task_name,
+        DailySchedule.log_date,
+        DailySchedule.status,
+        DailySchedule.scheduled_time,
+        DailySchedule.goal_time,
+        DailySchedule.actual_completed_time
+    ).filter(
+        DailySchedule.user_id == user_id,
+        DailySchedule.log_date.between(start, end),
+        DailySchedule.scheduled_time.isnot(None)
+    ).all()
+
+    task_names, task_index = [], {}
+    columns = ([], [], [], [], [], [])
+    nan = float("nan")
+    for task_name, log_date, status, scheduled_time, goal_time, completed_at in rows:
+        if task_name not in task_index:
+            task_index[task_name] = len(task_names)
+            task_names.append(task_name)
+        columns[0].append(task_index[task_name])
+        columns[1].append(log_date.toordinal())
+        columns[2].append(STATUS_CODES.get(status, -1))
+        columns[3].append(time_to_minutes(scheduled_time))
+        columns[4].append(time_to_minutes(goal_time) if goal_time is not None else nan)
+        columns[5].append(time_to_minutes(completed_at) if completed_at is not None else nan)
+
+    ordinal = np.asarray(columns[1], dtype=np.int64)
+    return HabitHistory(
+        start=start,
+        end=end,
+        task_names=task_names,
+        task_idx=np.asarray(columns[0], dtype=np.int64),
+        day=ordinal - start.toordinal(),
+        weekday=(ordinal + 6) % 7,  # date.weekday() from the proleptic ordinal
+        status=np.asarray(columns[2], dtype=np.int64),
+        scheduled=np.asarray(columns[3], dtype=float),
+        goal=np.asarray(columns[4], dtype=float),
+        actual=np.asarray(columns[5], dtype=float)
+    )
+
+
+def _ratio(numerator, denominator):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(denominator > 0, numerator / np.maximum(denominator, 1), np.nan)
+
+
+def _streaks(task_idx: np.ndarray, day: np.ndarray, n_tasks: int, last_day: int):
+    """Longest & current run of consecutive completed days per habit (current = run ending on the last or previous day)."""
+    longest = np.zeros(n_tasks, dtype=np.int64)
+    current = np.zeros(n_tasks, dtype=np.int64)
+    if len(day) == 0:
+        return longest, current
+
+    order = np.lexsort((day, task_idx))
+    task_idx, day = task_idx[order], day[order]
+    keep = np.ones(len(day), dtype=bool)
+    keep[1:] = (task_idx[1:] != task_idx[:-1]) | (day[1:] != day[:-1])  # one completion per habit-day
+    task_idx, day = task_idx[keep], day[keep]
+
+    breaks = np.ones(len(day), dtype=bool)
+    breaks[1:] = (task_idx[1:] != task_idx[:-1]) | (day[1:] - day[:-1] != 1)
+    run_id = np.cumsum(breaks) - 1
+    run_length = np.bincount(run_id)
+    run_task = task_idx[breaks]
+    run_end = day[np.r_[np.flatnonzero(breaks)[1:] - 1, len(day) - 1]]
+
+    np.maximum.at(longest, run_task, run_length)
+    live = run_end >= last_day - 1
+    np.maximum.at(current, run_task[live], run_length[live])
+    return longest, current
+
+
+def compute_analytics(history: HabitHistory, on_time_minutes: float = DEFAULT_ON_TIME_MINUTES) -> dict:
+    """Per-habit on-time rate, drift from goal, streaks, weekday pattern & drift trend, all via grouped NumPy reductions."""
+    n = len(history.task_names)
+    t = history.task_idx
+    completed = history.status == STATUS_CODES["completed"]
+
+    scheduled_count = np.bincount(t, minlength=n)
+    completed_count = np.bincount(t, completed, minlength=n)
+
+    # ✅ Signed minutes late vs schedule / goal on the 24h circle (NaN where not completed or no goal)
+    lateness = circular_diff(history.actual, history.scheduled)
+    drift = circular_diff(history.actual, history.goal)
+    on_time = completed & (np.abs(lateness) <= on_time_minutes)
+    on_time_count = np.bincount(t, on_time, minlength=n)
+    has_drift = ~np.isnan(drift)
+    drift0 = np.where(has_drift, drift, 0.0)
+
+    drift_count = np.bincount(t, has_drift, minlength=n)
+    mean_drift = _ratio(np.bincount(t, drift0, minlength=n), drift_count)
+    mean_abs_drift = _ratio(np.bincount(t, np.abs(drift0), minlength=n), drift_count)
+
+    # ✅ Least-squares slope of drift over time (minutes per day); negative = closing in on the goal
+    x = np.where(has_drift, history.day, 0).astype(float)
+    sx, sy = np.bincount(t, x, minlength=n), np.bincount(t, drift0, minlength=n)
+    sxx, sxy = np.bincount(t, x * x, minlength=n), np.bincount(t, x * drift0, minlength=n)
+    trend = _ratio(drift_count * sxy - sx * sy, drift_count * sxx - sx * sx)
+
+    # ✅ Weekday pattern: completion rate & mean drift per (habit, weekday) cell
+    cell = t * 7 + history.weekday
+    weekday_total = np.bincount(cell, minlength=n * 7).reshape(n, 7)
+    weekday_completed = np.bincount(cell, completed, minlength=n * 7).reshape(n, 7)
+    weekday_drift = _ratio(np.bincount(cell, drift0, minlength=n * 7), np.bincount(cell, has_drift, minlength=n * 7)).reshape(n, 7)
+    weekday_rate = _ratio(weekday_completed, weekday_total)
+
+    longest, current = _streaks(t[completed], history.day[completed], n, (history.end - history.start).days)
+
+    def num(value, digits=1):
+        return None if np.isnan(value) else round(float(value), digits)
+
+    habits = []
+    for i, task_name in enumerate(history.task_names):
+        habits.append({
+            "task_name": task_name,
+            "scheduled": int(scheduled_count[i]),
+            "completed": int(completed_count[i]),
+            "completion_rate": num(_ratio(completed_count[i], scheduled_count[i]), 3),
+            "on_time_rate": num(_ratio(on_time_count[i], completed_count[i]), 3),
+            "mean_drift_minutes": num(mean_drift[i]),
+            "mean_abs_drift_minutes": num(mean_abs_drift[i]),
+            "drift_trend_minutes_per_day": num(trend[i], 3),
+            "current_streak": int(current[i]),
+            "longest_streak": int(longest[i]),
+            "weekday_completion_rate": {WEEKDAYS[d]: num(weekday_rate[i, d], 3) for d in range(7)},
+            "weekday_mean_drift_minutes": {WEEKDAYS[d]: num(weekday_drift[i, d]) for d in range(7)}
+        })
+
+    total, done = int(scheduled_count.sum()), int(completed_count.sum())
+    return {
+        "overall": {
+            "scheduled": total,
+            "completed": done,
+            "completion_rate": round(done / total, 3) if total else None,
+            "on_time_rate": round(int(on_time.sum()) / done, 3) if done else None
+        },
+        "habits": habits
+    }
@@ -1,40 +1,82 @@
+import anyio
+import codecs
 import os
-import redis
 import re
 import pytz
-from openai import OpenAI
+from contextlib import asynccontextmanager
 from datetime import datetime, time, date, timedelta
 from tzlocal import get_localzone  
 from typing import List, Union, Optional
 from dotenv import load_dotenv
 
-from fastapi import FastAPI, Depends, HTTPException, Request
-from fastapi_cache import FastAPICache
-from fastapi_cache.backends.redis import RedisBackend
-from fastapi_cache.decorator import cache
+from fastapi import FastAPI, Depends, HTTPException, Request, Response, WebSocket
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
 from passlib.context import CryptContext
+from sqlalchemy import text, func, case, select, insert, update, values, column, bindparam, literal
 from sqlalchemy.orm import Session
 
-from database import SessionLocal  # ✅ Centralized database connection
-from models import User, BaselineSchedule, DailySchedule, Task, HabitAdjustment, ScheduleAdjustment
-from apscheduler.schedulers.background import BackgroundScheduler
-from apscheduler.triggers.cron import CronTrigger
-
-# ✅ Load environment variables
+# ✅ Load environment variables (before local modules read their settings)
 load_dotenv()
-client = OpenAI()
-
-# Initialize FastAPI app
-app = FastAPI()
 
-# ✅ Redis Cache Setup
-try:
-    redis_client = redis.Redis(host="localhost", port=6379, db=0, socket_connect_timeout=5)
-    FastAPICache.init(RedisBackend(redis_client), prefix="gradually_ai")
-except redis.ConnectionError:
-    print("❌ Redis connection failed. Caching is disabled.")
-    redis_client = None
+import analytics
+import events
+import export
+import ingestion
+import llm
+import metrics
+import profiler
+import prompt
+import read_model
+import routing
+import schemas
+import sharding
+import suggestion_cache
+import warmer
+import wire
+import runtime
+import scheduling
+from database import SessionLocal, engine, replica_engines, open_read_session, mark_written  # ✅ Centralized database connection
+from models import User, BaselineSchedule, DailySchedule, Task, HabitAdjustment, ScheduleAdjustment
+from baseline import BaselineImporter, parse_clock, to_utc, sync_user_baseline
+from utils import STATUS_CODES, status_code, utc_offset_minutes
+
+# ✅ Lifespan: Redis cache & scheduler start with the server, never at import time
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await runtime.init_cache()
+    if runtime.SCHEDULER_ENABLED:
+        start_scheduler()
+    consumer = None
+    if ingestion.INGEST_MODE == "queue":
+        consumer = ingestion.IngestionConsumer()  # ✅ Write-behind task logging
+        consumer.start()
+    yield
+    if consumer is not None:
+        consumer.stop()
+    runtime.shutdown()  # ✅ Shutdown the scheduler when FastAPI stops
+
+# Initialize FastAPI app (typed response models; see schemas.default_response_class)
+_response_class = schemas.default_response_class()
+app = FastAPI(lifespan=lifespan, **({"default_response_class": _response_class} if _response_class else {}))
+
+# ✅ Metrics: per-route latency, per-request SQL usage & cache hit ratios
+for _engine in (engine, *replica_engines):
+    metrics.instrument_engine(_engine)
+app.add_middleware(metrics.MetricsMiddleware)
+
+# ✅ Opt-in SQL profiler (SQL_PROFILE=true) with N+1 detection
+for _engine in (engine, *replica_engines):
+    profiler.instrument_engine(_engine)
+app.add_middleware(profiler.SQLProfilerMiddleware)
+
+# ✅ Mobile payloads: opt-in compact format (Accept) & negotiated brotli/gzip (Accept-Encoding)
+app.add_middleware(wire.CompactFormatMiddleware)
+app.add_middleware(wire.CompressionMiddleware)
+
+# ✅ Users per chunk in the nightly schedule job (bounds memory for large populations)
+NIGHTLY_CHUNK_USERS = int(os.getenv("NIGHTLY_CHUNK_USERS", "2000"))
 
 # ✅ Password hashing
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -47,6 +89,60 @@ def get_db():
     finally:
         db.close()
 
+# ✅ Per-user Dependency: a session on the user's shard (sharding.py); 503 while their bucket is being moved
+def get_user_db(user_id: int):
+    db = sharding.open_session(user_id, write=True)
+    try:
+        yield db
+    finally:
+        db.close()
+
+# ✅ Read-only Dependency: a replica (READ_REPLICA_URLS), or the primary right after the user's own writes
+def get_read_db(user_id: int):
+    shard = sharding.shard_for(user_id)
+    if shard == 0:
+        db, target = open_read_session(user_id)
+    else:
+        db, target = sharding.sessions[shard](), "primary"  # replicas are configured for the catalog shard only
+    metrics.db_read_sessions_total.inc(target=target)
+    try:
+        yield db
+    finally:
+        db.close()
+
+@app.exception_handler(sharding.ShardMoving)
+async def shard_moving_handler(request: Request, exc: sharding.ShardMoving):
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": str(int(sharding.SHARD_MAP_TTL) + 1)})
+
+# ✅ Admin Dependency (admin endpoints stay disabled until ADMIN_TOKEN is set)
+def require_admin(request: Request):
+    admin_token = os.getenv("ADMIN_TOKEN")
+    if not admin_token:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled.")
+    if request.headers.get("X-Admin-Token") != admin_token:
+        raise HTTPException(status_code=403, detail="Invalid admin token.")
+
+def iter_body_lines(request: Request):
+    """Yields decoded lines (endings kept) from a streamed request body without buffering it whole.
+
+    For code running in a worker thread: each body chunk is awaited on the event loop.
+    """
+    chunks = request.stream()
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+    while True:
+        try:
+            chunk = anyio.from_thread.run(chunks.__anext__)
+        except StopAsyncIteration:
+            break
+        buffer += decoder.decode(chunk)
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            yield line + "\n"
+    buffer += decoder.decode(b"", final=True)
+    if buffer:
+        yield buffer
+
 # Define your request model above the endpoint function
 class RegisterUserRequest(BaseModel):
     username: str
@@ -84,39 +180,61 @@ class HabitUpdateRequest(BaseModel):
     habit: str  # ✅ Add the habit name
     status: str  # Either "accepted" or "rejected"
 
+class HabitBatchUpdateRequest(BaseModel):
+    responses: List[HabitUpdateRequest]
+
 # Function to add the next day's scheduled tasks
+@metrics.timed_job("add_next_day_tasks")
 def add_next_day_tasks():
-    db = SessionLocal()
-    tomorrow = (datetime.utcnow() + timedelta(days=1)).date()
-
-    # Get all distinct user task schedules
-    user_tasks = db.query(Task.user_id, Task.task_name, Task.scheduled_time, Task.goal_time).distinct().all()
+    """Copies each user's habits into tomorrow's tasks with one set-based INSERT ... SELECT.
 
-    for user_id, task_name, scheduled_time, goal_time in user_tasks:
-        existing_task = db.query(Task).filter(
-            Task.user_id == user_id,
-            Task.task_name == task_name,
-            Task.log_date == tomorrow
-        ).first()
+    The most recent row per (user_id, task_name) provides the schedule; habits that already
+    have a row for tomorrow are skipped by an anti-join, so nothing is loaded into Python.
+    Runs on every shard in parallel.
+    """
+    tomorrow = (datetime.utcnow() + timedelta(days=1)).date()
+    added = sum(sharding.fan_out(lambda db, shard: _add_next_day_tasks(db, tomorrow)))
+    print(f"✅ {added} tasks added for {tomorrow}")
+
+def _add_next_day_tasks(db: Session, tomorrow: date):
+    tasks = Task.__table__
+    tomorrow_tasks = tasks.alias("tomorrow_tasks")
+
+    latest_per_habit = select(func.max(tasks.c.id)).group_by(tasks.c.user_id, tasks.c.task_name)
+    already_scheduled = select(tomorrow_tasks.c.id).where(
+        tomorrow_tasks.c.user_id == tasks.c.user_id,
+        tomorrow_tasks.c.task_name == tasks.c.task_name,
+        tomorrow_tasks.c.log_date == tomorrow
+    ).exists()
+
+    new_tasks = select(
+        tasks.c.user_id,
+        tasks.c.task_name,
+        tasks.c.scheduled_time,
+        tasks.c.goal_time,
+        literal(False, tasks.c.completed.type),
+        literal(False, tasks.c.ad_hoc.type),
+        literal(tomorrow, tasks.c.log_date.type),
+        literal(datetime.utcnow(), tasks.c.created_at.type)
+    ).where(
+        tasks.c.id.in_(latest_per_habit),
+        ~already_scheduled
+    )
 
-        if not existing_task:
-            new_task = Task(
-                user_id=user_id,
-                task_name=task_name,
-                scheduled_time=scheduled_time,
-                goal_time=goal_time,
-                completed=False,
-                log_date=tomorrow,
-                created_at=datetime.utcnow()
+    with metrics.job_phase("add_next_day_tasks", "insert"):
+        result = db.execute(
+            insert(tasks).from_select(
+                ["user_id", "task_name", "scheduled_time", "goal_time", "completed", "ad_hoc", "log_date", "created_at"],
+                new_tasks
             )
-            db.add(new_task)
+        )
 
-    db.commit()
-    db.close()
-    print(f"✅ Tasks added for {tomorrow}")
+    with metrics.job_phase("add_next_day_tasks", "commit"):
+        db.commit()
+    return result.rowcount
 
 # Register User
-@app.post("/users/register")
+@app.post("/users/register", response_model=schemas.UserResponse)
 def register_user(request: RegisterUserRequest, db: Session = Depends(get_db)):
     hashed_password = pwd_context.hash(request.password)
     new_user = User(username=request.username, email=request.email, password_hash=hashed_password)
@@ -126,7 +244,7 @@ def register_user(request: RegisterUserRequest, db: Session = Depends(get_db)):
     return {"id": new_user.id, "username": new_user.username, "email": new_user.email}
 
 # User Login
-@app.post("/users/login")
+@app.post("/users/login", response_model=schemas.LoginResponse)
 def login_user(request: LoginRequest, db: Session = Depends(get_db)):
     user = db.query(User).filter(User.email == request.email).first()
     if not user or not pwd_context.verify(request.password, user.password_hash):
@@ -134,8 +252,8 @@ def login_user(request: LoginRequest, db: Session = Depends(get_db)):
     return {"user_id": user.id}
 
 # Set Baseline Schedule
-@app.post("/baseline_schedule/set")
-def set_baseline_schedule(request: BaselineScheduleRequest, db: Session = Depends(get_db)):
+@app.post("/baseline_schedule/set", response_model=schemas.BaselineSetResponse)
+def set_baseline_schedule(request: BaselineScheduleRequest):
     """Stores the user's baseline schedule with times converted to UTC."""
     
     user_id = request.user_id
@@ -149,48 +267,50 @@ def set_baseline_schedule(request: BaselineScheduleRequest, db: Session = Depend
     except Exception:
         raise HTTPException(status_code=400, detail="Invalid timezone detected.")
 
-    # ✅ Delete old baseline schedule before inserting new tasks
-    db.query(BaselineSchedule).filter(BaselineSchedule.user_id == user_id).delete()
-
-    new_tasks = []
-    for task in tasks:
-        # ✅ Convert local scheduled time to UTC
-        local_time = datetime.combine(datetime.today(), datetime.strptime(task.scheduled_time, "%H:%M:%S").time())
-
-        if local_time.tzinfo is None:  # Ensure it's timezone-aware
-            local_time = user_tz.localize(local_time)
-
-        scheduled_time_utc = local_time.astimezone(pytz.utc).time()
-
-        # ✅ Convert local goal time to UTC (if provided)
-        goal_time_utc = None
-        if task.goal_time:
-            goal_time_local = datetime.combine(datetime.today(), datetime.strptime(task.goal_time, "%H:%M:%S").time())
-            if goal_time_local.tzinfo is None:
-                goal_time_local = user_tz.localize(goal_time_local)
-            goal_time_utc = goal_time_local.astimezone(pytz.utc).time()
-
-        new_task = BaselineSchedule(
-            user_id=user_id,
-            task_name=task.task_name,
-            scheduled_time=scheduled_time_utc,
-            goal_time=goal_time_utc,
-            user_timezone=user_current_tz  # ✅ Store detected timezone
-        )
-        db.add(new_task)
-        new_tasks.append(new_task)
+    # ✅ Resolve the UTC offset once and convert every task with plain minute arithmetic
+    offset = utc_offset_minutes(user_tz, date.today())
+    desired = {}
+    try:
+        for task in tasks:
+            desired[task.task_name] = (
+                to_utc(parse_clock(task.scheduled_time), offset),
+                to_utc(parse_clock(task.goal_time), offset) if task.goal_time else None,
+                user_current_tz  # ✅ Store detected timezone
+            )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Times must be in HH:MM:SS format.")
 
-    db.commit()
+    # ✅ Only insert/update/delete the tasks that actually changed
+    with sharding.open_session(user_id, write=True) as db:
+        changes = sync_user_baseline(db, user_id, desired)
+        db.commit()
+    mark_written(user_id)
 
     return {
         "message": "Baseline schedule set successfully.",
         "detected_timezone": user_current_tz,
-        "tasks": [{"task_name": t.task_name, "scheduled_time": str(t.scheduled_time), "goal_time": str(t.goal_time) if t.goal_time else None} for t in new_tasks]
+        "changes": changes,
+        "tasks": [{"task_name": name, "scheduled_time": scheduled, "goal_time": goal} for name, (scheduled, goal, _) in desired.items()]
     }
 
+# Bulk Import Baseline Schedules (Admin)
+@app.post("/admin/baseline_schedule/import", response_model=schemas.BaselineImportResponse)
+async def import_baseline_schedules(request: Request, format: Optional[str] = None, _: None = Depends(require_admin)):
+    """Streams a CSV/NDJSON body of baseline tasks for many users, diffing & writing them in chunks."""
+
+    content_type = request.headers.get("content-type", "")
+    fmt = format or ("csv" if "csv" in content_type else "ndjson" if ("ndjson" in content_type or "jsonl" in content_type) else None)
+    if fmt not in ("csv", "ndjson"):
+        raise HTTPException(status_code=400, detail="Use a text/csv or application/x-ndjson body (or ?format=csv|ndjson).")
+
+    importer = BaselineImporter(fmt)
+    await run_in_threadpool(lambda: importer.run(iter_body_lines(request)))
+    print(f"✅ Imported baselines for {importer.stats['users']} users ({importer.stats['records']} records)")
+    return importer.stats
+
 # Get Baseline Schedule
-@app.get("/baseline_schedule/{user_id}")
-def get_baseline_schedule(user_id: int, request: Request, db: Session = Depends(get_db)):
+@app.get("/baseline_schedule/{user_id}", response_model=Union[schemas.BaselineScheduleResponse, schemas.MessageResponse])
+def get_baseline_schedule(user_id: int, request: Request, db: Session = Depends(get_read_db)):
     """Fetches the user's baseline schedule and adjusts times to their current timezone."""
 
     tasks = db.query(BaselineSchedule).filter(BaselineSchedule.user_id == user_id).all()
@@ -223,8 +343,8 @@ def get_baseline_schedule(user_id: int, request: Request, db: Session = Depends(
 
         adjusted_tasks.append({
             "task_name": task.task_name,
-            "scheduled_time": str(scheduled_time_local),  # ✅ Now correctly converted
-            "goal_time": str(goal_time_local) if goal_time_local else None,
+            "scheduled_time": scheduled_time_local,  # ✅ Now correctly converted
+            "goal_time": goal_time_local,
             "user_timezone": user_current_tz
         })
 
@@ -237,9 +357,9 @@ def get_baseline_schedule(user_id: int, request: Request, db: Session = Depends(
 # Generate Daily Schedule
 from models import ScheduleAdjustment  # Import the new model
 
-@app.post("/daily_schedule/generate/{user_id}")
-def generate_daily_schedule(user_id: int, db: Session = Depends(get_db), date_str: Optional[str] = None):
-    """Generates a Daily Schedule for the specified date (defaults to today) with rule-based time adjustments."""
+@app.post("/daily_schedule/generate/{user_id}", response_model=schemas.MessageResponse)
+def generate_daily_schedule(user_id: int, db: Session = Depends(get_user_db), date_str: Optional[str] = None):
+    """Generates a Daily Schedule for the specified date (defaults to today) with adaptive time adjustments (see scheduling.py)."""
     
     user_current_tz = str(get_localzone())
     try:
@@ -256,50 +376,35 @@ def generate_daily_schedule(user_id: int, db: Session = Depends(get_db), date_st
     if existing_schedule:
         return {"message": f"Daily schedule for {target_date} already exists. No changes were made."}
 
-    past_days = target_date - timedelta(days=7)
-    past_logs = db.query(DailySchedule).filter(
+    # ✅ Completions in the engine's window (columns only) & baseline habits
+    past_days = target_date - timedelta(days=scheduling.SCHEDULING_WINDOW_DAYS)
+    completions = db.query(
+        DailySchedule.user_id, DailySchedule.task_name, DailySchedule.log_date, DailySchedule.actual_completed_time
+    ).filter(
         DailySchedule.user_id == user_id,
         DailySchedule.log_date >= past_days,
-        DailySchedule.status == "completed"
+        DailySchedule.status == "completed",
+        DailySchedule.actual_completed_time.isnot(None)
     ).all()
-    
-    task_actual_times = {}
-    for task in past_logs:
-        if task.task_name not in task_actual_times:
-            task_actual_times[task.task_name] = []
-        if task.actual_completed_time:
-            task_actual_times[task.task_name].append(task.actual_completed_time.time())
 
     baseline_tasks = db.query(BaselineSchedule).filter(BaselineSchedule.user_id == user_id).all()
-    
-    for task in baseline_tasks:
-        new_scheduled_time = task.scheduled_time
-        previous_scheduled_time = None
 
-        # ✅ Check if task exists in previous schedule & store old time
-        last_scheduled_entry = db.query(DailySchedule).filter(
-            DailySchedule.user_id == user_id,
-            DailySchedule.task_name == task.task_name
-        ).order_by(DailySchedule.log_date.desc()).first()
-
-        if last_scheduled_entry:
-            previous_scheduled_time = last_scheduled_entry.scheduled_time
-
-        # ✅ Rule-Based Adjustment: Shift scheduled time toward goal time
-        adjustment_reason = "No change"
-        if task.task_name in task_actual_times and task.goal_time:
-            past_actuals = [datetime.combine(datetime.today(), t) for t in task_actual_times[task.task_name]]
-            if past_actuals:
-                avg_actual_time = sum((t.hour * 60 + t.minute) for t in past_actuals) // len(past_actuals)
-                avg_actual_time = timedelta(minutes=avg_actual_time)
-                goal_time_delta = timedelta(hours=task.goal_time.hour, minutes=task.goal_time.minute)
-
-                if avg_actual_time < goal_time_delta:
-                    new_scheduled_time = (datetime.combine(datetime.today(), task.scheduled_time) - timedelta(minutes=5)).time()
-                    adjustment_reason = "Shifted earlier toward goal time"
-                elif avg_actual_time > goal_time_delta:
-                    new_scheduled_time = (datetime.combine(datetime.today(), task.scheduled_time) + timedelta(minutes=5)).time()
-                    adjustment_reason = "Shifted later based on completion trends"
+    # ✅ Previous scheduled time per task in one query (latest scheduled entry per task)
+    latest = db.query(
+        DailySchedule.task_name, func.max(DailySchedule.log_date).label("log_date")
+    ).filter(DailySchedule.user_id == user_id).group_by(DailySchedule.task_name).subquery()
+    previous_times = dict(db.query(DailySchedule.task_name, DailySchedule.scheduled_time).join(
+        latest, (DailySchedule.task_name == latest.c.task_name) & (DailySchedule.log_date == latest.c.log_date)
+    ).filter(DailySchedule.user_id == user_id).all())
+
+    # ✅ Adaptive adjustment: all habits in one vectorised pass
+    adjustments = scheduling.get_engine().adjust_batch(
+        ((user_id, task.task_name, task.scheduled_time, task.goal_time) for task in baseline_tasks), completions, target_date
+    )
+
+    for task, adjustment in zip(baseline_tasks, adjustments):
+        new_scheduled_time = adjustment.new_scheduled_time
+        previous_scheduled_time = previous_times.get(task.task_name)
 
         # ✅ Log adjustment if scheduled time changed
         if previous_scheduled_time and previous_scheduled_time != new_scheduled_time:
@@ -308,7 +413,7 @@ def generate_daily_schedule(user_id: int, db: Session = Depends(get_db), date_st
                 task_name=task.task_name,
                 previous_scheduled_time=previous_scheduled_time,
                 new_scheduled_time=new_scheduled_time,
-                adjustment_reason=adjustment_reason,
+                adjustment_reason=adjustment.reason,
                 log_date=target_date
             )
             db.add(adjustment_entry)
@@ -324,69 +429,168 @@ def generate_daily_schedule(user_id: int, db: Session = Depends(get_db), date_st
             status="pending"
         )
         db.add(new_task)
-    
+
+    read_model.refresh(db, [(user_id, target_date)])
     db.commit()
+    mark_written(user_id)
+    events.publish(user_id, "schedule_generated", {"log_date": target_date})
     return {"message": f"Daily schedule for {target_date} generated successfully with rule-based adjustments."}
 
 
 
 # ✅ Background Job: Run Daily Schedule Generation at Midnight
+@metrics.timed_job("schedule_daily_generation")
 def schedule_daily_generation():
-    """Automates next-day schedule generation at midnight UTC."""
-    db = SessionLocal()
-    users = db.query(User.id).all()
-
-    for user in users:
-        user_id = user.id
-
-        # ✅ Detect User's Timezone
-        user_tz = db.query(BaselineSchedule.user_timezone).filter(BaselineSchedule.user_id == user_id).scalar()
-        if not user_tz:
-            user_tz = "UTC"  # Default to UTC if no timezone is found
-        user_tz = pytz.timezone(user_tz)
-
-        # ✅ Get the next day's date in the user's timezone
-        next_day = datetime.now(user_tz).date() + timedelta(days=1)
-
-        # ✅ Clear only planned tasks (keep ad-hoc)
-        db.query(DailySchedule).filter(
-            DailySchedule.user_id == user_id, 
-            DailySchedule.log_date == next_day,
-            DailySchedule.scheduled_time.isnot(None)  # ✅ Ensures ad-hoc tasks are not deleted
-        ).delete()
-
-        # ✅ Copy from baseline schedule
-        baseline_tasks = db.query(BaselineSchedule).filter(BaselineSchedule.user_id == user_id).all()
-
-        for task in baseline_tasks:
-            new_task = DailySchedule(
-                user_id=user_id,
-                task_name=task.task_name,
-                scheduled_time=task.scheduled_time,
-                goal_time=task.goal_time,
-                log_date=next_day,
-                user_timezone=user_tz.zone,
-                status="pending"
+    """Automates next-day schedule generation at midnight UTC, adjusting times with the scheduling engine.
+
+    Users are processed in chunks of NIGHTLY_CHUNK_USERS: one read of baselines & recent completions,
+    one vectorised engine pass, then bulk delete/insert per chunk. Shards run in parallel.
+    """
+    job = "schedule_daily_generation"
+    engine_pass = scheduling.get_engine()
+    with SessionLocal() as db, metrics.job_phase(job, "read"):
+        user_ids = [row.id for row in db.query(User.id).order_by(User.id)]
+
+    next_days = {}  # timezone -> next day there, computed once per run
+    generated = sum(sharding.fan_out(
+        lambda db, shard, shard_user_ids: _generate_next_day_schedules(db, shard_user_ids, engine_pass, next_days), user_ids))
+    print(f"✅ Next-day schedule generated at midnight UTC ({generated} tasks for {len(user_ids)} users).")
+
+def _generate_next_day_schedules(db: Session, user_ids: List[int], engine_pass, next_days: dict):
+    """Nightly generation for one shard's users; returns the number of tasks scheduled."""
+    job = "schedule_daily_generation"
+    generated = 0
+    for start in range(0, len(user_ids), NIGHTLY_CHUNK_USERS):
+        chunk = user_ids[start:start + NIGHTLY_CHUNK_USERS]
+
+        with metrics.job_phase(job, "read"):
+            baseline_rows = db.query(
+                BaselineSchedule.user_id, BaselineSchedule.task_name, BaselineSchedule.scheduled_time,
+                BaselineSchedule.goal_time, BaselineSchedule.user_timezone
+            ).filter(BaselineSchedule.user_id.in_(chunk)).order_by(BaselineSchedule.user_id, BaselineSchedule.id).all()
+
+            # ✅ Detect each user's timezone (first baseline row; UTC if none) & their next day
+            user_tz = {}
+            for row in baseline_rows:
+                user_tz.setdefault(row.user_id, row.user_timezone or "UTC")
+            user_next_day = {}
+            for uid in chunk:
+                tz_name = user_tz.get(uid, "UTC")
+                if tz_name not in next_days:
+                    next_days[tz_name] = datetime.now(pytz.timezone(tz_name)).date() + timedelta(days=1)
+                user_next_day[uid] = next_days[tz_name]
+
+            as_of = max(user_next_day.values())
+            completions = db.query(
+                DailySchedule.user_id, DailySchedule.task_name, DailySchedule.log_date, DailySchedule.actual_completed_time
+            ).filter(
+                DailySchedule.user_id.in_(chunk),
+                DailySchedule.log_date >= as_of - timedelta(days=engine_pass.window_days),
+                DailySchedule.status == "completed",
+                DailySchedule.actual_completed_time.isnot(None)
+            ).all()
+
+        with metrics.job_phase(job, "compute"):
+            adjustments = engine_pass.adjust_batch(
+                ((row.user_id, row.task_name, row.scheduled_time, row.goal_time) for row in baseline_rows), completions, as_of
             )
-            db.add(new_task)
-
-    db.commit()
-    db.close()
-    print(f"✅ Next-day schedule generated at midnight UTC.")
 
-# ✅ Scheduler: Run `schedule_daily_generation` at 12:00 AM UTC
-scheduler = BackgroundScheduler()
-scheduler.add_job(schedule_daily_generation, "cron", hour=0, minute=0)  # Runs at midnight UTC
-scheduler.start()
+        # ✅ Clear only planned tasks (keep ad-hoc), one statement per distinct next day
+        with metrics.job_phase(job, "delete"):
+            users_by_day = {}
+            for uid, day in user_next_day.items():
+                users_by_day.setdefault(day, []).append(uid)
+            for day, uids in users_by_day.items():
+                db.query(DailySchedule).filter(
+                    DailySchedule.user_id.in_(uids),
+                    DailySchedule.log_date == day,
+                    DailySchedule.scheduled_time.isnot(None)  # ✅ Ensures ad-hoc tasks are not deleted
+                ).delete(synchronize_session=False)
+
+        # ✅ Previous scheduled time per (user, task) in one grouped query (after the delete, so the next day's own rows are gone)
+        with metrics.job_phase(job, "read"):
+            latest = db.query(
+                DailySchedule.user_id, DailySchedule.task_name, func.max(DailySchedule.log_date).label("log_date")
+            ).filter(
+                DailySchedule.user_id.in_(chunk),
+                DailySchedule.log_date <= as_of,
+                DailySchedule.scheduled_time.isnot(None)
+            ).group_by(DailySchedule.user_id, DailySchedule.task_name).subquery()
+            previous_times = {
+                (row.user_id, row.task_name): row.scheduled_time
+                for row in db.query(DailySchedule.user_id, DailySchedule.task_name, DailySchedule.scheduled_time).join(
+                    latest, (DailySchedule.user_id == latest.c.user_id) & (DailySchedule.task_name == latest.c.task_name)
+                    & (DailySchedule.log_date == latest.c.log_date)
+                ).filter(DailySchedule.scheduled_time.isnot(None))
+            }
 
-@app.on_event("shutdown")
-def shutdown_event():
-    """Shutdown the scheduler when FastAPI stops."""
-    scheduler.shutdown()
+        with metrics.job_phase(job, "insert"):
+            schedule_rows = [{
+                "user_id": a.user_id,
+                "task_name": a.task_name,
+                "scheduled_time": a.new_scheduled_time,
+                "previous_scheduled_time": previous_times.get((a.user_id, a.task_name)),
+                "goal_time": row.goal_time,
+                "log_date": user_next_day[a.user_id],
+                "user_timezone": user_tz[a.user_id],
+                "status": "pending"
+            } for a, row in zip(adjustments, baseline_rows)]
+            # ✅ Log adjustments only where the time actually changed (as generate_daily_schedule does)
+            adjustment_rows = []
+            for a in adjustments:
+                previous = previous_times.get((a.user_id, a.task_name))
+                if previous and previous != a.new_scheduled_time:
+                    adjustment_rows.append({
+                        "user_id": a.user_id,
+                        "task_name": a.task_name,
+                        "previous_scheduled_time": previous,
+                        "new_scheduled_time": a.new_scheduled_time,
+                        "adjustment_reason": a.reason,
+                        "log_date": datetime.combine(user_next_day[a.user_id], time.min)
+                    })
+            if schedule_rows:
+                db.execute(insert(DailySchedule.__table__), schedule_rows)
+            if adjustment_rows:
+                db.execute(insert(ScheduleAdjustment.__table__), adjustment_rows)
+            read_model.refresh(db, user_next_day.items())
+
+        with metrics.job_phase(job, "commit"):
+            db.commit()
+        generated += len(schedule_rows)
+
+        # ✅ Push to connected clients (one pipelined publish per chunk)
+        with metrics.job_phase(job, "publish"):
+            events.publish_many((uid, "schedule_generated", {"log_date": user_next_day[uid]}) for uid in user_tz)
+    return generated
+
+# ✅ Background Job: warm schedules ahead of each timezone's morning peak (see warmer.py)
+def _warm_generate(user_id: int, log_date: date):
+    """Creates the user's schedule for `log_date` (which refreshes & commits its view) if they have a baseline
+    and no schedule that day yet; True if it did."""
+    with sharding.open_session(user_id, write=True) as db:
+        if not db.query(BaselineSchedule.id).filter(BaselineSchedule.user_id == user_id).first():
+            return False
+        if db.query(DailySchedule.id).filter(DailySchedule.user_id == user_id, DailySchedule.log_date == log_date).first():
+            return False  # scheduled before the read model existed: `python read_model.py` backfills its view
+        generate_daily_schedule(user_id, db=db, date_str=log_date.isoformat())
+        return True
+
+@metrics.timed_job("warm_upcoming_mornings")
+def warm_upcoming_mornings():
+    warmer.warm_upcoming_mornings(_warm_generate)
+
+# ✅ Scheduler: Run `schedule_daily_generation` at 12:00 AM UTC (and the warmer every WARM_INTERVAL_MINUTES)
+def start_scheduler():
+    scheduler = runtime.get_scheduler()
+    scheduler.add_job(schedule_daily_generation, "cron", hour=0, minute=0, id="schedule_daily_generation", replace_existing=True)  # Runs at midnight UTC
+    if warmer.WARMER_ENABLED:
+        scheduler.add_job(warm_upcoming_mornings, "cron", minute=f"*/{warmer.WARM_INTERVAL_MINUTES}", id="warm_upcoming_mornings",
+                          replace_existing=True, max_instances=1, coalesce=True)
+    scheduler.start()
 
 # Get Daily Schedule
-@app.get("/daily_schedule/{user_id}")
-def get_daily_schedule(user_id: int, request: Request, db: Session = Depends(get_db)):
+@app.get("/daily_schedule/{user_id}", response_model=Union[schemas.DailyScheduleResponse, schemas.MessageResponse])
+def get_daily_schedule(user_id: int, request: Request, db: Session = Depends(get_read_db)):
     """Fetches all tasks (planned & ad-hoc) for the user's daily schedule."""
 
     # ✅ Detect User's System Timezone
@@ -400,107 +604,184 @@ def get_daily_schedule(user_id: int, request: Request, db: Session = Depends(get
     # ✅ Get current date in UTC
     today_utc = datetime.now(pytz.utc).date()
 
-    # ✅ Retrieve all daily schedule tasks for the user
-    daily_tasks = db.query(DailySchedule).filter(
-        DailySchedule.user_id == user_id,
-        DailySchedule.log_date == today_utc
-    ).all()
-
-    if not daily_tasks:
+    # ✅ One primary-key lookup in the read model (see read_model.py), then a constant offset shift
+    schedule = read_model.load(db, user_id, today_utc)
+    if not schedule:
         return {"message": "No daily schedule found for today. Try generating it first."}
-
-    adjusted_schedule = []
-
-    for task in daily_tasks:
-        try:
-            # ✅ Convert scheduled & goal times from UTC to the user's timezone
-            scheduled_time_local = None
-            if task.scheduled_time:
-                scheduled_time_local = datetime.combine(today_utc, task.scheduled_time)\
-                    .replace(tzinfo=pytz.utc)\
-                    .astimezone(user_tz)\
-                    .time()
-
-            goal_time_local = None
-            if task.goal_time:
-                goal_time_local = datetime.combine(today_utc, task.goal_time)\
-                    .replace(tzinfo=pytz.utc)\
-                    .astimezone(user_tz)\
-                    .time()
-
-            adjusted_schedule.append({
-                "task_name": task.task_name,
-                "scheduled_time": scheduled_time_local.strftime("%H:%M:%S") if scheduled_time_local else None,  
-                "goal_time": goal_time_local.strftime("%H:%M:%S") if goal_time_local else None,
-                "status": task.status
-            })
-        except Exception as e:
-            print(f"❌ Error converting {task.task_name}: {str(e)}")
+    adjusted_schedule = read_model.localise(schedule, utc_offset_minutes(user_tz, today_utc))
 
     return {
         "user_id": user_id,
-        "log_date": str(today_utc),
+        "log_date": today_utc,
         "current_timezone": user_current_tz,
         "schedule": adjusted_schedule
     }
 
-# ✅ Task Logging API
-@app.post("/tasks/log")
-def log_tasks(request: MultipleTaskLogRequest, db: Session = Depends(get_db)):
-    """Logs task completion. If the task isn't in daily_schedules, it is added as an ad-hoc task."""
+# Maximum number of days served by a single range request
+MAX_RANGE_DAYS = 366
 
-    updated_tasks = []
-    user_current_tz = str(get_localzone())
+# Get Daily Schedule Range
+@app.get("/daily_schedule/{user_id}/range", response_model=schemas.ScheduleRangeResponse, response_model_exclude_none=True)
+def get_daily_schedule_range(user_id: int, start_date: str, end_date: str, request: Request,
+                             include_summary: bool = False, db: Session = Depends(get_read_db)):
+    """Fetches a multi-day window of the user's schedule as a compact columnar payload."""
 
+    try:
+        start = datetime.strptime(start_date, "%Y-%m-%d").date()
+        end = datetime.strptime(end_date, "%Y-%m-%d").date()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Dates must be in YYYY-MM-DD format.")
+
+    if end < start:
+        raise HTTPException(status_code=400, detail="end_date must not be before start_date.")
+    if (end - start).days >= MAX_RANGE_DAYS:
+        raise HTTPException(status_code=400, detail=f"Date range cannot exceed {MAX_RANGE_DAYS} days.")
+
+    user_current_tz = request.headers.get("User-Timezone") or str(get_localzone())
     try:
         user_tz = pytz.timezone(user_current_tz)
     except Exception:
-        raise HTTPException(status_code=400, detail="Invalid timezone detected.")
+        raise HTTPException(status_code=400, detail="Invalid timezone.")
 
-    today_utc = datetime.now(pytz.utc).date()
+    # ✅ One range scan over (user_id, log_date), selecting only the columns we ship
+    rows = db.query(
+        DailySchedule.id,
+        DailySchedule.log_date,
+        DailySchedule.task_name,
+        DailySchedule.scheduled_minute,  # ✅ Minute-of-day computed in SQL (a plain column read with TIME_STORAGE=compact)
+        DailySchedule.goal_minute,
+        DailySchedule.status
+    ).filter(
+        DailySchedule.user_id == user_id,
+        DailySchedule.log_date.between(start, end)
+    ).order_by(DailySchedule.log_date, DailySchedule.scheduled_time).all()
+
+    # ✅ Dictionary-encode dates & task names; resolve the tz offset once per date
+    dates, date_index, offsets = [], {}, []
+    task_names, task_index = [], {}
+    payload = {"ids": [], "date_idx": [], "task_idx": [], "scheduled_minutes": [], "goal_minutes": [], "status_codes": []}
+
+    for row_id, log_date, task_name, scheduled, goal, status in rows:
+        if log_date not in date_index:
+            date_index[log_date] = len(dates)
+            dates.append(log_date)
+            offsets.append(utc_offset_minutes(user_tz, log_date))
+        if task_name not in task_index:
+            task_index[task_name] = len(task_names)
+            task_names.append(task_name)
+
+        d = date_index[log_date]
+        offset = offsets[d]
+
+        payload["ids"].append(row_id)
+        payload["date_idx"].append(d)
+        payload["task_idx"].append(task_index[task_name])
+        payload["scheduled_minutes"].append((scheduled + offset) % 1440 if scheduled is not None else None)
+        payload["goal_minutes"].append((goal + offset) % 1440 if goal is not None else None)
+        payload["status_codes"].append(status_code(status))
+
+    response = {
+        "user_id": user_id,
+        "start_date": start,
+        "end_date": end,
+        "current_timezone": user_current_tz,
+        "status_legend": STATUS_CODES,
+        "dates": dates,
+        "task_names": task_names,
+        **payload
+    }
 
-    for task_data in request.tasks:
-        log_date = datetime.strptime(task_data.log_date, "%Y-%m-%d").date() if task_data.log_date else today_utc
-
-        task = db.query(DailySchedule).filter(
-            DailySchedule.user_id == task_data.user_id,
-            DailySchedule.task_name == task_data.task_name,
-            DailySchedule.log_date == log_date
-        ).first()
-
-        if not task:
-            task = DailySchedule(
-                user_id=task_data.user_id,
-                task_name=task_data.task_name,
-                log_date=log_date,
-                user_timezone=user_current_tz,
-                status="pending"
-            )
-            db.add(task)
-            db.commit()
+    if include_summary:
+        # ✅ Per-day completion counts aggregated in SQL
+        summary_rows = db.query(
+            DailySchedule.log_date,
+            func.count(DailySchedule.id),
+            func.sum(case((DailySchedule.status == "completed", 1), else_=0))
+        ).filter(
+            DailySchedule.user_id == user_id,
+            DailySchedule.log_date.between(start, end)
+        ).group_by(DailySchedule.log_date).order_by(DailySchedule.log_date).all()
 
-        if task_data.actual_completed_time:
-            local_datetime = user_tz.localize(datetime.combine(log_date, datetime.strptime(task_data.actual_completed_time, "%H:%M:%S").time()))
-            utc_time = local_datetime.astimezone(pytz.utc)
-        else:
-            utc_time = datetime.now(pytz.utc)
+        response["summary"] = {
+            "dates": [log_date for log_date, _, _ in summary_rows],
+            "total": [total for _, total, _ in summary_rows],
+            "completed": [int(completed or 0) for _, _, completed in summary_rows],
+            "completion_rate": [round((completed or 0) / total, 3) if total else 0.0 for _, total, completed in summary_rows]
+        }
 
-        task.status = "completed" if task_data.completed else "pending"
-        task.actual_completed_time = utc_time
+    return response
 
-        db.commit()
-        updated_tasks.append({
-            "task_name": task.task_name,
-            "log_date": str(log_date),
-            "status": task.status,
-            "actual_completed_time": str(utc_time.time()) if task.actual_completed_time else None
-        })
+# Habit Analytics
+@app.get("/analytics/{user_id}", response_model=schemas.AnalyticsResponse)
+def get_habit_analytics(user_id: int, start_date: Optional[str] = None, end_date: Optional[str] = None,
+                        on_time_minutes: int = analytics.DEFAULT_ON_TIME_MINUTES, db: Session = Depends(get_read_db)):
+    """Per-habit on-time rate, drift from goal, streaks, weekday patterns & trend over a window (default: last 30 days)."""
+
+    try:
+        end = datetime.strptime(end_date, "%Y-%m-%d").date() if end_date else datetime.now(pytz.utc).date()
+        start = datetime.strptime(start_date, "%Y-%m-%d").date() if start_date else end - timedelta(days=29)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Dates must be in YYYY-MM-DD format.")
+
+    if end < start:
+        raise HTTPException(status_code=400, detail="end_date must not be before start_date.")
+    if (end - start).days >= MAX_RANGE_DAYS:
+        raise HTTPException(status_code=400, detail=f"Date range cannot exceed {MAX_RANGE_DAYS} days.")
+
+    # ✅ One columnar load, then grouped NumPy reductions (no ORM objects)
+    history = analytics.load_history(db, user_id, start, end)
+    return {
+        "user_id": user_id,
+        "start_date": start,
+        "end_date": end,
+        "on_time_minutes": on_time_minutes,
+        **analytics.compute_analytics(history, on_time_minutes)
+    }
+
+# ✅ Task Logging API
+@app.post("/tasks/log", response_model=schemas.TaskLogResponse)
+def log_tasks(request: MultipleTaskLogRequest, response: Response):
+    """Logs task completion. If the task isn't in daily_schedules, it is added as an ad-hoc task.
+
+    With INGEST_MODE=queue the logs are durably queued and written in batches by the ingestion
+    consumer; the response is 202 Accepted with the same body.
+    """
+    user_current_tz = str(get_localzone())
+
+    try:
+        pytz.timezone(user_current_tz)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid timezone detected.")
+
+    try:
+        records = ingestion.normalise_task_logs(request.tasks, user_current_tz, datetime.now(pytz.utc).date())
+    except ValueError:
+        raise HTTPException(status_code=400, detail="log_date must be YYYY-MM-DD and actual_completed_time HH:MM:SS.")
+    updated_tasks = [ingestion.logged_view(record) for record in records]
+
+    if ingestion.INGEST_MODE == "queue":
+        try:
+            ingestion.validate_task_logs(records)  # ✅ Nothing the consumer can't write gets queued
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        ingestion.enqueue(records)
+        response.status_code = 202
+        return {"message": "Tasks queued for logging", "tasks": updated_tasks}
+
+    # ✅ One transaction per shard: one lookup, bulk update & bulk insert of ad-hoc tasks
+    ingestion.write_task_logs(records)
+
+    # ✅ Push the logged tasks to each affected user's open connections
+    logged_by_user = {}
+    for record, logged in zip(records, updated_tasks):
+        logged_by_user.setdefault(record["user_id"], []).append(logged)
+    events.publish_many((uid, "tasks_logged", {"tasks": logged}) for uid, logged in logged_by_user.items())
 
     return {"message": "Tasks logged successfully", "tasks": updated_tasks}
 
 # Parse AI Suggestion
 def parse_ai_suggestion(suggestion: str):
-    """Extracts habit, suggested time, and reason from AI response."""
+    """Extracts habit, suggested time (a time, or None if out of range), and reason from AI response."""
     
     # ✅ Ensure valid structure: "Habit Name: Suggested Time - Reason"
     pattern = r"^(.*?):\s*(\d{1,2}:\d{2}:\d{2})\s*-\s*(.*)$"
@@ -508,21 +789,30 @@ def parse_ai_suggestion(suggestion: str):
 
     if match:
         habit = match.group(1).strip()
-        suggested_value = match.group(2).strip()
         reason = match.group(3).strip()
+        try:
+            suggested_value = datetime.strptime(match.group(2).strip(), "%H:%M:%S").time()  # ✅ Rejects 25:00:00, 7:61:00, ...
+        except ValueError:
+            return habit, None, reason
         return habit, suggested_value, reason
 
     # 🚨 If AI response is invalid, return None
     return None, None, suggestion
 
 # AI Habit Adjustments
-@app.get("/ai/habit_adjustments/{user_id}")
-def generate_ai_habit_adjustments(user_id: int, db: Session = Depends(get_db)):
+@app.get("/ai/habit_adjustments/{user_id}", response_model=Union[schemas.AIAdjustmentsResponse, schemas.MessageResponse])
+def generate_ai_habit_adjustments(user_id: int, db: Session = Depends(get_user_db)):
     """Uses AI to analyze a user's daily schedule & suggest habit improvements."""
 
-    # ✅ Fetch today's completed tasks from `daily_schedules`
+    # ✅ Fetch today's tasks from `daily_schedules` (columns only)
     today_utc = datetime.now(pytz.utc).date()
-    tasks = db.query(DailySchedule).filter(
+    tasks = db.query(
+        DailySchedule.task_name,
+        DailySchedule.scheduled_time,
+        DailySchedule.goal_time,
+        DailySchedule.actual_completed_time,
+        DailySchedule.status
+    ).filter(
         DailySchedule.user_id == user_id,
         DailySchedule.log_date == today_utc
     ).all()
@@ -530,26 +820,33 @@ def generate_ai_habit_adjustments(user_id: int, db: Session = Depends(get_db)):
     if not tasks:
         return {"message": "No tasks found for this user."}
 
-    # ✅ Prepare habit data for AI
-    habit_data = []
-    for task in tasks:
-        habit_data.append({
-            "habit": task.task_name,
-            "scheduled_time": str(task.scheduled_time) if task.scheduled_time else None,
-            "goal_time": str(task.goal_time) if task.goal_time else None,
-            "actual_completed_time": str(task.actual_completed_time.time()) if task.actual_completed_time else None,
-            "status": task.status
-        })
-
-    # ✅ Ask GPT-4 for habit improvement suggestions
-    response = client.chat.completions.create(
-    model="gpt-4",
-    messages=[
-        {"role": "system", "content": "You are a habit improvement coach."},
-        {"role": "user", "content": f"Here is my current habit schedule: {habit_data}. How should I adjust to better reach my goal times?"}
-        ]
-    )
-    ai_suggestions = response.choices[0].message.content
+    current_values = {task.task_name: task.scheduled_time for task in tasks}
+
+    # ✅ Users with the same bucketed schedule share suggestions: rebase cached shifts & skip the LLM
+    schedule_signature = suggestion_cache.signature(tasks)
+    cached = suggestion_cache.get(schedule_signature)
+    routed = None
+    if cached is not None:
+        ai_suggestions = suggestion_cache.rebase(cached, current_values)
+    else:
+        # ✅ Summarise multi-week history into per-habit aggregates, then build a compact, budgeted prompt
+        history = analytics.load_history(db, user_id, today_utc - timedelta(days=prompt.AI_HISTORY_DAYS), today_utc - timedelta(days=1))
+        habit_stats = analytics.compute_analytics(history)["habits"]
+        completions = db.query(DailySchedule.task_name, DailySchedule.log_date, DailySchedule.actual_completed_time).filter(
+            DailySchedule.user_id == user_id,
+            DailySchedule.log_date >= today_utc - timedelta(days=scheduling.SCHEDULING_WINDOW_DAYS),
+            DailySchedule.status == "completed",
+            DailySchedule.actual_completed_time.isnot(None)
+        ).all()
+
+        # ✅ Route to the cheapest tier that fits (rules engine / light / heavy model), falling back on timeout;
+        # the prompt is only built (and its tokens counted for the chosen model) when a model will read it
+        tier = routing.choose_tier(len(tasks), habit_stats)
+        messages = None
+        if tier != "rules":
+            messages = prompt.build_habit_prompt(tasks, habit_stats, model=routing.TIERS[tier][0]).messages
+        routed = routing.route_habit_suggestions(messages, tasks, habit_stats, tier=tier, completions=completions, as_of=today_utc)
+        ai_suggestions = routed.text
 
     # ✅ Store AI-generated habit adjustments
     adjustments = []
@@ -557,12 +854,8 @@ def generate_ai_habit_adjustments(user_id: int, db: Session = Depends(get_db)):
         if suggestion.strip():
             habit, suggested_value, reason = parse_ai_suggestion(suggestion)
 
-            # ✅ Find the current scheduled time for this habit
-            current_value = db.query(DailySchedule.scheduled_time).filter(
-                DailySchedule.user_id == user_id,
-                DailySchedule.task_name == habit,
-                DailySchedule.log_date == today_utc
-            ).scalar()
+            # ✅ Current scheduled time for this habit (already loaded above)
+            current_value = current_values.get(habit)
 
             # ✅ Check if habit, suggested_value, and reason are valid
             if habit and suggested_value and reason:
@@ -578,44 +871,72 @@ def generate_ai_habit_adjustments(user_id: int, db: Session = Depends(get_db)):
                 db.add(adjustment)
                 adjustments.append({
                     "habit": habit,
-                    "suggested_value": suggested_value,
+                    "suggested_value": suggested_value.isoformat(),
                     "reason": reason
                 })
             else:
                 print(f"❌ Skipping invalid adjustment: {habit}, {suggested_value}, {reason}")
 
     db.commit()
-    return {"ai_recommendations": adjustments}
+    mark_written(user_id)
+
+    # ✅ Share model answers with matching schedules (rules-tier answers are free & history-specific)
+    if routed is not None and routed.tier != "rules":
+        suggestion_cache.put(schedule_signature, suggestion_cache.relativise(adjustments, current_values))
+
+    if adjustments:
+        events.publish(user_id, "habit_adjustments", {"log_date": today_utc, "count": len(adjustments)})
+
+    routing_report = routed.report() if routed else {"tier": "cache", "model": None, "latency_ms": 0.0, "cost_usd": 0.0, "fallbacks": []}
+    return {"ai_recommendations": adjustments, "routing": routing_report}
 
 # Get Schedule Adjustments
-@app.get("/schedule_adjustments/{user_id}")
-def get_schedule_adjustments(user_id: int, db: Session = Depends(get_db)):
+@app.get("/schedule_adjustments/{user_id}", response_model=Union[schemas.ScheduleAdjustmentsResponse, schemas.MessageResponse])
+def get_schedule_adjustments(user_id: int, db: Session = Depends(get_read_db)):
     """Fetches all schedule adjustments for a user."""
 
-    adjustments = db.query(ScheduleAdjustment).filter(
+    # ✅ Columns only; rows map 1:1 onto schemas.ScheduleAdjustmentOut
+    adjustments = db.query(
+        ScheduleAdjustment.task_name,
+        ScheduleAdjustment.previous_scheduled_time,
+        ScheduleAdjustment.new_scheduled_time,
+        ScheduleAdjustment.adjustment_reason,
+        ScheduleAdjustment.log_date
+    ).filter(
         ScheduleAdjustment.user_id == user_id
     ).order_by(ScheduleAdjustment.log_date.desc()).all()
 
     if not adjustments:
         return {"message": "No schedule adjustments found."}
 
-    return {
-        "user_id": user_id,
-        "adjustments": [
-            {
-                "task_name": adj.task_name,
-                "previous_scheduled_time": str(adj.previous_scheduled_time),
-                "new_scheduled_time": str(adj.new_scheduled_time),
-                "adjustment_reason": adj.adjustment_reason,
-                "log_date": str(adj.log_date)
-            }
-            for adj in adjustments
-        ]
-    }
+    return {"user_id": user_id, "adjustments": [adj._asdict() for adj in adjustments]}
+
+# ✅ History Export (streamed: server-side cursors, one encoded batch at a time)
+def _export_tables(format: str, tables: Optional[str]):
+    table_names = [t.strip() for t in tables.split(",") if t.strip()] if tables else (list(export.EXPORT_TABLES) if format == "ndjson" else [])
+    try:
+        export.validate(format, table_names)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return table_names
+
+@app.get("/export/{user_id}")
+def export_user_history(user_id: int, format: str = "ndjson", tables: Optional[str] = None):
+    """Streams a user's full history (daily_schedules, tasks, habit_adjustments, schedule_adjustments)."""
+    table_names = _export_tables(format, tables)
+    return StreamingResponse(export.stream_user(user_id, format, table_names), media_type=export.MEDIA_TYPES[format],
+                             headers={"Content-Disposition": f'attachment; filename="user_{user_id}_history.{format}"'})
+
+@app.get("/admin/export")
+def export_all_history(format: str = "ndjson", tables: Optional[str] = None, _: None = Depends(require_admin)):
+    """Streams every user's history, reading all shards in parallel."""
+    table_names = _export_tables(format, tables)
+    return StreamingResponse(export.stream_all(format, table_names), media_type=export.MEDIA_TYPES[format],
+                             headers={"Content-Disposition": f'attachment; filename="history.{format}"'})
 
 # Respond to Habit Adjustments
-@app.post("/ai/habit_adjustments/respond/{user_id}")
-def respond_to_habit_adjustment(user_id: int, request: HabitUpdateRequest, db: Session = Depends(get_db)):
+@app.post("/ai/habit_adjustments/respond/{user_id}", response_model=schemas.MessageResponse)
+def respond_to_habit_adjustment(user_id: int, request: HabitUpdateRequest, db: Session = Depends(get_user_db)):
     """Accepts or rejects AI-suggested habit adjustments."""
 
     adjustment = db.query(HabitAdjustment).filter(
@@ -637,19 +958,136 @@ def respond_to_habit_adjustment(user_id: int, request: HabitUpdateRequest, db: S
             DailySchedule.task_name == request.habit,
             DailySchedule.log_date == adjustment.log_date
         ).update({"scheduled_time": adjustment.suggested_value})
+        read_model.refresh(db, [(user_id, adjustment.log_date)])
 
     elif request.status == "rejected":
         adjustment.status = "rejected"
 
     db.commit()
+    mark_written(user_id)
+    if request.status == "accepted":
+        events.publish(user_id, "schedule_updated", {"habits": [request.habit]})
     return {"message": f"Habit adjustment for {request.habit} marked as {request.status}."}
 
+# Respond to Habit Adjustments (Batch)
+@app.post("/ai/habit_adjustments/respond_batch/{user_id}", response_model=schemas.HabitBatchResponse)
+def respond_to_habit_adjustments_batch(user_id: int, request: HabitBatchUpdateRequest, db: Session = Depends(get_user_db)):
+    """Accepts or rejects several AI-suggested habit adjustments in a single transaction."""
+
+    results = []
+    decisions = {}  # habit -> requested status (first response per habit wins)
+    for item in request.responses:
+        if item.status not in ("accepted", "rejected"):
+            results.append({"habit": item.habit, "status": item.status, "outcome": "invalid_status"})
+        elif item.habit in decisions:
+            results.append({"habit": item.habit, "status": item.status, "outcome": "duplicate"})
+        else:
+            decisions[item.habit] = item.status
+            results.append({"habit": item.habit, "status": item.status, "outcome": None})
+
+    # ✅ Resolve every pending adjustment in one query (oldest pending per habit, as the single endpoint does)
+    pending = {}
+    if decisions:
+        rows = db.query(HabitAdjustment).filter(
+            HabitAdjustment.user_id == user_id,
+            HabitAdjustment.habit.in_(decisions.keys()),
+            HabitAdjustment.status == "pending"
+        ).order_by(HabitAdjustment.id).all()
+        for adjustment in rows:
+            pending.setdefault(adjustment.habit, adjustment)
+
+    accepted_ids, rejected_ids, schedule_updates = [], [], []
+    for result in results:
+        if result["outcome"] is not None:
+            continue
+        adjustment = pending.get(result["habit"])
+        if not adjustment:
+            result["outcome"] = "not_found"
+            continue
+
+        result["outcome"] = result["status"]
+        if result["status"] == "accepted":
+            accepted_ids.append(adjustment.id)
+            schedule_updates.append({
+                "task_name": adjustment.habit,
+                "log_date": adjustment.log_date,
+                "scheduled_time": adjustment.suggested_value
+            })
+        else:
+            rejected_ids.append(adjustment.id)
+
+    # ✅ Bulk status updates
+    if accepted_ids:
+        db.query(HabitAdjustment).filter(HabitAdjustment.id.in_(accepted_ids)).update({"status": "accepted"}, synchronize_session=False)
+    if rejected_ids:
+        db.query(HabitAdjustment).filter(HabitAdjustment.id.in_(rejected_ids)).update({"status": "rejected"}, synchronize_session=False)
+
+    # ✅ Apply accepted changes to `daily_schedules` in one statement
+    if schedule_updates:
+        schedules = DailySchedule.__table__
+        if db.get_bind().dialect.name == "postgresql":
+            accepted = values(  # ✅ Column types from the table, so TIME_STORAGE=compact binds minutes
+                column("task_name", schedules.c.task_name.type),
+                column("log_date", schedules.c.log_date.type),
+                column("scheduled_time", schedules.c.scheduled_time.type),
+                name="accepted"
+            ).data([(u["task_name"], u["log_date"], u["scheduled_time"]) for u in schedule_updates])
+
+            db.execute(
+                update(schedules)
+                .where(
+                    schedules.c.user_id == user_id,
+                    schedules.c.task_name == accepted.c.task_name,
+                    schedules.c.log_date == accepted.c.log_date
+                )
+                .values(scheduled_time=accepted.c.scheduled_time)
+            )
+        else:
+            # Backends without UPDATE ... FROM VALUES get a single executemany instead
+            db.connection().execute(
+                update(schedules)
+                .where(
+                    schedules.c.user_id == user_id,
+                    schedules.c.task_name == bindparam("b_task_name"),
+                    schedules.c.log_date == bindparam("b_log_date")
+                )
+                .values(scheduled_time=bindparam("b_scheduled_time")),
+                [{"b_task_name": u["task_name"], "b_log_date": u["log_date"], "b_scheduled_time": u["scheduled_time"]} for u in schedule_updates]
+            )
+        read_model.refresh(db, {(user_id, u["log_date"]) for u in schedule_updates})
+
+    db.commit()
+    mark_written(user_id)
+    if schedule_updates:
+        events.publish(user_id, "schedule_updated", {"habits": [u["task_name"] for u in schedule_updates]})
+    return {
+        "message": f"Processed {len(results)} habit adjustment responses.",
+        "results": results
+    }
+
+
+# ✅ Push Channels: schedule/suggestion events per user (replaces polling)
+@app.websocket("/ws/{user_id}")
+async def schedule_updates_ws(websocket: WebSocket, user_id: int):
+    await websocket.accept()
+    await events.stream_websocket(websocket, user_id)
+
+@app.get("/events/{user_id}")
+async def schedule_updates_sse(user_id: int, request: Request):
+    return StreamingResponse(events.stream_sse(request, user_id), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+# ✅ Metrics Endpoint (Prometheus text format)
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4")
 
 # ✅ Health Check Endpoint
-@app.get("/")
+@app.get("/", response_model=schemas.HealthResponse, response_model_exclude_none=True)
 def health_check(db: Session = Depends(get_db)):
     try:
-        db.execute("SELECT 1")  # ✅ Run a simple database check
+        db.execute(text("SELECT 1"))  # ✅ Run a simple database check
         return {"message": "API is running!"}
     except Exception as e:
         return {"message": "Database connection error", "error": str(e)}
@@ -0,0 +1,266 @@
+import csv
+import json
+from collections import OrderedDict
+from datetime import date, datetime, time, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import pytz
+from sqlalchemy import insert, update, delete, bindparam
+from sqlalchemy.orm import Session
+
+import sharding
+from models import BaselineSchedule
+from utils import utc_offset_minutes, shift_time
+
+# Number of users whose baselines are diffed & written together during a bulk import
+IMPORT_CHUNK_USERS = 500
+# Bounds on per-import bookkeeping: errors reported (the rest are only counted) & users remembered
+# for the contiguity check
+IMPORT_MAX_ERRORS = 1000
+IMPORT_TRACKED_USERS = 100000
+
+
+def parse_clock(value: str) -> time:
+    """Parses an "HH:MM:SS" string into a time."""
+    return time.fromisoformat(value.strip())
+
+
+def to_utc(local: Optional[time], offset_minutes: int):
+    """Converts a local time-of-day to UTC using a precomputed offset."""
+    return shift_time(local, -offset_minutes) if local is not None else None
+
+
+def diff_baseline(existing: List[BaselineSchedule], desired: Dict[str, Tuple[time, Optional[time], str]]):
+    """Compares stored rows to the desired {task_name: (scheduled_utc, goal_utc, tz)} mapping.
+
+    Returns (inserts, updates, delete_ids, unchanged_count). Duplicate stored rows for a
+    task are pruned so each task ends up with exactly one baseline row.
+    """
+    inserts, updates, delete_ids = [], [], []
+    unchanged = 0
+    seen = set()
+
+    for row in existing:
+        target = desired.get(row.task_name)
+        if target is None or row.task_name in seen:
+            delete_ids.append(row.id)
+            continue
+
+        seen.add(row.task_name)
+        scheduled_time, goal_time, user_timezone = target
+        if (row.scheduled_time, row.goal_time, row.user_timezone) == (scheduled_time, goal_time, user_timezone):
+            unchanged += 1
+        else:
+            updates.append({
+                "b_id": row.id,
+                "scheduled_time": scheduled_time,
+                "goal_time": goal_time,
+                "user_timezone": user_timezone
+            })
+
+    for task_name, (scheduled_time, goal_time, user_timezone) in desired.items():
+        if task_name not in seen:
+            inserts.append({
+                "task_name": task_name,
+                "scheduled_time": scheduled_time,
+                "goal_time": goal_time,
+                "user_timezone": user_timezone
+            })
+
+    return inserts, updates, delete_ids, unchanged
+
+
+def apply_changes(db: Session, changes: Dict[int, tuple]):
+    """Writes diffed baseline changes for many users with one statement per kind of change."""
+    table = BaselineSchedule.__table__
+    inserts, updates, delete_ids = [], [], []
+
+    for user_id, (user_inserts, user_updates, user_deletes, _) in changes.items():
+        inserts.extend({**row, "user_id": user_id} for row in user_inserts)
+        updates.extend(user_updates)
+        delete_ids.extend(user_deletes)
+
+    conn = db.connection()
+    if delete_ids:
+        conn.execute(delete(table).where(table.c.id.in_(delete_ids)))
+    if updates:
+        conn.execute(
+            update(table).where(table.c.id == bindparam("b_id")).values(
+                scheduled_time=bindparam("scheduled_time"),
+                goal_time=bindparam("goal_time"),
+                user_timezone=bindparam("user_timezone")
+            ),
+            updates
+        )
+    if inserts:
+        now = datetime.now(timezone.utc)
+        conn.execute(insert(table), [{**row, "created_at": now} for row in inserts])
+
+
+def sync_user_baseline(db: Session, user_id: int, desired: Dict[str, Tuple[time, Optional[time], str]]):
+    """Diffs one user's submitted baseline against the stored rows and applies only the changes."""
+    existing = db.query(BaselineSchedule).filter(BaselineSchedule.user_id == user_id).order_by(BaselineSchedule.id).all()
+    inserts, updates, delete_ids, unchanged = diff_baseline(existing, desired)
+    apply_changes(db, {user_id: (inserts, updates, delete_ids, unchanged)})
+    return {"inserted": len(inserts), "updated": len(updates), "deleted": len(delete_ids), "unchanged": unchanged}
+
+
+# ✅ Bulk import (admin onboarding)
+class BaselineImporter:
+    """Streams baseline records into the database, diffing users chunk by chunk.
+
+    Accepts CSV (with a header row) or NDJSON lines. Records need `user_id`, `task_name`,
+    `scheduled_time` and optionally `goal_time` and `user_timezone` (defaults to UTC);
+    times are local to that timezone. Rows for a user must be contiguous in the stream,
+    since each user's baseline is replaced as a whole once their rows have been read.
+    A user with any invalid row (or a repeated task_name) is skipped: their stored baseline
+    is left as it was. Each chunk is written to its users' shards, one transaction per shard.
+    """
+
+    def __init__(self, fmt: str, chunk_users: int = IMPORT_CHUNK_USERS):
+        if fmt not in ("csv", "ndjson"):
+            raise ValueError(f"Unsupported import format: {fmt}")
+        self.fmt = fmt
+        self.chunk_users = chunk_users
+        self.pending: Dict[int, Dict[str, Tuple[time, Optional[time], str]]] = {}
+        self.seen_users = OrderedDict()  # user_id -> failed?, the last IMPORT_TRACKED_USERS users read
+        self.current_user = None
+        self.offsets = {}
+        self.today = date.today()
+        self.stats = {"users": 0, "records": 0, "inserted": 0, "updated": 0, "deleted": 0, "unchanged": 0,
+                      "errors": [], "errors_omitted": 0}
+
+    def _offset(self, tz_name: str):
+        if tz_name not in self.offsets:
+            self.offsets[tz_name] = utc_offset_minutes(pytz.timezone(tz_name), self.today)
+        return self.offsets[tz_name]
+
+    def _error(self, line_no: Optional[int], error: str):
+        if len(self.stats["errors"]) < IMPORT_MAX_ERRORS:
+            self.stats["errors"].append({"line": line_no, "error": error})
+        else:
+            self.stats["errors_omitted"] += 1
+
+    def _fail(self, user_id: Optional[int], line_no: int, error: str):
+        """Reports a bad row and drops its user's buffered rows, so their baseline isn't replaced."""
+        self._error(line_no, error)
+        if user_id is not None and not self.seen_users.get(user_id):
+            self.pending.pop(user_id, None)
+            self.seen_users[user_id] = True
+            self._error(None, f"User {user_id} skipped: their baseline was left unchanged.")
+
+    def _start_user(self, user_id: int):
+        self.current_user = user_id
+        self.pending[user_id] = {}
+        self.seen_users[user_id] = False
+        if len(self.seen_users) > IMPORT_TRACKED_USERS:
+            self.seen_users.popitem(last=False)
+
+    def run(self, lines: Iterable[str]) -> dict:
+        """Imports every record in `lines` (keep line endings for CSV, so quoted newlines survive), flushing
+        a chunk of users at a time. Returns the stats."""
+        if self.fmt == "csv":
+            reader = csv.reader(lines)
+            header = None
+            for values in reader:
+                if not any(v.strip() for v in values):
+                    continue
+                if header is None:
+                    header = [v.strip() for v in values]
+                    continue
+                self.add_record(dict(zip(header, values)), reader.line_num)
+                if self.should_flush():
+                    self.flush()
+        else:
+            for line_no, line in enumerate(lines, 1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError as e:
+                    self._fail(self.current_user, line_no, f"Invalid record: {e}")  # can't tell whose row it was
+                    continue
+                self.add_record(record, line_no)
+                if self.should_flush():
+                    self.flush()
+        self.flush(final=True)
+        return self.stats
+
+    def add_record(self, record: dict, line_no: int):
+        """Validates and buffers one record; malformed records fail their user, not the import."""
+        try:
+            user_id = int(record["user_id"])
+        except (KeyError, ValueError, TypeError) as e:
+            self._fail(self.current_user, line_no, f"Invalid record: {e}")
+            return
+
+        if user_id != self.current_user:
+            if user_id in self.seen_users or user_id in self.pending:
+                self._error(line_no, f"Rows for user {user_id} are not contiguous.")
+                return
+            self._start_user(user_id)
+        if self.seen_users.get(user_id):
+            return  # already failed
+
+        try:
+            tz_name = (record.get("user_timezone") or "UTC").strip()
+            offset = self._offset(tz_name)
+            scheduled_time = to_utc(parse_clock(record["scheduled_time"]), offset)
+            goal_time = to_utc(parse_clock(record["goal_time"]), offset) if record.get("goal_time") else None
+            task_name = record["task_name"].strip()
+            if not task_name:
+                raise ValueError("task_name is empty")
+        except (KeyError, ValueError, TypeError, AttributeError, pytz.UnknownTimeZoneError) as e:
+            self._fail(user_id, line_no, f"Invalid record: {e}")
+            return
+        if task_name in self.pending[user_id]:
+            self._fail(user_id, line_no, f"Duplicate task_name {task_name!r} for user {user_id}.")
+            return
+
+        self.pending[user_id][task_name] = (scheduled_time, goal_time, tz_name)
+        self.stats["records"] += 1
+
+    def should_flush(self):
+        """True once a full chunk of completely-read users is buffered."""
+        return len(self.pending) > self.chunk_users
+
+    def flush(self, final: bool = False):
+        """Diffs and writes buffered users with a single read and bulk writes, then commits.
+
+        The user currently being read is held back unless `final` is set.
+        """
+        user_ids = [u for u in self.pending if final or u != self.current_user]
+        if not user_ids:
+            return
+
+        for user_id in user_ids:
+            if sharding.placement(sharding.bucket_for(user_id))[1]:
+                del self.pending[user_id]
+                self._error(None, f"User {user_id} is being moved between shards; re-import later.")
+        user_ids = [u for u in user_ids if u in self.pending]
+
+        for shard, shard_user_ids in sharding.group_by_shard(user_ids).items():
+            with sharding.sessions[shard]() as db:
+                self._flush_shard(db, shard_user_ids)
+
+        self.stats["users"] += len(user_ids)
+
+    def _flush_shard(self, db: Session, user_ids: List[int]):
+        existing = {}
+        rows = db.query(BaselineSchedule).filter(
+            BaselineSchedule.user_id.in_(user_ids)
+        ).order_by(BaselineSchedule.user_id, BaselineSchedule.id).all()
+        for row in rows:
+            existing.setdefault(row.user_id, []).append(row)
+
+        changes = {}
+        for user_id in user_ids:
+            changes[user_id] = diff_baseline(existing.get(user_id, []), self.pending.pop(user_id))
+            inserts, updates, delete_ids, unchanged = changes[user_id]
+            self.stats["inserted"] += len(inserts)
+            self.stats["updated"] += len(updates)
+            self.stats["deleted"] += len(delete_ids)
+            self.stats["unchanged"] += unchanged
+
+        apply_changes(db, changes)
+        db.commit()
@@ -0,0 +1,253 @@
+# Load-test harness: seeds a local database, drives the real FastAPI app in-process with a
+# concurrent async client and reports latency percentiles & throughput per endpoint and job.
+#
+#   python bench_load.py --users 200 --habits 9 --days 30 --requests 500 --concurrency 32
+#   python bench_load.py --compare bench_results/load_<old commit>.json
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+from datetime import datetime, timedelta, timezone
+from time import perf_counter
+
+# Default output directory for JSON results (one file per commit)
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_results")
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+
+def summarise(latencies, errors, wall_seconds):
+    """Latency percentiles (ms) and throughput for one scenario."""
+    ordered = sorted(latencies)
+    return {
+        "count": len(ordered),
+        "errors": errors,
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 3) if ordered else None,
+        "p50_ms": round(percentile(ordered, 50) * 1000, 3) if ordered else None,
+        "p95_ms": round(percentile(ordered, 95) * 1000, 3) if ordered else None,
+        "p99_ms": round(percentile(ordered, 99) * 1000, 3) if ordered else None,
+        "max_ms": round(ordered[-1] * 1000, 3) if ordered else None,
+        "throughput_rps": round(len(ordered) / wall_seconds, 2) if wall_seconds > 0 else None
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except Exception:
+        return "unknown"
+
+
+def prepare_environment(database_url, llm_latency=None):
+    """Points the app at the benchmark database (and the fake LLM) before any backend module is imported."""
+    os.environ["DATABASE_URL"] = database_url
+    os.environ.setdefault("SQL_ECHO", "false")
+    os.environ.setdefault("LLM_PROVIDER", "fake")  # ✅ AI endpoints run offline against llm.FakeLLMProvider
+    if llm_latency:
+        os.environ["LLM_FAKE_LATENCY"] = llm_latency
+
+
+def check_benchmark_database(database_url, destroy_existing_data):
+    """Benchmarks seed (and bench_jobs drops) tables, so a caller-supplied database needs
+    --destroy-existing-data and must not hold any rows yet."""
+    from sqlalchemy import create_engine, inspect, literal_column, select, table
+
+    engine = create_engine(database_url)
+    shown = engine.url.render_as_string(hide_password=True)
+    if not destroy_existing_data:
+        raise SystemExit(f"❌ The benchmark wipes & reseeds {shown}; pass --destroy-existing-data to use it "
+                         "(or omit --database-url for a temporary SQLite database).")
+    try:
+        with engine.connect() as conn:
+            for name in inspect(conn).get_table_names():
+                if conn.execute(select(literal_column("1")).select_from(table(name)).limit(1)).first() is not None:
+                    raise SystemExit(f"❌ Refusing to benchmark against {shown}: table {name} already has data.")
+    finally:
+        engine.dispose()
+
+
+def build_scenarios(users, habits):
+    """(name, method, path(i, user_id), json body(i, user_id)) for every benchmarked endpoint."""
+    today = datetime.now(timezone.utc).date()
+    month_ago = today - timedelta(days=30)
+
+    def log_body(i, user_id):
+        habit = habits[i % len(habits)]
+        return {"tasks": [{
+            "user_id": user_id, "task_name": habit["task_name"], "completed": True,
+            "actual_completed_time": habit["scheduled_time"], "log_date": str(today)
+        }]}
+
+    def baseline_body(i, user_id):
+        return {"user_id": user_id, "tasks": [
+            {"task_name": h["task_name"], "scheduled_time": h["scheduled_time"], "goal_time": h["goal_time"]} for h in habits
+        ]}
+
+    return [
+        ("health_check", "GET", lambda i, u: "/", None),
+        ("get_daily_schedule", "GET", lambda i, u: f"/daily_schedule/{u}", None),
+        ("get_daily_schedule_range", "GET", lambda i, u: f"/daily_schedule/{u}/range?start_date={month_ago}&end_date={today}&include_summary=true", None),
+        ("get_habit_analytics", "GET", lambda i, u: f"/analytics/{u}?start_date={today - timedelta(days=365)}&end_date={today}", None),
+        ("get_baseline_schedule", "GET", lambda i, u: f"/baseline_schedule/{u}", None),
+        ("get_schedule_adjustments", "GET", lambda i, u: f"/schedule_adjustments/{u}", None),
+        ("log_tasks", "POST", lambda i, u: "/tasks/log", log_body),
+        ("set_baseline_schedule", "POST", lambda i, u: "/baseline_schedule/set", baseline_body),
+        ("generate_ai_habit_adjustments", "GET", lambda i, u: f"/ai/habit_adjustments/{u}", None),
+        # Each call targets a fresh future date so the full generation path runs
+        ("generate_daily_schedule", "POST", lambda i, u: f"/daily_schedule/generate/{u}?date_str={today + timedelta(days=1 + i // users)}", None),
+    ]
+
+
+async def run_scenario(client, scenario, requests, concurrency, users):
+    name, method, path_fn, body_fn = scenario
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, errors = [], 0
+
+    async def one(i):
+        nonlocal errors
+        user_id = i % users + 1
+        async with semaphore:
+            started = perf_counter()
+            response = await client.request(method, path_fn(i, user_id), json=body_fn(i, user_id) if body_fn else None)
+            latencies.append(perf_counter() - started)
+            if response.status_code >= 400:
+                errors += 1
+
+    started = perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    return summarise(latencies, errors, perf_counter() - started)
+
+
+def time_job(job):
+    """Runs a background job on a worker thread (as APScheduler would) and times it."""
+    elapsed = {}
+
+    def target():
+        started = perf_counter()
+        job()
+        elapsed["seconds"] = perf_counter() - started
+
+    worker = threading.Thread(target=target)
+    worker.start()
+    worker.join()
+    return {"seconds": round(elapsed.get("seconds", float("nan")), 4)}
+
+
+def compare(current, baseline_path):
+    """Prints p50/p95/p99 deltas against a previous results file."""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+
+    print(f"\n📊 Compared with {baseline['meta'].get('commit')} ({baseline_path})")
+    for section in ("endpoints", "jobs"):
+        for name, now in current.get(section, {}).items():
+            before = baseline.get(section, {}).get(name)
+            if not before:
+                continue
+            keys = ("p50_ms", "p95_ms", "p99_ms") if section == "endpoints" else ("seconds",)
+            deltas = []
+            for key in keys:
+                if before.get(key) and now.get(key) is not None:
+                    deltas.append(f"{key} {before[key]} → {now[key]} ({(now[key] - before[key]) / before[key] * 100:+.1f}%)")
+            print(f"  {name:28} " + ", ".join(deltas))
+
+
+async def main_async(args):
+    import httpx
+
+    import api
+    from bench_seed import seed_database, bench_habits
+    from database import engine, Base
+
+    Base.metadata.create_all(bind=engine)
+    print(f"🌱 Seeding {args.users} users × {args.habits} habits × {args.days} days ...")
+    started = perf_counter()
+    counts = seed_database(engine, args.users, args.habits, args.days, seed=args.seed)
+    seed_seconds = perf_counter() - started
+    print(f"✅ Seeded {counts} in {seed_seconds:.1f}s")
+
+    habits = bench_habits(args.habits)
+    results = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "database": engine.dialect.name,
+            "params": {k: getattr(args, k) for k in ("users", "habits", "days", "requests", "concurrency", "seed", "llm_latency")},
+            "seed_seconds": round(seed_seconds, 2),
+            "rows": counts
+        },
+        "endpoints": {},
+        "jobs": {}
+    }
+
+    transport = httpx.ASGITransport(app=api.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        for scenario in build_scenarios(args.users, habits):
+            if args.only and scenario[0] not in args.only:
+                continue
+            stats = await run_scenario(client, scenario, args.requests, args.concurrency, args.users)
+            results["endpoints"][scenario[0]] = stats
+            print(f"  {scenario[0]:28} p50 {stats['p50_ms']:>8} ms  p95 {stats['p95_ms']:>8} ms  "
+                  f"p99 {stats['p99_ms']:>8} ms  {stats['throughput_rps']:>8} req/s  errors {stats['errors']}")
+
+    for name, job in (("add_next_day_tasks", api.add_next_day_tasks), ("schedule_daily_generation", api.schedule_daily_generation)):
+        if args.only and name not in args.only:
+            continue
+        results["jobs"][name] = time_job(job)
+        print(f"  {name:28} {results['jobs'][name]['seconds']} s")
+
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the Gradually AI API in-process.")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--habits", type=int, default=9)
+    parser.add_argument("--days", type=int, default=14)
+    parser.add_argument("--requests", type=int, default=300, help="Requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--database-url", help="Defaults to a fresh SQLite file in a temp directory")
+    parser.add_argument("--destroy-existing-data", action="store_true",
+                        help="Allow --database-url (it must be empty; the benchmark seeds fixed user ids into it)")
+    parser.add_argument("--only", nargs="*", help="Restrict to these endpoint/job names")
+    parser.add_argument("--llm-latency", help='Fake LLM latency, e.g. "fixed:0.8" or "lognormal:-0.5,0.4" (see llm.py)')
+    parser.add_argument("--output", help="Results JSON path (default: bench_results/load_<commit>.json)")
+    parser.add_argument("--compare", help="Previous results JSON to diff against")
+    args = parser.parse_args(argv)
+
+    workdir = None
+    if not args.database_url:
+        workdir = tempfile.mkdtemp(prefix="gradually_bench_")
+        args.database_url = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    else:
+        check_benchmark_database(args.database_url, args.destroy_existing_data)
+    prepare_environment(args.database_url, args.llm_latency)
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+    results = asyncio.run(main_async(args))
+
+    output = args.output or os.path.join(RESULTS_DIR, f"load_{results['meta']['commit']}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"💾 Results saved to {output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+# Synthetic data for benchmarks: N users × M habits × D days of history, bulk-inserted.
+import random
+from datetime import date, datetime, timedelta, timezone
+from functools import lru_cache
+
+import pytz
+from sqlalchemy import insert
+
+from log_hist import tasks as CANONICAL_HABITS, generate_historical_logs
+from log_historical_tasks import generate_historical_tasks
+from models import User, BaselineSchedule, DailySchedule, DailyScheduleView, Task
+from read_model import render
+
+# Timezones spread across seeded users (keeps the tz conversion paths honest)
+BENCH_TIMEZONES = ["America/Chicago", "America/New_York", "Europe/London", "Asia/Tokyo", "UTC"]
+# Rows per executemany batch
+SEED_BATCH_SIZE = 5000
+# Seeded users all share this (non-verifiable) hash; hashing per user would dominate seeding time
+PLACEHOLDER_PASSWORD_HASH = "$2b$12$benchmarkbenchmarkbenchmarkbenchmarkbenchmarkbenchm"
+
+
+def bench_habits(count: int):
+    """Returns `count` habits, cycling through the canonical list with numbered variants."""
+    habits = []
+    for i in range(count):
+        base = CANONICAL_HABITS[i % len(CANONICAL_HABITS)]
+        suffix = f" {i // len(CANONICAL_HABITS) + 1}" if i >= len(CANONICAL_HABITS) else ""
+        habits.append({**base, "task_name": base["task_name"] + suffix})
+    return habits
+
+
+@lru_cache(maxsize=None)
+def _clock(value: str):
+    return datetime.strptime(value, "%H:%M:%S").time()
+
+
+class _BatchWriter:
+    """Buffers rows per table and flushes them with executemany inserts."""
+
+    def __init__(self, conn, batch_size=SEED_BATCH_SIZE):
+        self.conn = conn
+        self.batch_size = batch_size
+        self.buffers = {}
+        self.counts = {}
+
+    def add(self, table, row):
+        buffer = self.buffers.setdefault(table, [])
+        buffer.append(row)
+        if len(buffer) >= self.batch_size:
+            self.flush(table)
+
+    def flush(self, table=None):
+        for t in ([table] if table is not None else list(self.buffers)):
+            rows = self.buffers.get(t)
+            if rows:
+                self.conn.execute(insert(t), rows)
+                self.counts[t.name] = self.counts.get(t.name, 0) + len(rows)
+                self.buffers[t] = []
+
+
+def seed_database(engine, users: int, habits: int, days: int, seed: int = 42, first_user_id: int = 1):
+    """Seeds users, baselines, `days` days of completed history and today's pending schedule.
+
+    Returns row counts per table. History ends yesterday (UTC); today's DailySchedule rows are
+    pending (with their read-model view) so the read endpoints have something to serve.
+    """
+    rng = random.Random(seed)
+    habit_list = bench_habits(habits)
+    today = datetime.now(pytz.utc).date()
+    start_date = today - timedelta(days=days)
+    now = datetime.now(timezone.utc)
+
+    with engine.begin() as conn:
+        writer = _BatchWriter(conn)
+        for user_id in range(first_user_id, first_user_id + users):
+            user_tz = BENCH_TIMEZONES[user_id % len(BENCH_TIMEZONES)]
+            writer.add(User.__table__, {
+                "id": user_id,
+                "username": f"bench_user_{user_id}",
+                "email": f"bench_user_{user_id}@example.com",
+                "password_hash": PLACEHOLDER_PASSWORD_HASH,
+                "timezone": user_tz,
+                "created_at": now
+            })
+        writer.flush()
+
+        for user_id in range(first_user_id, first_user_id + users):
+            user_tz = BENCH_TIMEZONES[user_id % len(BENCH_TIMEZONES)]
+            writer.add(DailyScheduleView.__table__, {
+                "user_id": user_id, "log_date": today, "updated_at": now,
+                "schedule": render((h["task_name"], _clock(h["scheduled_time"]), _clock(h["goal_time"]), "pending") for h in habit_list)
+            })
+            for habit in habit_list:
+                scheduled_time, goal_time = _clock(habit["scheduled_time"]), _clock(habit["goal_time"])
+                writer.add(BaselineSchedule.__table__, {
+                    "user_id": user_id, "task_name": habit["task_name"], "scheduled_time": scheduled_time,
+                    "goal_time": goal_time, "user_timezone": user_tz, "created_at": now
+                })
+                writer.add(DailySchedule.__table__, {
+                    "user_id": user_id, "task_name": habit["task_name"], "scheduled_time": scheduled_time,
+                    "previous_scheduled_time": None, "goal_time": goal_time, "log_date": today, "status": "pending",
+                    "user_timezone": user_tz, "actual_completed_time": None, "created_at": now
+                })
+
+            # ✅ History from the log generator scripts: planned tasks & their logged completions, same (day, habit) order
+            planned = generate_historical_tasks(user_id, days, habits=habit_list, start_date=start_date)
+            logged = generate_historical_logs(user_id, days, habits=habit_list, start_date=start_date, rng=rng)
+            for task, log in zip(planned, logged):
+                log_date = date.fromisoformat(log["log_date"])
+                scheduled_time, goal_time = _clock(task["scheduled_time"]), _clock(task["goal_time"])
+                completed_at = datetime.combine(log_date, _clock(log["actual_completed_time"])).replace(tzinfo=timezone.utc)
+                writer.add(DailySchedule.__table__, {
+                    "user_id": user_id, "task_name": task["task_name"], "scheduled_time": scheduled_time,
+                    "previous_scheduled_time": None, "goal_time": goal_time, "log_date": log_date, "status": "completed",
+                    "user_timezone": user_tz, "actual_completed_time": completed_at, "created_at": now
+                })
+                writer.add(Task.__table__, {
+                    "user_id": user_id, "task_name": task["task_name"], "scheduled_time": scheduled_time,
+                    "goal_time": goal_time, "actual_completed_time": completed_at, "log_date": log_date,
+                    "ad_hoc": False, "completed": True, "created_at": now
+                })
+        writer.flush()
+
+    return writer.counts
@@ -0,0 +1,108 @@
+# Serialisation micro-benchmark: legacy str()-dicts through jsonable_encoder + json vs typed response
+# models dumped by pydantic-core (what FastAPI does with response_model) vs orjson on native values.
+#
+#   python bench_serialize.py --repeat 50
+import argparse
+import json
+import os
+import random
+import statistics
+from datetime import date, datetime, time, timedelta
+from time import perf_counter
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+import schemas
+from bench_load import RESULTS_DIR, git_commit
+
+HABITS = ["Wake Up", "Get Out of Bed", "Breakfast", "Lunch", "Gym", "Coffee", "Dinner", "Shower", "Sleep"]
+
+
+def daily_schedule_payload(rows, rng):
+    """(legacy, native) payloads for a `rows`-task daily schedule."""
+    native = []
+    for i in range(rows):
+        scheduled = time(rng.randrange(24), rng.randrange(60))
+        goal = time(rng.randrange(24), rng.randrange(60))
+        native.append({"task_name": f"{HABITS[i % len(HABITS)]} {i}", "scheduled_time": scheduled, "goal_time": goal, "status": "pending"})
+    legacy = [{**t, "scheduled_time": t["scheduled_time"].strftime("%H:%M:%S"), "goal_time": t["goal_time"].strftime("%H:%M:%S")} for t in native]
+    head = {"user_id": 1, "current_timezone": "America/Chicago"}
+    return (
+        {**head, "log_date": str(date.today()), "schedule": legacy},
+        {**head, "log_date": date.today(), "schedule": native}
+    )
+
+
+def adjustments_payload(rows, rng):
+    """(legacy, native) payloads for a `rows`-entry schedule adjustment history."""
+    start = datetime.combine(date.today(), time.min)
+    native = []
+    for i in range(rows):
+        previous = time(rng.randrange(24), rng.randrange(60))
+        native.append({
+            "task_name": HABITS[i % len(HABITS)],
+            "previous_scheduled_time": previous,
+            "new_scheduled_time": (datetime.combine(date.today(), previous) + timedelta(minutes=5)).time(),
+            "adjustment_reason": "Shifted later based on completion trends",
+            "log_date": start - timedelta(days=i // len(HABITS))
+        })
+    legacy = [{k: (str(v) if not isinstance(v, str) else v) for k, v in adj.items()} for adj in native]
+    return {"user_id": 1, "adjustments": legacy}, {"user_id": 1, "adjustments": native}
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = perf_counter()
+        fn()
+        samples.append(perf_counter() - started)
+    return {"median_ms": round(statistics.median(samples) * 1000, 3), "min_ms": round(min(samples) * 1000, 3)}
+
+
+def run_case(name, model, legacy, native, repeat):
+    adapter = TypeAdapter(model)
+    strategies = {
+        # FastAPI without response_model: jsonable_encoder, then JSONResponse's json.dumps
+        "legacy_jsonable_encoder": lambda: json.dumps(jsonable_encoder(legacy), ensure_ascii=False, separators=(",", ":")).encode("utf-8"),
+        # FastAPI with response_model: validate, then pydantic-core straight to bytes
+        "response_model_dump_json": lambda: adapter.dump_json(adapter.validate_python(native)),
+    }
+    try:
+        import orjson
+        strategies["orjson_native"] = lambda: orjson.dumps(native)
+    except ImportError:
+        pass
+
+    results = {}
+    for strategy, fn in strategies.items():
+        results[strategy] = {**timed(fn, repeat), "bytes": len(fn())}
+        print(f"  {name:28} {strategy:26} median {results[strategy]['median_ms']:>9} ms  ({results[strategy]['bytes']} bytes)")
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Micro-benchmark response serialisation strategies.")
+    parser.add_argument("--schedule-rows", type=int, default=500)
+    parser.add_argument("--adjustment-rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=30)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Results JSON path (default: bench_results/serialize_<commit>.json)")
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    results = {"meta": {"commit": git_commit(), "params": vars(args)}, "cases": {}}
+    results["cases"][f"daily_schedule_{args.schedule_rows}"] = run_case(
+        f"daily_schedule x{args.schedule_rows}", schemas.DailyScheduleResponse, *daily_schedule_payload(args.schedule_rows, rng), args.repeat)
+    results["cases"][f"schedule_adjustments_{args.adjustment_rows}"] = run_case(
+        f"schedule_adjustments x{args.adjustment_rows}", schemas.ScheduleAdjustmentsResponse, *adjustments_payload(args.adjustment_rows, rng), args.repeat)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"serialize_{results['meta']['commit']}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"💾 Results saved to {output}")
+
+
+if __name__ == "__main__":
+    main()
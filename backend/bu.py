@@ -16,6 +16,7 @@ from sqlalchemy.orm import Session
 from passlib.context import CryptContext
 from apscheduler.schedulers.background import BackgroundScheduler
 
+import routing
 from database import SessionLocal
 from models import User, BaselineSchedule, DailySchedule, Task, HabitAdjustment, ScheduleAdjustment
 
@@ -149,16 +150,16 @@ def generate_ai_habit_adjustments(db: Session = Depends(get_db), user: User = De
 
     habit_data = [{"habit": t.task_name, "scheduled_time": str(t.scheduled_time), "status": t.status} for t in tasks]
 
-    response = client.chat.completions.create(
-        model="gpt-4",
-        messages=[
+    # ✅ Routed by schedule complexity (rules / light / heavy model) with fallback on timeout
+    routed = routing.route_habit_suggestions(
+        [
             {"role": "system", "content": "You are a habit improvement coach."},
             {"role": "user", "content": f"Here is my current habit schedule: {habit_data}. Suggest improvements."}
-        ]
+        ],
+        [(t.task_name, t.scheduled_time, t.goal_time, t.actual_completed_time, t.status) for t in tasks]
     )
-    ai_suggestions = response.choices[0].message.content
 
-    return {"ai_recommendations": ai_suggestions}
+    return {"ai_recommendations": routed.text, "routing": routed.report()}
 
 # ✅ Health Check Endpoint
 @app.get("/")
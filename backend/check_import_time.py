@@ -0,0 +1,60 @@
+# Import-time budget check: fails if `import api` gets slow or starts background threads.
+#
+#   python check_import_time.py            # budget from IMPORT_BUDGET_MS (default 1500 ms)
+import os
+import subprocess
+import sys
+
+IMPORT_BUDGET_MS = float(os.getenv("IMPORT_BUDGET_MS", "1500"))
+# Modules that must stay lazy (created on first use / in the lifespan)
+LAZY_MODULES = ("openai", "redis", "apscheduler", "fastapi_cache")
+
+PROBE = f"""
+import sys, threading
+import api
+print("THREADS", len(threading.enumerate()))
+print("LOADED", ",".join(m for m in {LAZY_MODULES!r} if m in sys.modules))
+"""
+
+
+def main():
+    backend_dir = os.path.dirname(os.path.abspath(__file__))
+    env = {**os.environ, "SQL_ECHO": "false"}
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", PROBE], cwd=backend_dir, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        print(result.stderr)
+        sys.exit("❌ Importing api failed.")
+
+    # importtime lines: "import time: self [us] | cumulative | <2 spaces per nesting level>package"
+    timings = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        name = name[1:].rstrip()
+        depth = (len(name) - len(name.lstrip())) // 2
+        timings.append((int(cumulative_us), depth, name.strip()))
+
+    total_ms = next((c for c, depth, name in timings if name == "api" and depth == 0), 0) / 1000
+    threads = int(next(l.split()[1] for l in result.stdout.splitlines() if l.startswith("THREADS")))
+    loaded = next(l[len("LOADED"):] for l in result.stdout.splitlines() if l.startswith("LOADED")).strip()
+
+    print(f"⏱️ import api: {total_ms:.0f} ms (budget {IMPORT_BUDGET_MS:.0f} ms), threads after import: {threads}")
+    # Slowest modules imported directly by api (importtime lists children before parents)
+    for cumulative, _, name in sorted((t for t in timings if t[1] == 1), reverse=True)[:10]:
+        print(f"   {cumulative / 1000:8.1f} ms  {name}")
+
+    failures = []
+    if total_ms > IMPORT_BUDGET_MS:
+        failures.append(f"import took {total_ms:.0f} ms, over the {IMPORT_BUDGET_MS:.0f} ms budget")
+    if threads > 1:
+        failures.append(f"{threads - 1} background thread(s) started at import time")
+    if loaded:
+        failures.append(f"lazy modules imported eagerly: {loaded}")
+    if failures:
+        sys.exit("❌ " + "; ".join(failures))
+    print("✅ Import-time budget OK")
+
+
+if __name__ == "__main__":
+    main()
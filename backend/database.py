@@ -1,7 +1,11 @@
 from sqlalchemy import create_engine
+from sqlalchemy.exc import OperationalError
 from sqlalchemy.orm import declarative_base, sessionmaker
 from dotenv import load_dotenv
+from time import monotonic
+import itertools
 import os
+import threading
 
 # Load environment variables
 load_dotenv()
@@ -13,7 +17,8 @@ if not DATABASE_URL:
     raise ValueError("❌ DATABASE_URL is missing from .env. Make sure the .env file exists and contains DATABASE_URL.")
 
 # Set up database engine
-engine = create_engine(DATABASE_URL, echo=True)  # Set echo=True to log SQL queries (optional)
+SQL_ECHO = os.getenv("SQL_ECHO", "true").lower() == "true"  # Set SQL_ECHO=false to silence SQL logging (see profiler.py for per-request summaries)
+engine = create_engine(DATABASE_URL, echo=SQL_ECHO)
 
 # Create a session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -21,3 +26,85 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 # Base class for models
 Base = declarative_base()
 
+
+
+# ✅ Read replicas: read-only endpoints use READ_REPLICA_URLS (comma-separated), round-robin
+READ_REPLICA_URLS = [url.strip() for url in os.getenv("READ_REPLICA_URLS", "").split(",") if url.strip()]
+READ_STICKY_SECONDS = float(os.getenv("READ_STICKY_SECONDS", "5"))  # read-your-writes window after a user's own write
+REPLICA_RETRY_SECONDS = float(os.getenv("REPLICA_RETRY_SECONDS", "30"))  # how long a failed replica is skipped
+
+replica_engines = [create_engine(url, echo=SQL_ECHO) for url in READ_REPLICA_URLS]
+ReplicaSessions = [sessionmaker(autocommit=False, autoflush=False, bind=e) for e in replica_engines]
+
+_replica_lock = threading.Lock()
+_replica_cursor = itertools.count()
+_replica_down_until = {}  # replica index -> monotonic time it may be retried
+_written_until = {}  # user_id -> monotonic time their stickiness ends (this process)
+
+
+def mark_written(*user_ids):
+    """Pins the users' reads to the primary for READ_STICKY_SECONDS. Call after committing their writes."""
+    if not replica_engines or not user_ids:
+        return
+    import runtime  # lazy: runtime reads its settings after load_dotenv
+
+    until = monotonic() + READ_STICKY_SECONDS
+    with _replica_lock:
+        for user_id in user_ids:
+            _written_until[user_id] = until
+        if len(_written_until) > 10000:  # drop expired entries now and then
+            now = monotonic()
+            for user_id in [u for u, t in _written_until.items() if t < now]:
+                del _written_until[user_id]
+
+    client = runtime.get_redis()  # other workers/instances see the write too
+    if client is not None:
+        import redis
+
+        try:
+            pipe = client.pipeline(transaction=False)
+            for user_id in user_ids:
+                pipe.set(f"{runtime.CACHE_PREFIX}:sticky:user:{user_id}", 1, px=int(READ_STICKY_SECONDS * 1000))
+            pipe.execute()
+        except redis.RedisError as e:  # the write is committed; only other processes' stickiness is lost
+            print(f"❌ Could not mark users as recently written in Redis: {e}")
+
+
+def recently_written(user_id) -> bool:
+    if _written_until.get(user_id, 0) > monotonic():
+        return True
+    import runtime
+
+    client = runtime.get_redis()
+    if client is None:
+        return False
+    import redis
+
+    try:
+        return bool(client.exists(f"{runtime.CACHE_PREFIX}:sticky:user:{user_id}"))
+    except redis.RedisError as e:
+        print(f"❌ Sticky-read check failed, reading from the primary: {e}")
+        return True  # can't tell: the primary is always up to date
+
+
+def open_read_session(user_id=None):
+    """Returns (session, target): a replica session, or a primary one when there are no healthy
+    replicas or the user wrote within the stickiness window."""
+    if not replica_engines:
+        return SessionLocal(), "primary"
+    if user_id is not None and recently_written(user_id):
+        return SessionLocal(), "sticky"
+
+    for _ in range(len(replica_engines)):
+        index = next(_replica_cursor) % len(replica_engines)
+        if _replica_down_until.get(index, 0) > monotonic():
+            continue
+        db = ReplicaSessions[index]()
+        try:
+            db.connection()  # check out now so a dead replica falls back instead of failing the request
+            return db, "replica"
+        except OperationalError as e:
+            db.close()
+            _replica_down_until[index] = monotonic() + REPLICA_RETRY_SECONDS
+            print(f"❌ Read replica {index} unavailable, using the primary for {REPLICA_RETRY_SECONDS:.0f}s: {e}")
+    return SessionLocal(), "primary"
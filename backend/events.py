@@ -0,0 +1,177 @@
+import asyncio
+import json
+import os
+import threading
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+
+import runtime
+
+# ✅ Per-user push events: Redis pub/sub across processes, in-memory hub within one process
+EVENTS_BACKEND = os.getenv("EVENTS_BACKEND", "auto")  # auto | redis | memory
+EVENTS_HEARTBEAT_SECONDS = float(os.getenv("EVENTS_HEARTBEAT_SECONDS", "15"))
+EVENTS_QUEUE_SIZE = int(os.getenv("EVENTS_QUEUE_SIZE", "100"))  # per connection; oldest events dropped beyond this
+EVENTS_RECONNECT_SECONDS = float(os.getenv("EVENTS_RECONNECT_SECONDS", "5"))  # listener re-check while Redis is down
+CHANNEL_PREFIX = f"{runtime.CACHE_PREFIX}:events:user:"
+
+_lock = threading.Lock()
+_subscribers = {}  # user_id -> set of (loop, queue)
+_listeners = {}  # event loop -> Redis listener task
+_listening = set()  # event loops whose listener is currently subscribed on Redis
+
+
+def _use_redis() -> bool:
+    if EVENTS_BACKEND == "memory":
+        return False
+    return runtime.get_redis() is not None
+
+
+def _encode(user_id: int, event_type: str, data) -> str:
+    return json.dumps({
+        "type": event_type,
+        "user_id": user_id,
+        "data": data or {},
+        "ts": datetime.now(timezone.utc).isoformat()
+    }, default=str)
+
+
+def _deliver(user_id: int, message: str, unlistened_only: bool = False):
+    """Hands an encoded event to every local subscriber of `user_id` (thread-safe); with `unlistened_only`,
+    only to those on event loops whose Redis listener isn't subscribed."""
+    with _lock:
+        targets = [t for t in _subscribers.get(user_id, ()) if not unlistened_only or t[0] not in _listening]
+    for loop, queue in targets:
+        loop.call_soon_threadsafe(_put, queue, message)
+
+
+def _put(queue: asyncio.Queue, message: str):
+    if queue.full():
+        queue.get_nowait()  # slow consumer: drop the oldest event rather than block publishers
+    queue.put_nowait(message)
+
+
+def publish(user_id: int, event_type: str, data=None):
+    """Publishes one event to a user's channel. Safe to call from request threads & background jobs."""
+    publish_many([(user_id, event_type, data)])
+
+
+def publish_many(events):
+    """Publishes (user_id, event_type, data) events, pipelined in one round trip on Redis.
+
+    Called after commits, so it never raises: a failed publish is logged and the events are dropped.
+    """
+    try:
+        encoded = [(user_id, _encode(user_id, event_type, data)) for user_id, event_type, data in events]
+    except Exception as e:
+        print(f"❌ Event publish failed (events dropped): {e}")
+        return
+    if not encoded:
+        return
+    if _use_redis():
+        import redis
+
+        try:
+            pipe = runtime.get_redis().pipeline(transaction=False)
+            for user_id, message in encoded:
+                pipe.publish(f"{CHANNEL_PREFIX}{user_id}", message)
+            pipe.execute()
+        except redis.RedisError as e:
+            print(f"❌ Event publish to Redis failed ({len(encoded)} events dropped): {e}")
+            return
+        # ✅ Local subscribers whose listener is (re)connecting would miss these: hand them over directly
+        for user_id, message in encoded:
+            _deliver(user_id, message, unlistened_only=True)
+    else:
+        for user_id, message in encoded:
+            _deliver(user_id, message)
+
+
+async def _redis_listener():
+    """One pattern subscription per process (event loop), fanned out to local subscribers.
+
+    Runs for the life of the loop: while Redis is down it re-checks every EVENTS_RECONNECT_SECONDS, so
+    subscribers keep getting events once publishers switch back to Redis."""
+    import redis
+    import redis.asyncio as aioredis
+
+    loop = asyncio.get_running_loop()
+    while True:
+        if await asyncio.to_thread(_use_redis):
+            client = aioredis.from_url(runtime.REDIS_URL)
+            pubsub = client.pubsub()
+            try:
+                await pubsub.psubscribe(f"{CHANNEL_PREFIX}*")
+                _listening.add(loop)
+                async for message in pubsub.listen():
+                    if message["type"] != "pmessage":
+                        continue
+                    channel = message["channel"].decode() if isinstance(message["channel"], bytes) else message["channel"]
+                    data = message["data"].decode() if isinstance(message["data"], bytes) else message["data"]
+                    _deliver(int(channel[len(CHANNEL_PREFIX):]), data)
+            except (redis.RedisError, OSError) as e:
+                print(f"❌ Event listener lost Redis, retrying in {EVENTS_RECONNECT_SECONDS:g}s: {e}")
+            finally:
+                _listening.discard(loop)
+                await pubsub.aclose()
+                await client.aclose()
+        await asyncio.sleep(EVENTS_RECONNECT_SECONDS)
+
+
+@asynccontextmanager
+async def subscribe(user_id: int):
+    """Yields an asyncio.Queue of encoded events for `user_id` until the block exits."""
+    loop = asyncio.get_running_loop()
+    if EVENTS_BACKEND != "memory":  # started even while Redis is down: it connects once Redis is back
+        task = _listeners.get(loop)
+        if task is None or task.done():
+            _listeners[loop] = loop.create_task(_redis_listener())
+
+    queue = asyncio.Queue(maxsize=EVENTS_QUEUE_SIZE)
+    entry = (loop, queue)
+    with _lock:
+        _subscribers.setdefault(user_id, set()).add(entry)
+    try:
+        yield queue
+    finally:
+        with _lock:
+            _subscribers[user_id].discard(entry)
+            if not _subscribers[user_id]:
+                del _subscribers[user_id]
+
+
+async def stream_websocket(websocket, user_id: int):
+    """Pushes a user's events over an accepted WebSocket until the client disconnects."""
+    from starlette.websockets import WebSocketDisconnect
+
+    async def wait_for_disconnect():
+        try:
+            while True:
+                await websocket.receive_text()  # clients may send pings; we only care about the close
+        except WebSocketDisconnect:
+            pass
+
+    async with subscribe(user_id) as queue:
+        disconnected = asyncio.ensure_future(wait_for_disconnect())
+        try:
+            while True:
+                getter = asyncio.ensure_future(queue.get())
+                done, _ = await asyncio.wait({getter, disconnected}, return_when=asyncio.FIRST_COMPLETED)
+                if disconnected in done:
+                    getter.cancel()
+                    break
+                await websocket.send_text(getter.result())
+        finally:
+            disconnected.cancel()
+
+
+async def stream_sse(request, user_id: int):
+    """Server-sent events for a user, with heartbeat comments so proxies keep the connection open."""
+    async with subscribe(user_id) as queue:
+        yield ": connected\n\n"
+        while not await request.is_disconnected():
+            try:
+                message = await asyncio.wait_for(queue.get(), EVENTS_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": heartbeat\n\n"
+                continue
+            yield f"event: {json.loads(message)['type']}\ndata: {message}\n\n"
@@ -0,0 +1,307 @@
+# Streaming export of schedule history as NDJSON, CSV or Parquet (Parquet needs pyarrow).
+#
+# Rows are read through server-side cursors in EXPORT_BATCH-row slices and encoded batch by batch, so
+# memory stays bounded whatever the history size.
+#
+#   python export.py --user 42 --format csv --table daily_schedules -o user42.csv
+#   python export.py --all --format parquet --table tasks --workers 4 -o exports/
+import argparse
+import csv
+import io
+import json
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, time
+from typing import Iterable, Iterator, List, Optional
+
+from sqlalchemy import Boolean, Date, DateTime, Integer, Time, select
+
+import metrics
+import sharding
+import time_storage
+from database import open_read_session
+from models import DailySchedule, HabitAdjustment, ScheduleAdjustment, Task
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+EXPORT_BATCH = int(os.getenv("EXPORT_BATCH", "2000"))
+EXPORT_QUEUE_BATCHES = int(os.getenv("EXPORT_QUEUE_BATCHES", "8"))  # batches buffered between shard readers & the encoder
+
+EXPORT_TABLES = {model.__tablename__: model for model in (DailySchedule, Task, HabitAdjustment, ScheduleAdjustment)}
+FORMATS = ("ndjson", "csv", "parquet")
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv", "parquet": "application/vnd.apache.parquet"}
+
+
+def validate(fmt: str, tables: List[str]):
+    """Raises ValueError for unknown formats/tables or combinations a format can't hold."""
+    if fmt not in FORMATS:
+        raise ValueError(f"format must be one of {', '.join(FORMATS)}")
+    unknown = [t for t in tables if t not in EXPORT_TABLES]
+    if unknown or not tables:
+        raise ValueError(f"tables must be among {', '.join(EXPORT_TABLES)}")
+    if fmt != "ndjson" and len(tables) != 1:
+        raise ValueError(f"{fmt} exports hold one table; pick it with tables=<name>")
+    if fmt == "parquet" and pyarrow is None:
+        raise ValueError("parquet exports need the pyarrow package")
+
+
+# ✅ Reading: server-side cursor, yielding lists of row dicts
+def iter_batches(conn, table_name: str, user_id: Optional[int] = None, partition=None) -> Iterator[List[dict]]:
+    """Batches of a table's rows for one user (by id), or for all users (optionally one `user_id % n == k` partition)."""
+    table = EXPORT_TABLES[table_name].__table__
+    query = select(table)
+    if user_id is not None:
+        query = query.where(table.c.user_id == user_id)
+    if partition is not None:
+        k, n = partition
+        query = query.where(table.c.user_id % n == k)
+    result = conn.execution_options(stream_results=True, yield_per=EXPORT_BATCH).execute(query.order_by(table.c.id))
+    for batch in result.mappings().partitions(EXPORT_BATCH):
+        metrics.export_rows_total.inc(len(batch), table=table_name)
+        yield [dict(row) for row in batch]
+
+
+# ✅ Encoding
+def _iso(value):
+    if isinstance(value, (date, datetime, time)):
+        return value.isoformat()
+    raise TypeError(f"Unserialisable value: {value!r}")
+
+
+class NDJSONEncoder:
+    def __init__(self, table_names):
+        self.tag = len(table_names) > 1  # multi-table streams label each line
+
+    def header(self) -> bytes:
+        return b""
+
+    def encode(self, table_name: str, rows: List[dict]) -> bytes:
+        if self.tag:
+            rows = [{"table": table_name, **row} for row in rows]
+        return "".join(json.dumps(row, default=_iso) + "\n" for row in rows).encode("utf-8")
+
+    def footer(self) -> bytes:
+        return b""
+
+
+class CSVEncoder:
+    def __init__(self, table_names):
+        self.columns = [c.name for c in EXPORT_TABLES[table_names[0]].__table__.columns]
+
+    def _lines(self, rows) -> bytes:
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        return buffer.getvalue().encode("utf-8")
+
+    def header(self) -> bytes:
+        return self._lines([self.columns])
+
+    def encode(self, table_name: str, rows: List[dict]) -> bytes:
+        return self._lines([["" if row[c] is None else _iso(row[c]) if isinstance(row[c], (date, datetime, time)) else row[c]
+                             for c in self.columns] for row in rows])
+
+    def footer(self) -> bytes:
+        return b""
+
+
+class _Sink(io.RawIOBase):
+    """Write-only file object whose contents are drained after every row group."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data, self.chunks = b"".join(self.chunks), []
+        return data
+
+
+def arrow_schema(table_name: str):
+    fields = []
+    for column in EXPORT_TABLES[table_name].__table__.columns:
+        kind = column.type
+        if isinstance(kind, time_storage.MinuteOfDay):
+            kind = Time()  # decoded to datetime.time on read
+        elif isinstance(kind, time_storage.UTCEpoch):
+            kind = DateTime(timezone=True)
+        if isinstance(kind, Boolean):
+            arrow_type = pyarrow.bool_()
+        elif isinstance(kind, Integer):
+            arrow_type = pyarrow.int64()
+        elif isinstance(kind, DateTime):
+            arrow_type = pyarrow.timestamp("us", tz="UTC" if kind.timezone else None)
+        elif isinstance(kind, Date):
+            arrow_type = pyarrow.date32()
+        elif isinstance(kind, Time):
+            arrow_type = pyarrow.time64("us")
+        else:
+            arrow_type = pyarrow.string()
+        fields.append(pyarrow.field(column.name, arrow_type, nullable=column.nullable or not column.primary_key))
+    return pyarrow.schema(fields)
+
+
+class ParquetEncoder:
+    """One row group per batch; the footer is written by footer()."""
+
+    def __init__(self, table_names):
+        self.schema = arrow_schema(table_names[0])
+        self.sink = _Sink()
+        self.writer = pyarrow.parquet.ParquetWriter(self.sink, self.schema)
+
+    def header(self) -> bytes:
+        return self.sink.drain()
+
+    def encode(self, table_name: str, rows: List[dict]) -> bytes:
+        self.writer.write_table(pyarrow.Table.from_pylist(rows, schema=self.schema))
+        return self.sink.drain()
+
+    def footer(self) -> bytes:
+        self.writer.close()
+        return self.sink.drain()
+
+
+ENCODERS = {"ndjson": NDJSONEncoder, "csv": CSVEncoder, "parquet": ParquetEncoder}
+
+
+def _read_connection(shard: int, user_id: Optional[int] = None):
+    """A read session (replica when configured on the catalog shard) for export queries."""
+    if shard == 0:
+        return open_read_session(user_id)[0]
+    return sharding.sessions[shard]()
+
+
+def stream_user(user_id: int, fmt: str, table_names: List[str]) -> Iterator[bytes]:
+    """Encoded export of one user's rows, table after table."""
+    encoder = ENCODERS[fmt](table_names)
+    yield encoder.header()
+    with _read_connection(sharding.shard_for(user_id), user_id) as db:
+        conn = db.connection()
+        for table_name in table_names:
+            for batch in iter_batches(conn, table_name, user_id=user_id):
+                yield encoder.encode(table_name, batch)
+    yield encoder.footer()
+
+
+_DONE = object()
+
+
+def stream_all(fmt: str, table_names: List[str]) -> Iterator[bytes]:
+    """Encoded export of every user's rows; shards are read in parallel into a bounded queue, encoded here."""
+    encoder = ENCODERS[fmt](table_names)
+    batches = queue.Queue(maxsize=EXPORT_QUEUE_BATCHES)
+    stop = threading.Event()
+
+    def offer(item) -> bool:
+        """Blocks while the queue is full (bounded memory); False once the consumer has gone."""
+        while not stop.is_set():
+            try:
+                batches.put(item, timeout=1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def read_shard(shard):
+        try:
+            with _read_connection(shard) as db:
+                conn = db.connection()
+                for table_name in table_names:
+                    for batch in iter_batches(conn, table_name):
+                        if not offer((table_name, batch)):
+                            return
+        except Exception as e:
+            offer(e)
+        finally:
+            offer(_DONE)
+
+    yield encoder.header()
+    pool = ThreadPoolExecutor(max_workers=sharding.SHARD_COUNT, thread_name_prefix="export")
+    try:
+        for shard in range(sharding.SHARD_COUNT):
+            pool.submit(read_shard, shard)
+        running = sharding.SHARD_COUNT
+        while running:
+            item = batches.get()
+            if item is _DONE:
+                running -= 1
+            elif isinstance(item, Exception):
+                raise item
+            else:
+                yield encoder.encode(*item)
+        yield encoder.footer()
+    finally:
+        stop.set()  # finished, client went away or a reader failed: let the readers exit
+        pool.shutdown(wait=False)
+
+
+# ✅ CLI: one user to a file, or all users in parallel partitions (one file per shard x partition)
+def write_file(path: str, chunks: Iterable[bytes]) -> int:
+    size = 0
+    with open(path, "wb") as f:
+        for chunk in chunks:
+            f.write(chunk)
+            size += len(chunk)
+    return size
+
+
+def export_partition(shard: int, k: int, n: int, fmt: str, table_names: List[str], path: str) -> int:
+    def chunks():
+        encoder = ENCODERS[fmt](table_names)
+        yield encoder.header()
+        with _read_connection(shard) as db:
+            conn = db.connection()
+            for table_name in table_names:
+                for batch in iter_batches(conn, table_name, partition=(k, n)):
+                    yield encoder.encode(table_name, batch)
+        yield encoder.footer()
+
+    return write_file(path, chunks())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export schedule history as NDJSON, CSV or Parquet.")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--user", type=int, help="Export one user's history")
+    target.add_argument("--all", action="store_true", help="Export every user (parallel, one file per partition)")
+    parser.add_argument("--format", default="ndjson", choices=FORMATS)
+    parser.add_argument("--table", action="append", help="Table to export; repeatable (default: all for ndjson)")
+    parser.add_argument("--workers", type=int, default=4, help="Partitions per shard with --all")
+    parser.add_argument("-o", "--output", required=True, help="Output file (--user) or directory (--all)")
+    args = parser.parse_args(argv)
+
+    table_names = args.table or (list(EXPORT_TABLES) if args.format == "ndjson" else [])
+    try:
+        validate(args.format, table_names)
+    except ValueError as e:
+        parser.error(str(e))
+
+    if args.user is not None:
+        size = write_file(args.output, stream_user(args.user, args.format, table_names))
+        print(f"✅ Exported user {args.user} to {args.output} ({size} bytes)")
+        return
+
+    os.makedirs(args.output, exist_ok=True)
+    stem = table_names[0] if len(table_names) == 1 else "history"
+    jobs = [(shard, k) for shard in range(sharding.SHARD_COUNT) for k in range(args.workers)]
+    with ThreadPoolExecutor(max_workers=len(jobs), thread_name_prefix="export") as pool:
+        futures = {pool.submit(export_partition, shard, k, args.workers, args.format, table_names,
+                               os.path.join(args.output, f"{stem}.shard{shard}.part{k}.{args.format}")): (shard, k)
+                   for shard, k in jobs}
+        total = sum(f.result() for f in futures)
+    print(f"✅ Exported all users to {args.output} ({len(jobs)} files, {total} bytes)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,460 @@
+import json
+import os
+import socket
+import threading
+import time as clock
+import uuid
+from datetime import date, datetime, timezone
+from time import perf_counter
+from typing import Dict, List, Optional
+
+import pytz
+from sqlalchemy import bindparam, insert, update
+from sqlalchemy.orm import Session
+
+import events
+import metrics
+import read_model
+import runtime
+import sharding
+from database import SessionLocal, mark_written
+from models import DailySchedule, User
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process locking only
+    fcntl = None
+
+# ✅ Ingestion mode for /tasks/log: "sync" writes in the request, "queue" acknowledges after a durable append
+INGEST_MODE = os.getenv("INGEST_MODE", "sync")
+INGEST_BACKEND = os.getenv("INGEST_BACKEND", "auto")  # auto | redis | file
+INGEST_QUEUE_PATH = os.getenv("INGEST_QUEUE_PATH", "task_log_queue.jsonl")
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "5000"))
+INGEST_FLUSH_INTERVAL = float(os.getenv("INGEST_FLUSH_INTERVAL", "1.0"))
+INGEST_CONSUMER = os.getenv("INGEST_CONSUMER")  # unique per process; defaults to "<hostname>-<pid>"
+INGEST_CLAIM_IDLE_SECONDS = float(os.getenv("INGEST_CLAIM_IDLE_SECONDS", "300"))  # then a stopped consumer's entries are taken over
+INGEST_MAX_ATTEMPTS = int(os.getenv("INGEST_MAX_ATTEMPTS", "5"))  # failed flushes before a record is dead-lettered
+STREAM_KEY = f"{runtime.CACHE_PREFIX}:ingest:task_logs"
+DEAD_LETTER_KEY = f"{STREAM_KEY}:dead"
+STREAM_GROUP = "task-log-writers"
+
+
+# ✅ Records: one normalised task log event (times already converted to UTC)
+def normalise_task_logs(tasks, user_timezone: str, today_utc: date) -> List[dict]:
+    """Turns TaskLogRequest items into records; raises ValueError on bad dates/times."""
+    user_tz = pytz.timezone(user_timezone)
+    now = datetime.now(pytz.utc)
+    records = []
+    for task_data in tasks:
+        log_date = datetime.strptime(task_data.log_date, "%Y-%m-%d").date() if task_data.log_date else today_utc
+        if task_data.actual_completed_time:
+            local_datetime = user_tz.localize(datetime.combine(log_date, datetime.strptime(task_data.actual_completed_time, "%H:%M:%S").time()))
+            utc_time = local_datetime.astimezone(pytz.utc)
+        else:
+            utc_time = now
+        records.append({
+            "log_id": uuid.uuid4().hex,
+            "user_id": task_data.user_id,
+            "task_name": task_data.task_name,
+            "log_date": log_date,
+            "status": "completed" if task_data.completed else "pending",
+            "actual_completed_time": utc_time,
+            "user_timezone": user_timezone,
+            "enqueued_at": clock.time()
+        })
+    return records
+
+
+def validate_task_logs(records: List[dict]):
+    """Raises ValueError for records the consumer could never write (unknown users, blank task names).
+
+    Checked before enqueueing, so a queued batch can't fail on them later.
+    """
+    if any(not record["task_name"].strip() for record in records):
+        raise ValueError("task_name must not be empty.")
+    user_ids = {record["user_id"] for record in records}
+    with SessionLocal() as db:
+        known = {user_id for (user_id,) in db.query(User.id).filter(User.id.in_(user_ids))}
+    if user_ids - known:
+        raise ValueError(f"Unknown user_id(s): {', '.join(map(str, sorted(user_ids - known)))}")
+
+
+def logged_view(record: dict) -> dict:
+    """The per-task shape returned by /tasks/log and pushed in tasks_logged events."""
+    return {
+        "task_name": record["task_name"],
+        "log_date": record["log_date"],
+        "status": record["status"],
+        "actual_completed_time": record["actual_completed_time"].time()
+    }
+
+
+def _dumps(record: dict) -> str:
+    return json.dumps({**record, "log_date": record["log_date"].isoformat(),
+                       "actual_completed_time": record["actual_completed_time"].isoformat()})
+
+
+def _loads(raw) -> dict:
+    record = json.loads(raw)
+    record["log_date"] = date.fromisoformat(record["log_date"])
+    record["actual_completed_time"] = datetime.fromisoformat(record["actual_completed_time"])
+    return record
+
+
+def apply_task_logs(db: Session, records: List[dict]) -> Dict[str, int]:
+    """Writes task log records set-based: coalesced per (user, task, date), one read, one executemany per kind.
+
+    The last record for a key wins, matching the old one-commit-per-item behaviour. Existing rows are
+    updated in place; missing ones are inserted as ad-hoc tasks. The caller commits.
+    """
+    latest = {}
+    for record in records:
+        latest[(record["user_id"], record["task_name"], record["log_date"])] = record
+
+    table = DailySchedule.__table__
+    existing = {}
+    if latest:
+        rows = db.query(DailySchedule.id, DailySchedule.user_id, DailySchedule.task_name, DailySchedule.log_date).filter(
+            DailySchedule.user_id.in_({key[0] for key in latest}),
+            DailySchedule.task_name.in_({key[1] for key in latest}),
+            DailySchedule.log_date.in_({key[2] for key in latest})
+        ).order_by(DailySchedule.id).all()
+        for row_id, user_id, task_name, log_date in rows:
+            existing.setdefault((user_id, task_name, log_date), row_id)  # first row, like the old .first()
+
+    updates, inserts = [], []
+    now = datetime.now(timezone.utc)
+    for key, record in latest.items():
+        if key in existing:
+            updates.append({"b_id": existing[key], "b_status": record["status"], "b_completed": record["actual_completed_time"]})
+        else:
+            inserts.append({
+                "user_id": record["user_id"],
+                "task_name": record["task_name"],
+                "log_date": record["log_date"],
+                "user_timezone": record["user_timezone"],
+                "status": record["status"],
+                "actual_completed_time": record["actual_completed_time"],
+                "created_at": now
+            })
+
+    conn = db.connection()
+    if updates:
+        conn.execute(
+            update(table).where(table.c.id == bindparam("b_id")).values(
+                status=bindparam("b_status"), actual_completed_time=bindparam("b_completed")),
+            updates
+        )
+    if inserts:
+        conn.execute(insert(table), inserts)
+    read_model.refresh(db, [(key[0], key[2]) for key in latest])
+    return {"records": len(records), "updated": len(updates), "inserted": len(inserts), "coalesced": len(records) - len(latest)}
+
+
+def write_task_logs(records: List[dict]) -> Dict[str, int]:
+    """Applies records on their users' shards (one transaction per shard) and pins those users' reads to the primary.
+
+    Raises sharding.ShardMoving, before writing anything, if any user's shard bucket is being moved.
+    """
+    sharding.check_writable({record["user_id"] for record in records})
+    totals = {"records": 0, "updated": 0, "inserted": 0, "coalesced": 0}
+    for shard, shard_records in sharding.group_by_shard(records, key=lambda r: r["user_id"]).items():
+        with sharding.sessions[shard]() as db:
+            stats = apply_task_logs(db, shard_records)
+            db.commit()
+        for key, value in stats.items():
+            totals[key] += value
+    mark_written(*{record["user_id"] for record in records})
+    return totals
+
+
+# ✅ Durable queues
+class RedisStreamQueue:
+    """Redis stream with a consumer group; entries are acked & deleted once flushed."""
+
+    def __init__(self, client):
+        self.client = client
+        self.consumer = INGEST_CONSUMER or f"{socket.gethostname()}-{os.getpid()}"
+        try:
+            client.xgroup_create(STREAM_KEY, STREAM_GROUP, id="0", mkstream=True)
+        except Exception as e:  # BUSYGROUP: already exists
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    def append(self, records: List[dict]):
+        pipe = self.client.pipeline(transaction=False)
+        for record in records:
+            pipe.xadd(STREAM_KEY, {"r": _dumps(record)})
+        pipe.execute()
+
+    def read(self, count: int):
+        # Our own delivered-but-unacked entries first (a held-back batch), then entries a stopped consumer left
+        # pending for longer than INGEST_CLAIM_IDLE_SECONDS, then new ones
+        response = self.client.xreadgroup(STREAM_GROUP, self.consumer, {STREAM_KEY: "0"}, count=count)
+        entries = response[0][1] if response else []
+        if not entries:
+            claimed = self.client.xautoclaim(STREAM_KEY, STREAM_GROUP, self.consumer, int(INGEST_CLAIM_IDLE_SECONDS * 1000), count=count)
+            entries = [(entry_id, fields) for entry_id, fields in claimed[1] if fields]
+            deleted = [entry_id for entry_id, fields in claimed[1] if not fields]  # pre-7.0 Redis keeps these pending
+            if deleted:
+                self.client.xack(STREAM_KEY, STREAM_GROUP, *deleted)
+        if not entries:
+            response = self.client.xreadgroup(STREAM_GROUP, self.consumer, {STREAM_KEY: ">"}, count=count)
+            entries = response[0][1] if response else []
+        return [_loads(fields[b"r"]) for _, fields in entries], [entry_id for entry_id, _ in entries]
+
+    def ack(self, token):
+        if token:
+            pipe = self.client.pipeline(transaction=False)
+            pipe.xack(STREAM_KEY, STREAM_GROUP, *token)
+            pipe.xdel(STREAM_KEY, *token)
+            pipe.execute()
+
+    def dead_letter(self, failed: List[tuple]):
+        pipe = self.client.pipeline(transaction=False)
+        for record, error in failed:
+            pipe.xadd(DEAD_LETTER_KEY, {"r": _dumps(record), "error": error})
+        pipe.execute()
+
+    def depth(self) -> int:
+        return self.client.xlen(STREAM_KEY)
+
+
+class FileQueue:
+    """Append-only JSONL file (fsynced per append) plus a committed read offset.
+
+    Once everything has been consumed the file is truncated. One consumer per file: the consumer takes
+    an exclusive lock on the offset file (where fcntl is available).
+    """
+
+    def __init__(self, path: str = INGEST_QUEUE_PATH):
+        self.path = path
+        self.offset_path = f"{path}.offset"
+        self.dead_letter_path = f"{path}.dead"
+        self._lock = threading.Lock()
+        self._consumer_lock = None
+        open(self.path, "a").close()
+        # depth(): lines between the read offset & _scanned, counted incrementally as the file grows
+        self._scanned = self._offset()
+        self._depth = 0
+
+    def _locked(self, f):
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+
+    def append(self, records: List[dict]):
+        payload = "".join(_dumps(record) + "\n" for record in records).encode("utf-8")
+        with self._lock, open(self.path, "ab") as f:
+            self._locked(f)
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def acquire_consumer(self) -> bool:
+        if fcntl is None:
+            return True
+        self._consumer_lock = open(f"{self.path}.consumer", "a")
+        try:
+            fcntl.flock(self._consumer_lock.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except OSError:
+            return False
+
+    def _offset(self) -> int:
+        try:
+            with open(self.offset_path) as f:
+                return int(f.read().strip() or 0)
+        except FileNotFoundError:
+            return 0
+
+    def read(self, count: int):
+        offset = start = self._offset()
+        records = []
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            while len(records) < count:
+                line = f.readline()
+                if not line.endswith(b"\n"):  # nothing more, or a write still in progress
+                    break
+                offset += len(line)
+                records.append(_loads(line))
+        return records, (start, offset, len(records))
+
+    def _write_offset(self, offset: int):
+        tmp = f"{self.offset_path}.tmp"
+        with open(tmp, "w") as f:
+            f.write(str(offset))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.offset_path)
+
+    def ack(self, token):
+        # ✅ Compact: everything consumed -> start a fresh file. The offset is reset first, so a crash
+        # in between replays the batch (upserts are idempotent) rather than losing the tail.
+        _, offset, consumed = token
+        with self._lock, open(self.path, "r+b") as f:
+            self._locked(f)
+            if os.fstat(f.fileno()).st_size == offset:
+                self._write_offset(0)
+                f.truncate(0)
+                self._scanned, self._depth = 0, 0
+            else:
+                self._write_offset(offset)
+                if offset >= self._scanned:
+                    self._scanned, self._depth = offset, 0
+                else:
+                    self._depth -= consumed
+
+    def dead_letter(self, failed: List[tuple]):
+        payload = "".join(json.dumps({"r": _dumps(record), "error": error}) + "\n" for record, error in failed)
+        with self._lock, open(self.dead_letter_path, "a", encoding="utf-8") as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def depth(self) -> int:
+        """Only bytes appended since the last call are scanned."""
+        with self._lock, open(self.path, "rb") as f:
+            if os.fstat(f.fileno()).st_size < self._scanned:  # truncated by another consumer process
+                self._scanned, self._depth = self._offset(), 0
+            f.seek(self._scanned)
+            data = f.read()
+        complete = data.rfind(b"\n") + 1  # a write still in progress is counted once it ends
+        self._scanned += complete
+        self._depth += data.count(b"\n", 0, complete)
+        return self._depth
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_queue():
+    """Process-wide queue: a Redis stream when Redis is reachable (INGEST_BACKEND=auto|redis), else the file."""
+    global _queue
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                client = runtime.get_redis() if INGEST_BACKEND in ("auto", "redis") else None
+                if INGEST_BACKEND == "redis" and client is None:
+                    raise RuntimeError("INGEST_BACKEND=redis but Redis is unavailable.")
+                _queue = RedisStreamQueue(client) if client is not None else FileQueue()
+    return _queue
+
+
+def enqueue(records: List[dict]):
+    get_queue().append(records)
+    metrics.ingest_enqueued_total.inc(len(records))
+
+
+# ✅ Consumer: drains the queue in large coalesced batches
+_attempts = {}  # log_id -> failed flushes so far (this process)
+
+
+def _write_isolated(queue, records: List[dict]) -> Dict[str, int]:
+    """Writes a failed batch record by record; records failing INGEST_MAX_ATTEMPTS times are dead-lettered.
+
+    Raises if any failing record still has attempts left, so the batch stays queued for the next flush
+    (re-writing the records that did succeed is harmless: the writes are idempotent).
+    """
+    totals = {"records": 0, "updated": 0, "inserted": 0, "coalesced": 0}
+    dead, retry_error = [], None
+    for record in records:
+        try:
+            stats = write_task_logs([record])
+        except sharding.ShardMoving:
+            raise
+        except Exception as e:
+            log_id = record.get("log_id") or _dumps(record)
+            _attempts[log_id] = _attempts.get(log_id, 0) + 1
+            if _attempts[log_id] >= INGEST_MAX_ATTEMPTS:
+                dead.append((record, str(e)))
+            else:
+                retry_error = e
+            continue
+        for key, value in stats.items():
+            totals[key] += value
+    if retry_error is not None:
+        raise retry_error
+    if dead:
+        queue.dead_letter(dead)
+        metrics.ingest_dead_lettered_total.inc(len(dead))
+        for record, error in dead:
+            print(f"❌ Dead-lettered task log for user {record['user_id']} ({record['task_name']}): {error}")
+    return totals
+
+
+def flush_once(queue=None, batch_size: int = INGEST_BATCH_SIZE) -> int:
+    """Applies one batch from the queue; returns how many events it consumed.
+
+    A batch touching a shard bucket that is being moved stays queued until the move finishes. A batch
+    that fails is retried record by record, dead-lettering records that keep failing, so one bad record
+    can't stall the queue.
+    """
+    queue = queue or get_queue()
+    records, token = queue.read(batch_size)
+    if records:
+        started = perf_counter()
+        try:
+            try:
+                stats = write_task_logs(records)
+            except sharding.ShardMoving:
+                raise
+            except Exception as e:
+                print(f"❌ Ingestion batch failed, retrying record by record: {e}")
+                stats = _write_isolated(queue, records)
+        except sharding.ShardMoving as e:
+            print(f"ℹ️ Ingestion batch held back: {e}")
+            return 0
+        queue.ack(token)
+        for record in records:
+            _attempts.pop(record.get("log_id") or _dumps(record), None)
+
+        metrics.ingest_flush_duration.observe(perf_counter() - started)
+        metrics.ingest_flush_lag.observe(clock.time() - min(r["enqueued_at"] for r in records))
+        metrics.ingest_flushed_total.inc(len(records))
+        metrics.ingest_rows_written_total.inc(stats["updated"], op="update")
+        metrics.ingest_rows_written_total.inc(stats["inserted"], op="insert")
+
+        by_user = {}
+        for record in records:
+            by_user.setdefault(record["user_id"], []).append(logged_view(record))
+        events.publish_many((uid, "tasks_logged", {"tasks": logged}) for uid, logged in by_user.items())
+
+    metrics.ingest_queue_depth.set(queue.depth())
+    return len(records)
+
+
+class IngestionConsumer:
+    """Background thread flushing the queue every INGEST_FLUSH_INTERVAL seconds (immediately while backlogged)."""
+
+    def __init__(self, interval: float = INGEST_FLUSH_INTERVAL):
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        queue = get_queue()
+        if isinstance(queue, FileQueue) and not queue.acquire_consumer():
+            print("ℹ️ Another process is consuming the ingestion queue file.")
+            return
+        self._thread = threading.Thread(target=self._run, name="ingestion-consumer", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                consumed = flush_once()
+            except Exception as e:
+                print(f"❌ Ingestion flush failed (will retry): {e}")
+                consumed = 0
+            if consumed < INGEST_BATCH_SIZE:
+                self._stop.wait(self.interval)
+
+    def stop(self):
+        """Stops the loop and drains what's left so acknowledged logs are written before exit."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            while flush_once():
+                pass
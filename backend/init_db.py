@@ -1,9 +1,9 @@
-from database import engine, Base  # Import engine and Base from database.py
+import sharding  # ✅ Creates tables on every shard (SHARD_URLS), the catalog being DATABASE_URL
 
 def init_db():
     """Initialize database tables if they don't exist."""
     print("🔄 Checking database tables...")
-    Base.metadata.create_all(bind=engine)  # Creates tables if they don’t exist
+    sharding.create_all()  # Creates tables if they don’t exist
     print("✅ Database tables created successfully!")
 
 if __name__ == "__main__":
@@ -0,0 +1,259 @@
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass
+from time import perf_counter
+from typing import Callable, List, Optional
+
+import metrics
+
+# ✅ Provider selection: LLM_PROVIDER=openai|fake, optional cassette via LLM_CASSETTE_MODE=record|replay
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "openai")
+LLM_CASSETTE_MODE = os.getenv("LLM_CASSETTE_MODE", "off")
+LLM_CASSETTE_PATH = os.getenv("LLM_CASSETTE", "llm_cassette.json")
+# Fake latency distribution: "fixed:<s>", "uniform:<lo>,<hi>" or "lognormal:<mu>,<sigma>"
+LLM_FAKE_LATENCY = os.getenv("LLM_FAKE_LATENCY", "fixed:0")
+LLM_FAKE_SEED = int(os.getenv("LLM_FAKE_SEED", "42"))
+
+
+@dataclass
+class LLMResponse:
+    text: str
+    model: str
+    latency: float
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+
+
+def approx_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token) for providers that don't report usage."""
+    return max(1, len(text) // 4) if text else 0
+
+
+class LLMProvider:
+    """Chat-completion backend. Subclasses implement `_complete`; metrics are recorded here."""
+
+    name = "base"
+
+    def complete(self, messages: List[dict], model: str, timeout: Optional[float] = None) -> LLMResponse:
+        started = perf_counter()
+        text, prompt_tokens, completion_tokens = self._complete(messages, model, timeout)
+        latency = perf_counter() - started
+
+        metrics.record_llm_call(model, latency, prompt_tokens, completion_tokens)
+        return LLMResponse(text, model, latency, prompt_tokens, completion_tokens)
+
+    def _complete(self, messages, model, timeout):
+        raise NotImplementedError
+
+
+class OpenAIProvider(LLMProvider):
+    """OpenAI chat completions; the client (and the openai import) is created on first use."""
+
+    name = "openai"
+
+    def __init__(self):
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    from openai import OpenAI
+                    self._client = OpenAI()
+        return self._client
+
+    def _complete(self, messages, model, timeout):
+        kwargs = {"timeout": timeout} if timeout is not None else {}
+        response = self.client.chat.completions.create(model=model, messages=messages, **kwargs)
+        usage = getattr(response, "usage", None)
+        return (
+            response.choices[0].message.content,
+            getattr(usage, "prompt_tokens", 0) or 0,
+            getattr(usage, "completion_tokens", 0) or 0
+        )
+
+
+# Matches TODAY rows in the habit prompt (see prompt.py): Wake Up|08:30|07:30|08:41|completed
+_PROMPT_HABIT = re.compile(r"^([^|\n]+)\|(\d{2}):(\d{2})\|", re.MULTILINE)
+
+
+def echo_habits_responder(messages: List[dict], model: str) -> str:
+    """Default fake reply: one well-formed suggestion per habit in the prompt's TODAY table."""
+    prompt = messages[-1]["content"] if messages else ""
+    today = prompt.split("\nHISTORY", 1)[0]
+    lines = []
+    for habit, hours, minutes in _PROMPT_HABIT.findall(today):
+        total = (int(hours) * 60 + int(minutes) - 10) % 1440
+        lines.append(f"{habit}: {total // 60:02d}:{total % 60:02d}:00 - Start 10 minutes earlier to close the gap to your goal.")
+    return "\n".join(lines) or "No adjustments needed."
+
+
+def parse_latency(spec: str) -> Callable[[random.Random], float]:
+    """Turns a latency spec ("fixed:0.5", "uniform:0.2,1.5", "lognormal:-0.5,0.4") into a sampler."""
+    kind, _, params = spec.partition(":")
+    values = [float(v) for v in params.split(",")] if params else []
+    if kind == "fixed":
+        return lambda rng: values[0] if values else 0.0
+    if kind == "uniform":
+        return lambda rng: rng.uniform(values[0], values[1])
+    if kind == "lognormal":
+        return lambda rng: rng.lognormvariate(values[0], values[1])
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+
+class FakeLLMProvider(LLMProvider):
+    """In-process fake with configurable latency and canned (or computed) responses."""
+
+    name = "fake"
+
+    def __init__(self, response: Optional[str] = None, responder: Optional[Callable] = None,
+                 latency: str = LLM_FAKE_LATENCY, seed: int = LLM_FAKE_SEED):
+        self.response = response
+        self.responder = responder or echo_habits_responder
+        self.sample_latency = parse_latency(latency)
+        self.rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _complete(self, messages, model, timeout):
+        with self._lock:
+            delay = self.sample_latency(self.rng)
+        if timeout is not None and delay > timeout:
+            time.sleep(timeout)
+            raise TimeoutError(f"Fake LLM call exceeded {timeout}s")
+        time.sleep(delay)
+
+        text = self.response if self.response is not None else self.responder(messages, model)
+        prompt = "".join(m.get("content", "") for m in messages)
+        return text, approx_tokens(prompt), approx_tokens(text)
+
+
+class CassetteMiss(LookupError):
+    """Raised in replay mode when a request was never recorded."""
+
+
+class CassetteProvider(LLMProvider):
+    """Record/replay wrapper: `record` calls the inner provider and saves replies, `replay` serves them."""
+
+    def __init__(self, inner: Optional[LLMProvider], path: str, mode: str):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown cassette mode: {mode}")
+        self.inner = inner
+        self.path = path
+        self.mode = mode
+        self.name = f"{mode}:{inner.name if inner else 'cassette'}"
+        self._lock = threading.Lock()
+        self.entries = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                self.entries = json.load(f)
+
+    @staticmethod
+    def key(messages, model):
+        payload = json.dumps({"model": model, "messages": messages}, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _complete(self, messages, model, timeout):
+        key = self.key(messages, model)
+        if self.mode == "replay":
+            entry = self.entries.get(key)
+            if entry is None:
+                raise CassetteMiss(f"No recorded LLM response for this request in {self.path}")
+            return entry["text"], entry["prompt_tokens"], entry["completion_tokens"]
+
+        text, prompt_tokens, completion_tokens = self.inner._complete(messages, model, timeout)
+        with self._lock:
+            self.entries[key] = {"model": model, "text": text, "prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens}
+            with open(self.path, "w") as f:
+                json.dump(self.entries, f, indent=2)
+        return text, prompt_tokens, completion_tokens
+
+
+_provider = None
+_provider_lock = threading.Lock()
+
+
+def build_provider(kind: str = None, cassette_mode: str = None, cassette_path: str = None) -> LLMProvider:
+    """Builds a provider from explicit arguments, falling back to the LLM_* environment settings."""
+    kind = kind or LLM_PROVIDER
+    cassette_mode = cassette_mode or LLM_CASSETTE_MODE
+    cassette_path = cassette_path or LLM_CASSETTE_PATH
+
+    if kind == "openai":
+        provider = OpenAIProvider()
+    elif kind == "fake":
+        provider = FakeLLMProvider()
+    else:
+        raise ValueError(f"Unknown LLM provider: {kind}")
+
+    if cassette_mode == "replay":
+        return CassetteProvider(None, cassette_path, "replay")
+    if cassette_mode == "record":
+        return CassetteProvider(provider, cassette_path, "record")
+    return provider
+
+
+def get_llm_provider() -> LLMProvider:
+    """Process-wide provider, created on first use."""
+    global _provider
+    if _provider is None:
+        with _provider_lock:
+            if _provider is None:
+                _provider = build_provider()
+    return _provider
+
+
+def set_llm_provider(provider: Optional[LLMProvider]):
+    """Swaps the process-wide provider (tests & benchmarks); None resets to the env default."""
+    global _provider
+    _provider = provider
+
+
+def create_stub_app(provider: Optional[LLMProvider] = None):
+    """OpenAI-compatible stub server (POST /v1/chat/completions) backed by a fake provider.
+
+    Run with `python llm.py --port 8099` and point OPENAI_BASE_URL at http://127.0.0.1:8099/v1
+    to benchmark including the real HTTP client.
+    """
+    from fastapi import FastAPI, Request
+
+    provider = provider or FakeLLMProvider()
+    stub = FastAPI()
+
+    @stub.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        from fastapi.concurrency import run_in_threadpool
+
+        body = await request.json()
+        result = await run_in_threadpool(provider.complete, body["messages"], body.get("model", "fake"))
+        return {
+            "id": "chatcmpl-stub",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": result.model,
+            "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": result.text}}],
+            "usage": {
+                "prompt_tokens": result.prompt_tokens,
+                "completion_tokens": result.completion_tokens,
+                "total_tokens": result.prompt_tokens + result.completion_tokens
+            }
+        }
+
+    return stub
+
+
+if __name__ == "__main__":
+    import argparse
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Serve a fake OpenAI-compatible LLM endpoint.")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency", default=LLM_FAKE_LATENCY)
+    args = parser.parse_args()
+    uvicorn.run(create_stub_app(FakeLLMProvider(latency=args.latency)), host="127.0.0.1", port=args.port)
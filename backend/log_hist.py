@@ -1,4 +1,3 @@
-import requests
 import random
 from datetime import datetime, timedelta
 import json
@@ -19,34 +18,46 @@ tasks = [
     {"task_name": "Sleep", "scheduled_time": "02:00:00", "goal_time": "23:30:00"},
 ]
 
-# **Generate historical logs for the past 7 days**
-historical_data = []
-start_date = datetime.utcnow() - timedelta(days=7)
+def random_completion_time(scheduled_time: str, rng=random, jitter_minutes: int = 15):
+    """Returns a completion time ("HH:MM:SS") within ±jitter_minutes of the scheduled time."""
+    scheduled_dt = datetime.strptime(scheduled_time, "%H:%M:%S")
+    random_offset = rng.randint(-jitter_minutes, jitter_minutes) * 60
+    return (scheduled_dt + timedelta(seconds=random_offset)).strftime("%H:%M:%S")
 
-for i in range(7):  # Generate logs for the past 7 days
-    log_date = (start_date + timedelta(days=i)).date()  # ✅ Correct past date
+def generate_historical_logs(user_id: int = 1, days: int = 7, habits=None, start_date=None, rng=random):
+    """Builds `/tasks/log` payload items for `days` days of completed habits."""
+    habits = habits or tasks
+    start_date = start_date or (datetime.utcnow() - timedelta(days=days)).date()
 
-    for task in tasks:
-        # ✅ **Randomize actual log time within ±15 minutes of scheduled time**
-        scheduled_dt = datetime.strptime(task["scheduled_time"], "%H:%M:%S")
-        random_offset = random.randint(-15, 15) * 60  # Randomize within ±15 minutes
-        actual_completed_dt = scheduled_dt + timedelta(seconds=random_offset)
+    historical_data = []
+    for i in range(days):
+        log_date = start_date + timedelta(days=i)  # ✅ Correct past date
 
-        historical_data.append({
-            "user_id": 1,
-            "task_name": task["task_name"],
-            "completed": True,
-            "actual_completed_time": actual_completed_dt.strftime("%H:%M:%S"),
-            "log_date": log_date.strftime("%Y-%m-%d")  # ✅ Ensure correct date is sent
-        })
+        for task in habits:
+            # ✅ **Randomize actual log time within ±15 minutes of scheduled time**
+            historical_data.append({
+                "user_id": user_id,
+                "task_name": task["task_name"],
+                "completed": True,
+                "actual_completed_time": random_completion_time(task["scheduled_time"], rng),
+                "log_date": log_date.strftime("%Y-%m-%d")  # ✅ Ensure correct date is sent
+            })
 
-# **Check output before sending**
-print(json.dumps({"tasks": historical_data}, indent=4))
+    return historical_data
 
-# **Send request to API**
-response = requests.post(API_URL, json={"tasks": historical_data})
+if __name__ == "__main__":
+    import requests  # Only needed when posting to a running API
 
-# **Check API response**
-print("Status Code:", response.status_code)
-print("Response:", response.json())
+    # **Generate historical logs for the past 7 days**
+    historical_data = generate_historical_logs(user_id=1, days=7)
+
+    # **Check output before sending**
+    print(json.dumps({"tasks": historical_data}, indent=4))
+
+    # **Send request to API**
+    response = requests.post(API_URL, json={"tasks": historical_data})
+
+    # **Check API response**
+    print("Status Code:", response.status_code)
+    print("Response:", response.json())
 
@@ -0,0 +1,330 @@
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from time import perf_counter
+
+from sqlalchemy import event
+
+# Default latency buckets (seconds)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Buckets for "how many queries did this request run"
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 250, 1000)
+# Buckets for long-running batch jobs (seconds)
+JOB_BUCKETS = (0.1, 0.5, 1.0, 5.0, 15.0, 60.0, 300.0, 900.0, 3600.0)
+
+
+def _label_key(labelnames, labels):
+    return tuple(str(labels.get(name, "")) for name in labelnames)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labelnames, key, extra=None):
+    pairs = list(zip(labelnames, key)) + (extra or [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class Counter:
+    """Monotonic counter with optional labels."""
+
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(_label_key(self.labelnames, labels), 0)
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield self.name, _format_labels(self.labelnames, key), value
+
+
+class Gauge(Counter):
+    """Value that can go up and down."""
+
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus style."""
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # key -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = _label_key(self.labelnames, labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def snapshot(self, **labels):
+        """Returns (count, sum) for one label set."""
+        series = self._series.get(_label_key(self.labelnames, labels))
+        if not series:
+            return 0, 0.0
+        return sum(series[:-1]), series[-1]
+
+    def samples(self):
+        with self._lock:
+            items = [(key, list(series)) for key, series in self._series.items()]
+        for key, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series[:-1]):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(float(bound))
+                yield f"{self.name}_bucket", _format_labels(self.labelnames, key, [("le", le)]), cumulative
+            yield f"{self.name}_count", _format_labels(self.labelnames, key), cumulative
+            yield f"{self.name}_sum", _format_labels(self.labelnames, key), series[-1]
+
+
+class Registry:
+    """Holds metrics and renders them in the Prometheus text exposition format."""
+
+    def __init__(self):
+        self._metrics = {}
+
+    def register(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{labels} {value}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+# ✅ HTTP
+http_request_duration = registry.histogram(
+    "http_request_duration_seconds", "Request latency by route template.", ("method", "route", "status"))
+
+# ✅ Database
+db_queries_total = registry.counter("db_queries_total", "SQL statements executed.")
+db_read_sessions_total = registry.counter("db_read_sessions_total", "Read-only request sessions by target (replica, primary, sticky).", ("target",))
+db_query_duration = registry.histogram("db_query_duration_seconds", "Latency of individual SQL statements.")
+db_queries_per_request = registry.histogram(
+    "db_queries_per_request", "SQL statements executed per request.", ("route",), QUERY_COUNT_BUCKETS)
+db_time_per_request = registry.histogram(
+    "db_time_per_request_seconds", "Total SQL time spent per request.", ("route",))
+
+# ✅ Cache
+cache_requests_total = registry.counter("cache_requests_total", "Cache lookups by result.", ("cache", "result"))
+
+# ✅ LLM
+llm_request_duration = registry.histogram(
+    "llm_request_duration_seconds", "LLM call latency.", ("model",), (0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 20.0, 30.0, 60.0))
+llm_tokens_total = registry.counter("llm_tokens_total", "LLM tokens consumed.", ("model", "kind"))
+llm_prompt_tokens = registry.histogram(
+    "llm_prompt_tokens", "Prompt size in tokens as built (before the call).", ("prompt",), (100, 250, 500, 1000, 2000, 4000, 8000))
+llm_route_total = registry.counter("llm_route_total", "Habit suggestion calls by routing tier and outcome.", ("tier", "outcome"))
+llm_route_duration = registry.histogram(
+    "llm_route_duration_seconds", "Habit suggestion latency by routing tier.", ("tier",), (0.001, 0.01, 0.1, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0, 60.0))
+llm_cost_dollars_total = registry.counter("llm_cost_dollars_total", "Estimated LLM spend (USD) by tier and model.", ("tier", "model"))
+
+# ✅ Export
+export_rows_total = registry.counter("export_rows_total", "Rows streamed by history exports.", ("table",))
+
+# ✅ Cache warmer
+cache_warm_total = registry.counter("cache_warm_total", "Schedules pre-warmed ahead of local mornings, by result (loaded, generated).", ("result",))
+
+# ✅ Write-behind ingestion (task logs)
+ingest_enqueued_total = registry.counter("ingest_enqueued_total", "Task log events appended to the ingestion queue.")
+ingest_flushed_total = registry.counter("ingest_flushed_total", "Task log events flushed to the database (before coalescing).")
+ingest_rows_written_total = registry.counter("ingest_rows_written_total", "Rows written by ingestion flushes, after coalescing.", ("op",))
+ingest_dead_lettered_total = registry.counter("ingest_dead_lettered_total", "Task log events moved to the dead-letter queue.")
+ingest_queue_depth = registry.gauge("ingest_queue_depth", "Task log events waiting in the ingestion queue.")
+ingest_flush_lag = registry.histogram(
+    "ingest_flush_lag_seconds", "Age of the oldest event in each flushed batch.", (), (0.1, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0, 60.0, 300.0))
+ingest_flush_duration = registry.histogram("ingest_flush_duration_seconds", "Time to apply & commit one ingestion batch.")
+
+# ✅ Scheduler jobs
+job_duration = registry.histogram("job_duration_seconds", "Background job duration.", ("job", "status"), JOB_BUCKETS)
+job_phase_duration = registry.histogram(
+    "job_phase_duration_seconds", "Background job time by phase.", ("job", "phase"), JOB_BUCKETS)
+
+
+# Per-request SQL statistics: [statement count, total seconds]
+_request_db_stats: ContextVar = ContextVar("request_db_stats", default=None)
+
+
+def instrument_engine(engine):
+    """Hooks SQLAlchemy cursor events to count & time every statement on `engine`."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_query_start", []).append((cursor, perf_counter()))
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = perf_counter() - conn.info["metrics_query_start"].pop()[1]
+        db_queries_total.inc()
+        db_query_duration.observe(elapsed)
+        stats = _request_db_stats.get()
+        if stats is not None:
+            stats[0] += 1
+            stats[1] += elapsed
+
+    @event.listens_for(engine, "handle_error")
+    def _handle_error(context):
+        # A failed statement never reaches after_cursor_execute: drop its start time from the pooled connection
+        starts = context.connection.info.get("metrics_query_start") if context.connection is not None else None
+        cursor = context.execution_context.cursor if context.execution_context is not None else None
+        if starts and cursor is not None and starts[-1][0] is cursor:  # fetch errors come after the pop
+            starts.pop()
+
+
+# Phase timings ({phase: seconds}) for the job running in the current context
+_job_phases: ContextVar = ContextVar("job_phases", default=None)
+
+
+@contextmanager
+def job_phase(job, phase):
+    """Times one phase (read/delete/insert/commit...) of a `timed_job`; repeated slices add up."""
+    started = perf_counter()
+    try:
+        yield
+    finally:
+        phases = _job_phases.get()
+        if phases is not None:
+            phases[phase] = phases.get(phase, 0.0) + perf_counter() - started
+
+
+@contextmanager
+def record_job_phases():
+    """Collects {phase: seconds} from every `timed_job` run inside the block (used by benchmarks)."""
+    phases = {}
+    token = _job_phases.set(phases)
+    try:
+        yield phases
+    finally:
+        _job_phases.reset(token)
+
+
+def record_cache(cache, hit):
+    """Counts one cache lookup."""
+    cache_requests_total.inc(cache=cache, result="hit" if hit else "miss")
+
+
+def record_llm_call(model, seconds, prompt_tokens=0, completion_tokens=0):
+    """Records latency and token usage for an LLM call."""
+    llm_request_duration.observe(seconds, model=model)
+    llm_tokens_total.inc(prompt_tokens, model=model, kind="prompt")
+    llm_tokens_total.inc(completion_tokens, model=model, kind="completion")
+
+
+def record_prompt(prompt, tokens):
+    """Records the size of a built prompt."""
+    llm_prompt_tokens.observe(tokens, prompt=prompt)
+
+
+def record_route(tier, model, seconds, cost, outcome):
+    """Records one routed habit-suggestion attempt (outcome: ok | timeout | error)."""
+    llm_route_total.inc(tier=tier, outcome=outcome)
+    llm_route_duration.observe(seconds, tier=tier)
+    if cost:
+        llm_cost_dollars_total.inc(cost, tier=tier, model=model)
+
+
+def timed_job(name):
+    """Decorator recording a background job's duration (labelled by outcome) and its phase totals."""
+
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            outer = _job_phases.get()
+            phases = {}
+            token = _job_phases.set(phases)
+            started = perf_counter()
+            status = "error"
+            try:
+                result = func(*args, **kwargs)
+                status = "ok"
+                return result
+            finally:
+                _job_phases.reset(token)
+                job_duration.observe(perf_counter() - started, job=name, status=status)
+                for phase, seconds in phases.items():
+                    job_phase_duration.observe(seconds, job=name, phase=phase)
+                    if outer is not None:
+                        outer[phase] = outer.get(phase, 0.0) + seconds
+        return wrapper
+    return decorator
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording per-route latency and per-request SQL usage."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = perf_counter()
+        stats = [0, 0.0]
+        token = _request_db_stats.set(stats)
+        response = {"status": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _request_db_stats.reset(token)
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            http_request_duration.observe(perf_counter() - started, method=scope["method"], route=route, status=response["status"])
+            db_queries_per_request.observe(stats[0], route=route)
+            db_time_per_request.observe(stats[1], route=route)
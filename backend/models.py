@@ -1,7 +1,8 @@
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, DateTime, JSON, Float, Time, Date, UniqueConstraint
+from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, DateTime, JSON, Float, Time, Date, UniqueConstraint, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime, time, date, timezone
 from database import Base, engine  # Importing Base and engine from database.py
+from time_storage import clock_type, instant_type, clock_minute_property, instant_minute_property  # ✅ TIME_STORAGE encoding
 import pytz
 
 # User Table
@@ -20,44 +21,59 @@ class BaselineSchedule(Base):
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     task_name = Column(String, nullable=False)
-    scheduled_time = Column(Time, nullable=False)  # ✅ Stored in UTC
-    goal_time = Column(Time, nullable=True)  # ✅ Stored in UTC
+    scheduled_time = Column(clock_type(), nullable=False)  # ✅ Stored in UTC
+    goal_time = Column(clock_type(), nullable=True)  # ✅ Stored in UTC
     user_timezone = Column(String, nullable=False)  # ✅ Store user's timezone at the time of input
     created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
 
     user = relationship("User", back_populates="baseline_schedule")  # ✅ This makes the relationship bi-directional
+    scheduled_minute = clock_minute_property("scheduled_time")  # ✅ Minute-of-day (UTC), in Python & SQL
+    goal_minute = clock_minute_property("goal_time")
 
 # Daily Schedule Table
 class DailySchedule(Base):
     __tablename__ = "daily_schedules"
+    __table_args__ = (
+        Index("ix_daily_schedules_user_date", "user_id", "log_date"),  # ✅ Serves per-user date range scans
+    )
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     task_name = Column(String, nullable=False)
-    scheduled_time = Column(Time, nullable=True)
-    previous_scheduled_time = Column(Time, nullable=True)  # ✅ NEW COLUMN
-    goal_time = Column(Time, nullable=True)
+    scheduled_time = Column(clock_type(), nullable=True)
+    previous_scheduled_time = Column(clock_type(), nullable=True)  # ✅ NEW COLUMN
+    goal_time = Column(clock_type(), nullable=True)
     log_date = Column(Date, nullable=False)
     status = Column(String, default="pending")
     user_timezone = Column(String, nullable=False)
-    actual_completed_time = Column(DateTime(timezone=True), nullable=True)
+    actual_completed_time = Column(instant_type(), nullable=True)
     created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
 
     user = relationship("User", back_populates="daily_schedules")
+    scheduled_minute = clock_minute_property("scheduled_time")
+    previous_scheduled_minute = clock_minute_property("previous_scheduled_time")
+    goal_minute = clock_minute_property("goal_time")
+    actual_completed_minute = instant_minute_property("actual_completed_time")
 
 # Tasks Table
 class Task(Base):
     __tablename__ = "tasks"
+    __table_args__ = (
+        Index("ix_tasks_user_task_date", "user_id", "task_name", "log_date"),  # ✅ Serves the next-day anti-join
+    )
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     task_name = Column(String, nullable=False)
-    scheduled_time = Column(Time, nullable=True)  # ✅ From the daily schedule
-    goal_time = Column(Time, nullable=True)  # ✅ What user wants to aim for
-    actual_completed_time = Column(DateTime(timezone=True), nullable=True)  # ✅ When user actually did it
+    scheduled_time = Column(clock_type(), nullable=True)  # ✅ From the daily schedule
+    goal_time = Column(clock_type(), nullable=True)  # ✅ What user wants to aim for
+    actual_completed_time = Column(instant_type(), nullable=True)  # ✅ When user actually did it
     log_date = Column(Date, nullable=False)  # ✅ The date user logged this
     ad_hoc = Column(Boolean, default=False)  # ✅ If this was not originally scheduled
     completed = Column(Boolean, default=False)  # ✅ Did user complete it?
     created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
     user = relationship("User", back_populates="tasks")
+    scheduled_minute = clock_minute_property("scheduled_time")
+    goal_minute = clock_minute_property("goal_time")
+    actual_completed_minute = instant_minute_property("actual_completed_time")
 
 
 # AI Habit Adjustments 
@@ -67,13 +83,15 @@ class HabitAdjustment(Base):
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     habit = Column(String, nullable=False)
     log_date = Column(Date, nullable=False)  # ✅ Tracks which day this adjustment is for
-    current_value = Column(Time, nullable=False)  # ✅ Matches `daily_schedules`
-    suggested_value = Column(Time, nullable=False)
+    current_value = Column(clock_type(), nullable=False)  # ✅ Matches `daily_schedules`
+    suggested_value = Column(clock_type(), nullable=False)
     reason = Column(String, nullable=False)
     status = Column(String, default="pending")  # pending, accepted, rejected
     current_status = Column(String, default="pending")  # ✅ Matches `daily_schedules.status`
     created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
     user = relationship("User", back_populates="habit_adjustments")
+    current_minute = clock_minute_property("current_value")
+    suggested_minute = clock_minute_property("suggested_value")
 
 # Schedule Adjustments
 class ScheduleAdjustment(Base):
@@ -82,12 +100,30 @@ class ScheduleAdjustment(Base):
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     task_name = Column(String, nullable=False)
-    previous_scheduled_time = Column(Time, nullable=True)  
-    new_scheduled_time = Column(Time, nullable=False)  
+    previous_scheduled_time = Column(clock_type(), nullable=True)  
+    new_scheduled_time = Column(clock_type(), nullable=False)  
     adjustment_reason = Column(String, nullable=False)
     log_date = Column(DateTime, nullable=False)  
     created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
     user = relationship("User", back_populates="schedule_adjustments")
+    previous_scheduled_minute = clock_minute_property("previous_scheduled_time")
+    new_scheduled_minute = clock_minute_property("new_scheduled_time")
+
+# Daily Schedule Read Model (derived from daily_schedules by the write paths; see read_model.py)
+class DailyScheduleView(Base):
+    __tablename__ = "daily_schedule_views"
+    user_id = Column(Integer, primary_key=True, autoincrement=False)
+    log_date = Column(Date, primary_key=True)
+    schedule = Column(JSON, nullable=False)  # ✅ [[task_name, scheduled_second_utc, goal_second_utc, status], ...]
+    updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+
+# Shard Directory (catalog database only; see sharding.py)
+class ShardBucket(Base):
+    __tablename__ = "shard_buckets"
+    bucket = Column(Integer, primary_key=True, autoincrement=False)
+    shard = Column(Integer, nullable=False)
+    moving = Column(Boolean, default=False, nullable=False)  # ✅ Writes to the bucket's users are refused while True
+    updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
 
 # ✅ Add relationships in User model
 User.baseline_schedule = relationship("BaselineSchedule", back_populates="user", cascade="all, delete-orphan")
@@ -0,0 +1,183 @@
+import os
+import re
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+
+from sqlalchemy import event
+
+# ✅ Opt-in: SQL_PROFILE=true profiles every request (header + log line)
+PROFILE_ENABLED = os.getenv("SQL_PROFILE", "false").lower() == "true"
+# A statement fingerprint repeated this many times in one request is flagged as N+1
+N_PLUS_ONE_THRESHOLD = int(os.getenv("SQL_PROFILE_N1_THRESHOLD", "5"))
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER_LIST = re.compile(r"\(\s*(?:\?|%\(\w+\)s|:\w+|\$\d+)(?:\s*,\s*(?:\?|%\(\w+\)s|:\w+|\$\d+))*\s*\)")
+_BIND_PARAM = re.compile(r"%\(\w+\)s|:\w+|\$\d+")
+_WHITESPACE = re.compile(r"\s+")
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Raised by `query_budget` when profiled code goes over its budget."""
+
+
+def fingerprint(statement: str) -> str:
+    """Normalises a SQL statement so repeated executions with different values compare equal."""
+    normalised = _STRING_LITERAL.sub("?", statement)
+    normalised = _BIND_PARAM.sub("?", normalised)
+    normalised = _NUMBER_LITERAL.sub("?", normalised)
+    normalised = _PLACEHOLDER_LIST.sub("(?)", normalised)
+    return _WHITESPACE.sub(" ", normalised).strip().lower()
+
+
+class QueryProfile:
+    """Statement counts & timings collected for one request (or one `query_budget` block)."""
+
+    def __init__(self, label: str = ""):
+        self.label = label
+        self.count = 0
+        self.total_time = 0.0
+        self.fingerprints = Counter()
+        self.fingerprint_time = Counter()
+
+    def record(self, statement: str, seconds: float):
+        key = fingerprint(statement)
+        self.count += 1
+        self.total_time += seconds
+        self.fingerprints[key] += 1
+        self.fingerprint_time[key] += seconds
+
+    def repeated(self, threshold: int = N_PLUS_ONE_THRESHOLD):
+        """Fingerprints executed at least `threshold` times, most frequent first."""
+        return [(key, n) for key, n in self.fingerprints.most_common() if n >= threshold]
+
+    def summary(self):
+        return {
+            "label": self.label,
+            "queries": self.count,
+            "time_ms": round(self.total_time * 1000, 2),
+            "distinct": len(self.fingerprints),
+            "n_plus_one": [{"statement": key, "count": n, "time_ms": round(self.fingerprint_time[key] * 1000, 2)} for key, n in self.repeated()]
+        }
+
+    def header_value(self):
+        return f"queries={self.count};time_ms={self.total_time * 1000:.2f};distinct={len(self.fingerprints)};n_plus_one={len(self.repeated())}"
+
+
+# Profiles receiving statements in the current context (a request and/or enclosing budget blocks)
+_active_profiles: ContextVar = ContextVar("active_query_profiles", default=())
+# Collectors from `query_budget` blocks; request profiles are handed to them when the request ends
+_collectors = []
+_collectors_lock = threading.Lock()
+
+
+def instrument_engine(engine):
+    """Feeds every statement executed on `engine` into the active query profiles."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if _active_profiles.get():
+            conn.info.setdefault("profiler_query_start", []).append((cursor, perf_counter()))
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        profiles = _active_profiles.get()
+        if profiles and conn.info.get("profiler_query_start"):
+            elapsed = perf_counter() - conn.info["profiler_query_start"].pop()[1]
+            for profile in profiles:
+                profile.record(statement, elapsed)
+
+    @event.listens_for(engine, "handle_error")
+    def _handle_error(context):
+        # Statements that raise skip after_cursor_execute; their start would pair with the next one
+        starts = context.connection.info.get("profiler_query_start") if context.connection is not None else None
+        cursor = context.execution_context.cursor if context.execution_context is not None else None
+        if starts and cursor is not None and starts[-1][0] is cursor:  # fetch errors come after the pop
+            starts.pop()
+
+
+@contextmanager
+def profile_queries(label: str = ""):
+    """Profiles statements executed in the current context (e.g. a batch job run directly)."""
+    profile = QueryProfile(label)
+    token = _active_profiles.set(_active_profiles.get() + (profile,))
+    try:
+        yield profile
+    finally:
+        _active_profiles.reset(token)
+
+
+@contextmanager
+def query_budget(max_queries: int = None, max_repeats: int = None, route: str = None):
+    """Test helper: fails if profiled code or any request served meanwhile goes over budget.
+
+    Statements run directly inside the block are profiled, and so is every HTTP request
+    completed while it is open (e.g. through TestClient). `route` restricts request checks
+    to one route template. `max_repeats` caps how often one statement fingerprint may run.
+
+        with query_budget(max_queries=6, route="/daily_schedule/generate/{user_id}"):
+            client.post("/daily_schedule/generate/1")
+    """
+    collected = []
+    with _collectors_lock:
+        _collectors.append(collected)
+    try:
+        with profile_queries("direct") as direct:
+            yield collected
+    finally:
+        with _collectors_lock:
+            _collectors.remove(collected)
+
+    profiles = [p for p in collected if route is None or p.label.endswith(" " + route)]
+    if route is None and direct.count:
+        profiles.append(direct)
+
+    failures = []
+    for profile in profiles:
+        if max_queries is not None and profile.count > max_queries:
+            failures.append(f"{profile.label}: {profile.count} queries (budget {max_queries})")
+        if max_repeats is not None:
+            for key, n in profile.repeated(max_repeats + 1):
+                failures.append(f"{profile.label}: statement repeated {n}x (budget {max_repeats}): {key[:160]}")
+    if failures:
+        raise QueryBudgetExceeded("Query budget exceeded:\n" + "\n".join(failures))
+
+
+class SQLProfilerMiddleware:
+    """ASGI middleware attaching an `X-SQL-Profile` header and log line to profiled requests."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not (PROFILE_ENABLED or _collectors):
+            await self.app(scope, receive, send)
+            return
+
+        profile = QueryProfile()
+        token = _active_profiles.set(_active_profiles.get() + (profile,))
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [(b"x-sql-profile", profile.header_value().encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _active_profiles.reset(token)
+            route = getattr(scope.get("route"), "path", None) or scope["path"]
+            profile.label = f"{scope['method']} {route}"
+
+            if PROFILE_ENABLED:
+                print(f"🔍 {profile.label}: {profile.count} queries in {profile.total_time * 1000:.1f} ms")
+                for key, n in profile.repeated():
+                    print(f"   ⚠️ N+1 suspect ({n}x): {key[:160]}")
+
+            with _collectors_lock:
+                for collected in _collectors:
+                    collected.append(profile)
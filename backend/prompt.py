@@ -0,0 +1,114 @@
+import os
+import threading
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+import metrics
+from llm import approx_tokens
+
+# ✅ Prompt settings: token budget for the user message & how much history to summarise
+AI_PROMPT_TOKEN_BUDGET = int(os.getenv("AI_PROMPT_TOKEN_BUDGET", "1200"))
+AI_HISTORY_DAYS = int(os.getenv("AI_HISTORY_DAYS", "28"))
+
+# Static instructions, identical on every call (kept out of the per-user message so providers can cache it)
+SYSTEM_PROMPT = """You are a habit improvement coach.
+The user message has two pipe-separated tables; all times are UTC, 24h HH:MM.
+TODAY: habit|sched|goal|done|status (done is the completion time, - if none).
+HISTORY: habit|days|done%|ontime%|drift|trend|streak where drift is the mean minutes the habit was completed after its goal (negative = before), trend is the change in drift per day and streak is consecutive days completed.
+Suggest new scheduled times only for habits that need one, one per line, exactly in the form:
+Habit Name: HH:MM:SS - short reason
+No other text."""
+
+_encoders = {}
+_encoder_lock = threading.Lock()
+
+
+def _encoder(model: str):
+    """tiktoken encoder for `model` (cached); None if tiktoken isn't installed."""
+    if model not in _encoders:
+        with _encoder_lock:
+            if model not in _encoders:
+                try:
+                    import tiktoken
+                    try:
+                        _encoders[model] = tiktoken.encoding_for_model(model)
+                    except KeyError:
+                        _encoders[model] = tiktoken.get_encoding("cl100k_base")
+                except ImportError:
+                    _encoders[model] = None
+    return _encoders[model]
+
+
+def count_tokens(text: str, model: str = "gpt-4") -> int:
+    """Exact token count with tiktoken when available, otherwise the ~4 chars/token estimate."""
+    encoder = _encoder(model)
+    return len(encoder.encode(text)) if encoder is not None else approx_tokens(text)
+
+
+def _clock(value) -> str:
+    return value.strftime("%H:%M") if value is not None else "-"
+
+
+def _pct(value) -> str:
+    return str(round(value * 100)) if value is not None else "-"
+
+
+def _signed(value) -> str:
+    return f"{value:+g}" if value is not None else "-"
+
+
+@dataclass
+class BuiltPrompt:
+    messages: List[dict]
+    tokens: int
+    habits: int
+    history_habits: int
+    dropped: List[str] = field(default_factory=list)
+
+
+def build_habit_prompt(today_rows, habit_stats: Optional[List[dict]], history_days: int = AI_HISTORY_DAYS,
+                       token_budget: int = AI_PROMPT_TOKEN_BUDGET, model: str = "gpt-4") -> BuiltPrompt:
+    """Builds the habit-coaching messages from today's rows & per-habit aggregates (analytics.compute_analytics).
+
+    today_rows: (task_name, scheduled_time, goal_time, actual_completed_time, status) tuples.
+    When the user message exceeds `token_budget`, history rows for the habits closest to their goal
+    go first, then today's rows from the end, so the most actionable habits are always kept.
+    """
+    today = [
+        f"{name}|{_clock(scheduled)}|{_clock(goal)}|{_clock(completed)}|{status}"
+        for name, scheduled, goal, completed, status in today_rows
+    ]
+
+    # Largest absolute drift first: those are the rows worth keeping under a tight budget
+    ranked = sorted(habit_stats or [], key=lambda h: -abs(h["mean_drift_minutes"] or 0))
+    history = [
+        f"{h['task_name']}|{h['scheduled']}|{_pct(h['completion_rate'])}|{_pct(h['on_time_rate'])}|"
+        f"{_signed(h['mean_drift_minutes'])}|{_signed(h['drift_trend_minutes_per_day'])}|{h['current_streak']}"
+        for h in ranked
+    ]
+
+    def render():
+        parts = ["TODAY", *today]
+        if history:
+            parts += [f"HISTORY {history_days}d", *history]
+        return "\n".join(parts)
+
+    dropped = []
+    content = render()
+    tokens = count_tokens(content, model)
+    while tokens > token_budget and (history or len(today) > 1):
+        dropped.append((history or today).pop().split("|", 1)[0])
+        content = render()
+        tokens = count_tokens(content, model)
+
+    built = BuiltPrompt(
+        messages=[{"role": "system", "content": SYSTEM_PROMPT}, {"role": "user", "content": content}],
+        tokens=count_tokens(SYSTEM_PROMPT, model) + tokens,
+        habits=len(today),
+        history_habits=len(history),
+        dropped=dropped
+    )
+    metrics.record_prompt("habit_adjustments", built.tokens)
+    print(f"🧠 Habit prompt: {built.tokens} tokens ({built.habits} habits today, {built.history_habits} with history"
+          + (f", dropped {len(dropped)} rows for budget {token_budget})" if dropped else ")"))
+    return built
@@ -0,0 +1,183 @@
+# Per-(user, day) schedule read model: the rendered daily schedule with times as UTC second-of-day,
+# maintained in the same transaction by every path that writes daily_schedules. With Redis available the
+# views are also cached (written through on commit, pre-loaded by warmer.py).
+#
+#   python read_model.py --days 7     # backfill views for the last 7 days (and everything after)
+import argparse
+import json
+import os
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import delete, event, insert, tuple_
+from sqlalchemy.orm import Session
+
+import metrics
+import runtime
+from models import DailySchedule, DailyScheduleView
+from utils import second_of_day
+
+# Keys refreshed per statement (bounds IN-list sizes in the nightly job)
+REFRESH_CHUNK = 1000
+# ✅ View cache (Redis only: per-process copies could not be kept in step with other workers' writes)
+SCHEDULE_CACHE_ENABLED = os.getenv("SCHEDULE_CACHE_ENABLED", "true").lower() == "true"
+SCHEDULE_CACHE_TTL = int(os.getenv("SCHEDULE_CACHE_TTL", str(2 * 24 * 3600)))
+
+
+def render(rows) -> List[list]:
+    """Rows of (task_name, scheduled_time, goal_time, status), in schedule order, as the stored view."""
+    return [[task_name, second_of_day(scheduled), second_of_day(goal), status] for task_name, scheduled, goal, status in rows]
+
+
+def _schedule_rows(db: Session, user_ids, log_dates):
+    """(user_id, log_date, task_name, scheduled_time, goal_time, status) rows."""
+    return db.query(
+        DailySchedule.user_id, DailySchedule.log_date,
+        DailySchedule.task_name, DailySchedule.scheduled_time, DailySchedule.goal_time, DailySchedule.status
+    ).filter(
+        DailySchedule.user_id.in_(user_ids),
+        DailySchedule.log_date.in_(log_dates)
+    ).order_by(DailySchedule.id)
+
+
+def refresh(db: Session, keys: Iterable[Tuple[int, date]]) -> int:
+    """Re-renders the views of the given (user_id, log_date) keys from daily_schedules; the caller commits.
+
+    A key whose day has no tasks left loses its view. Returns the number of views written.
+    """
+    keys = list(set(keys))
+    if not keys:
+        return 0
+    db.flush()  # pending ORM inserts/updates must be visible to the read below
+
+    table = DailyScheduleView.__table__
+    conn = db.connection()
+    written = 0
+    now = datetime.now(timezone.utc)
+    for start in range(0, len(keys), REFRESH_CHUNK):
+        chunk = keys[start:start + REFRESH_CHUNK]
+        wanted = set(chunk)
+        grouped = {}
+        for row in _schedule_rows(db, {k[0] for k in chunk}, {k[1] for k in chunk}):
+            if (row.user_id, row.log_date) in wanted:
+                grouped.setdefault((row.user_id, row.log_date), []).append(row[2:])
+        grouped = {key: render(rows) for key, rows in grouped.items()}
+
+        conn.execute(delete(table).where(tuple_(table.c.user_id, table.c.log_date).in_(chunk)))
+        if grouped:
+            conn.execute(insert(table), [
+                {"user_id": user_id, "log_date": log_date, "schedule": schedule, "updated_at": now}
+                for (user_id, log_date), schedule in grouped.items()
+            ])
+        written += len(grouped)
+        pending = db.info.setdefault("schedule_views", {})
+        for key in chunk:
+            pending[key] = grouped.get(key)
+    return written
+
+
+# ✅ Cache: write-through once the transaction that refreshed the views commits
+def _cache():
+    return runtime.get_redis() if SCHEDULE_CACHE_ENABLED else None
+
+
+def _key(user_id: int, log_date: date) -> str:
+    return f"{runtime.CACHE_PREFIX}:schedule_view:{user_id}:{log_date.isoformat()}"
+
+
+def cache_put(views: Dict[Tuple[int, date], Optional[List[list]]]):
+    """Stores (or, for None, drops) cached views in one pipelined round trip. Never raises: runs after commits."""
+    client = _cache()
+    if client is None or not views:
+        return
+    import redis
+
+    try:
+        pipe = client.pipeline(transaction=False)
+        for (user_id, log_date), schedule in views.items():
+            if schedule is None:
+                pipe.delete(_key(user_id, log_date))
+            else:
+                pipe.setex(_key(user_id, log_date), SCHEDULE_CACHE_TTL, json.dumps(schedule))
+        pipe.execute()
+    except redis.RedisError as e:
+        print(f"❌ Schedule view cache write failed ({len(views)} views): {e}")
+
+
+@event.listens_for(Session, "after_commit")
+def _write_through(session):
+    views = session.info.pop("schedule_views", None)
+    if views:
+        cache_put(views)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard(session):
+    session.info.pop("schedule_views", None)
+
+
+def load(db: Session, user_id: int, log_date: date) -> Optional[List[list]]:
+    """The cached view, else the stored one (one primary-key lookup), else daily_schedules rendered on the fly."""
+    client = _cache()
+    if client is not None:
+        import redis
+
+        try:
+            raw = client.get(_key(user_id, log_date))
+        except redis.RedisError as e:
+            print(f"❌ Schedule view cache read failed, using the stored view: {e}")
+            client, raw = None, None
+        else:
+            metrics.record_cache("schedule_view_cache", raw is not None)
+        if raw is not None:
+            return json.loads(raw)
+
+    view = db.get(DailyScheduleView, (user_id, log_date))
+    metrics.record_cache("daily_schedule_view", view is not None)
+    if view is not None:
+        if client is not None:
+            cache_put({(user_id, log_date): view.schedule})
+        return view.schedule
+    schedule = render(row[2:] for row in _schedule_rows(db, [user_id], [log_date]))
+    return schedule or None
+
+
+def _local(seconds: Optional[int], offset_minutes: int) -> Optional[time]:
+    if seconds is None:
+        return None
+    seconds = (seconds + offset_minutes * 60) % 86400
+    return time(seconds // 3600, seconds // 60 % 60, seconds % 60)
+
+
+def localise(schedule: List[list], offset_minutes: int) -> List[dict]:
+    """Schedule entries with times shifted from UTC by a constant offset."""
+    return [{
+        "task_name": task_name,
+        "scheduled_time": _local(scheduled, offset_minutes),
+        "goal_time": _local(goal, offset_minutes),
+        "status": status
+    } for task_name, scheduled, goal, status in schedule]
+
+
+def backfill(db: Session, since: date) -> int:
+    """Refreshes the views of every (user, day) scheduled from `since` onwards; commits."""
+    keys = db.query(DailySchedule.user_id, DailySchedule.log_date).filter(DailySchedule.log_date >= since).distinct().all()
+    written = refresh(db, [tuple(key) for key in keys])
+    db.commit()
+    return written
+
+
+def main(argv=None):
+    import sharding
+
+    parser = argparse.ArgumentParser(description="Backfill the daily schedule read model.")
+    parser.add_argument("--days", type=int, default=7, help="Days back from today to rebuild")
+    args = parser.parse_args(argv)
+
+    since = date.today() - timedelta(days=args.days)
+    written = sum(sharding.fan_out(lambda db, shard: backfill(db, since)))
+    print(f"✅ Rebuilt {written} daily schedule views since {since}")
+
+
+if __name__ == "__main__":
+    main()
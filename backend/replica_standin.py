@@ -0,0 +1,60 @@
+# Local read-replica stand-in for SQLite: periodically copies the primary database into one or more
+# replica files, so replica routing & read-your-writes stickiness can be exercised without Postgres.
+# The copy interval plays the part of replication lag.
+#
+#   DATABASE_URL=sqlite:///primary.db READ_REPLICA_URLS=sqlite:///replica.db python replica_standin.py --interval 2
+#
+# For Postgres use real streaming replicas and point READ_REPLICA_URLS at them.
+import argparse
+import os
+import sqlite3
+import time
+
+from sqlalchemy.engine import make_url
+
+
+def sqlite_path(url: str) -> str:
+    parsed = make_url(url)
+    if not parsed.drivername.startswith("sqlite") or not parsed.database:
+        raise ValueError(f"Not a file-backed SQLite URL: {url}")
+    return parsed.database
+
+
+def sync_once(primary: str, replicas):
+    """Copies a consistent snapshot of `primary` into every replica file (SQLite online backup)."""
+    source = sqlite3.connect(primary)
+    try:
+        for replica in replicas:
+            target = sqlite3.connect(replica)
+            try:
+                source.backup(target)
+            finally:
+                target.close()
+    finally:
+        source.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mirror a SQLite primary into replica files on an interval.")
+    parser.add_argument("--primary", default=os.getenv("DATABASE_URL"), help="Primary SQLite URL (default: DATABASE_URL)")
+    parser.add_argument("--replica", action="append", help="Replica SQLite URL; repeatable (default: READ_REPLICA_URLS)")
+    parser.add_argument("--interval", type=float, default=2.0, help="Seconds between copies (simulated replication lag)")
+    parser.add_argument("--once", action="store_true", help="Copy once and exit")
+    args = parser.parse_args(argv)
+
+    replica_urls = args.replica or [u.strip() for u in os.getenv("READ_REPLICA_URLS", "").split(",") if u.strip()]
+    if not args.primary or not replica_urls:
+        parser.error("A primary URL and at least one replica URL are required.")
+    primary = sqlite_path(args.primary)
+    replicas = [sqlite_path(url) for url in replica_urls]
+
+    while True:
+        sync_once(primary, replicas)
+        print(f"✅ Replicated {primary} -> {', '.join(replicas)}")
+        if args.once:
+            return
+        time.sleep(args.interval)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+import os
+from dataclasses import dataclass, field
+from datetime import date
+from time import perf_counter
+from typing import List, Optional
+
+import llm
+import metrics
+import scheduling
+
+# ✅ Tiers: "rules" (scheduling engine, no LLM), "light" (cheap/fast model), "heavy" (best model)
+AI_MODEL_LIGHT = os.getenv("AI_MODEL_LIGHT", "gpt-4o-mini")
+AI_MODEL_HEAVY = os.getenv("AI_MODEL_HEAVY", "gpt-4")
+AI_TIMEOUT_LIGHT = float(os.getenv("AI_TIMEOUT_LIGHT", "10"))
+AI_TIMEOUT_HEAVY = float(os.getenv("AI_TIMEOUT_HEAVY", "30"))
+
+# Routing thresholds: max |mean drift from goal| (minutes) & habit count per tier
+ROUTING_RULES_MAX_DRIFT = float(os.getenv("ROUTING_RULES_MAX_DRIFT", "20"))
+ROUTING_LIGHT_MAX_DRIFT = float(os.getenv("ROUTING_LIGHT_MAX_DRIFT", "90"))
+ROUTING_LIGHT_MAX_HABITS = int(os.getenv("ROUTING_LIGHT_MAX_HABITS", "6"))
+
+# USD per 1K (prompt, completion) tokens, for cost reporting only
+MODEL_PRICES = {
+    "gpt-4": (0.03, 0.06),
+    "gpt-4o": (0.0025, 0.01),
+    "gpt-4o-mini": (0.00015, 0.0006)
+}
+
+TIERS = {
+    "light": (AI_MODEL_LIGHT, AI_TIMEOUT_LIGHT),
+    "heavy": (AI_MODEL_HEAVY, AI_TIMEOUT_HEAVY)
+}
+# On timeout, fall back to the next faster tier
+FALLBACKS = {"heavy": "light", "light": "rules"}
+
+
+@dataclass
+class RoutedResult:
+    text: str
+    tier: str
+    model: Optional[str]
+    latency: float
+    cost: float = 0.0
+    fallbacks: List[str] = field(default_factory=list)
+
+    def report(self) -> dict:
+        return {
+            "tier": self.tier,
+            "model": self.model,
+            "latency_ms": round(self.latency * 1000, 1),
+            "cost_usd": round(self.cost, 6),
+            "fallbacks": self.fallbacks
+        }
+
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    prompt_price, completion_price = MODEL_PRICES.get(model, (0.0, 0.0))
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1000
+
+
+def is_timeout(exc: Exception) -> bool:
+    """Timeouts from the fake provider (TimeoutError) and the OpenAI client (APITimeoutError)."""
+    return isinstance(exc, TimeoutError) or "Timeout" in type(exc).__name__
+
+
+def choose_tier(habit_count: int, habit_stats: Optional[List[dict]]) -> str:
+    """Cheapest tier that can handle the schedule: small drift -> rules, few habits & moderate drift -> light."""
+    drifts = [abs(h["mean_drift_minutes"]) for h in habit_stats or [] if h.get("mean_drift_minutes") is not None]
+    max_drift = max(drifts) if drifts else None
+
+    if max_drift is not None and max_drift <= ROUTING_RULES_MAX_DRIFT:
+        return "rules"
+    if habit_count <= ROUTING_LIGHT_MAX_HABITS and (max_drift is None or max_drift <= ROUTING_LIGHT_MAX_DRIFT):
+        return "light"
+    return "heavy"
+
+
+def rule_suggestions(today_rows, completions=None, as_of: Optional[date] = None) -> str:
+    """Suggestions in the LLM reply format from the nightly scheduling engine (same policy, direction & reasons).
+
+    completions: (task_name, log_date, actual_completed_time) rows of the user's recent completions.
+    """
+    habits = [(0, name, scheduled, goal) for name, scheduled, goal, _, _ in today_rows if scheduled is not None]
+    adjustments = scheduling.get_engine().adjust_batch(
+        habits, ((0, *row) for row in completions or ()), as_of or date.today()
+    )
+    lines = [
+        f"{a.task_name}: {a.new_scheduled_time.strftime('%H:%M:%S')} - {a.reason} "
+        f"(average {a.drift_minutes:+.0f} minutes from goal over {a.samples} completions)."
+        for a in adjustments if a.step_minutes
+    ]
+    return "\n".join(lines) or "No adjustments needed."
+
+
+def route_habit_suggestions(messages: Optional[List[dict]], today_rows, habit_stats: Optional[List[dict]] = None,
+                            tier: Optional[str] = None, provider: Optional[llm.LLMProvider] = None,
+                            completions=None, as_of: Optional[date] = None) -> RoutedResult:
+    """Answers a habit-coaching prompt on the cheapest suitable tier, falling back to faster tiers on timeout.
+
+    The returned latency covers every attempt, so fallbacks show up in the reported time. `completions`
+    feed the rules tier (see rule_suggestions); `messages` may be None when the tier is "rules".
+    """
+    provider = provider or llm.get_llm_provider()
+    tier = tier or choose_tier(len(today_rows), habit_stats)
+    fallbacks = []
+    overall = perf_counter()
+
+    while True:
+        started = perf_counter()
+        if tier == "rules":
+            text = rule_suggestions(today_rows, completions, as_of)
+            metrics.record_route(tier, "rules", perf_counter() - started, 0.0, "ok")
+            return RoutedResult(text, tier, None, perf_counter() - overall, 0.0, fallbacks)
+
+        model, timeout = TIERS[tier]
+        try:
+            response = provider.complete(messages, model=model, timeout=timeout)
+        except Exception as exc:
+            elapsed = perf_counter() - started
+            if not is_timeout(exc):
+                metrics.record_route(tier, model, elapsed, 0.0, "error")
+                raise
+            metrics.record_route(tier, model, elapsed, 0.0, "timeout")
+            print(f"❌ {tier} tier ({model}) timed out after {elapsed:.1f}s, falling back to {FALLBACKS[tier]}")
+            fallbacks.append(tier)
+            tier = FALLBACKS[tier]
+            continue
+
+        cost = estimate_cost(model, response.prompt_tokens, response.completion_tokens)
+        metrics.record_route(tier, model, response.latency, cost, "ok")
+        return RoutedResult(response.text, tier, model, perf_counter() - overall, cost, fallbacks)
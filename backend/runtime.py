@@ -0,0 +1,72 @@
+import os
+import threading
+import time
+
+# ✅ Heavy subsystems (Redis, response cache, scheduler) are created on first use, not at import
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+REDIS_CONNECT_TIMEOUT = float(os.getenv("REDIS_CONNECT_TIMEOUT", "5"))
+REDIS_RETRY_SECONDS = float(os.getenv("REDIS_RETRY_SECONDS", "30"))  # how long a failed connect is remembered
+CACHE_PREFIX = "gradually_ai"
+# Set ENABLE_SCHEDULER=false on replicas/workers that must not run the cron jobs
+SCHEDULER_ENABLED = os.getenv("ENABLE_SCHEDULER", "true").lower() == "true"
+
+_lock = threading.Lock()
+_redis = None
+_redis_retry_at = 0.0  # monotonic time of the next connection attempt while Redis is unavailable
+_scheduler = None
+
+
+def get_redis():
+    """Shared synchronous Redis client, created & pinged on first use. Returns None while Redis is down;
+    a failed connection is retried after REDIS_RETRY_SECONDS."""
+    global _redis, _redis_retry_at
+    if _redis is None and time.monotonic() >= _redis_retry_at:
+        with _lock:
+            if _redis is None and time.monotonic() >= _redis_retry_at:
+                import redis
+
+                try:
+                    client = redis.Redis.from_url(REDIS_URL, socket_connect_timeout=REDIS_CONNECT_TIMEOUT)
+                    client.ping()
+                    _redis = client
+                except redis.RedisError:
+                    print(f"❌ Redis connection failed. Redis-backed features are disabled for {REDIS_RETRY_SECONDS:.0f}s.")
+                    _redis_retry_at = time.monotonic() + REDIS_RETRY_SECONDS
+    return _redis
+
+
+async def init_cache():
+    """Initialises fastapi-cache with Redis, falling back to an in-process backend."""
+    from fastapi_cache import FastAPICache
+
+    import redis
+    import redis.asyncio as aioredis
+
+    try:
+        client = aioredis.from_url(REDIS_URL, socket_connect_timeout=REDIS_CONNECT_TIMEOUT)
+        await client.ping()
+        from fastapi_cache.backends.redis import RedisBackend
+        FastAPICache.init(RedisBackend(client), prefix=CACHE_PREFIX)
+    except (redis.RedisError, OSError):
+        print("❌ Redis connection failed. Using in-memory response cache.")
+        from fastapi_cache.backends.inmemory import InMemoryBackend
+        FastAPICache.init(InMemoryBackend(), prefix=CACHE_PREFIX)
+
+
+def get_scheduler():
+    """Shared APScheduler instance (not started); created on first use."""
+    global _scheduler
+    if _scheduler is None:
+        with _lock:
+            if _scheduler is None:
+                from apscheduler.schedulers.background import BackgroundScheduler
+                _scheduler = BackgroundScheduler()
+    return _scheduler
+
+
+def shutdown():
+    """Stops whatever was started; subsystems that were never used are left alone."""
+    global _scheduler
+    if _scheduler is not None and _scheduler.running:
+        _scheduler.shutdown()
+    _scheduler = None
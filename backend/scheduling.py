@@ -0,0 +1,180 @@
+import os
+from dataclasses import dataclass
+from datetime import date, datetime, time
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from utils import shift_time
+
+MINUTES_PER_DAY = 1440
+
+# ✅ Engine settings (env-configurable so the nightly job & the endpoint agree)
+SCHEDULING_POLICY = os.getenv("SCHEDULING_POLICY", "fixed")  # fixed | proportional | variance
+SCHEDULING_STEP_MINUTES = float(os.getenv("SCHEDULING_STEP_MINUTES", "5"))
+SCHEDULING_HALFLIFE_DAYS = float(os.getenv("SCHEDULING_HALFLIFE_DAYS", "3"))
+SCHEDULING_WINDOW_DAYS = int(os.getenv("SCHEDULING_WINDOW_DAYS", "7"))
+
+REASON_EARLIER = "Shifted earlier toward goal time"
+REASON_LATER = "Shifted later based on completion trends"
+REASON_NONE = "No change"
+
+
+def circular_diff(a, b):
+    """Signed difference a - b in minutes on the 24h circle, in [-720, 720)."""
+    return (np.asarray(a, dtype=float) - b + MINUTES_PER_DAY / 2) % MINUTES_PER_DAY - MINUTES_PER_DAY / 2
+
+
+def time_to_minutes(value) -> float:
+    """Minutes since midnight (with seconds as a fraction) for a time or datetime."""
+    return value.hour * 60 + value.minute + value.second / 60
+
+
+# ✅ Step policies: map drift (mean actual - goal, minutes) & spread to a signed step in minutes
+class FixedStep:
+    """Moves a fixed number of minutes toward the drift direction (the original ±5 minute rule)."""
+
+    def __init__(self, minutes: float = SCHEDULING_STEP_MINUTES, deadband: float = 0.0):
+        self.minutes = minutes
+        self.deadband = deadband
+
+    def step(self, drift: np.ndarray, spread: np.ndarray) -> np.ndarray:
+        return np.where(np.abs(drift) > self.deadband, np.sign(drift) * self.minutes, 0.0)
+
+
+class ProportionalStep:
+    """Moves a fraction of the drift, clamped to [min_step, max_step] minutes."""
+
+    def __init__(self, gain: float = 0.25, min_step: float = 1.0, max_step: float = 15.0, deadband: float = 2.0):
+        self.gain = gain
+        self.min_step = min_step
+        self.max_step = max_step
+        self.deadband = deadband
+
+    def step(self, drift: np.ndarray, spread: np.ndarray) -> np.ndarray:
+        magnitude = np.clip(np.abs(drift) * self.gain, self.min_step, self.max_step)
+        return np.where(np.abs(drift) > self.deadband, np.sign(drift) * magnitude, 0.0)
+
+
+class VarianceAwareStep:
+    """Wraps another policy and shrinks its step when completion times are inconsistent.
+
+    Steps are scaled by `scale / (scale + spread)`, so a habit done at wildly different times
+    moves cautiously while a consistent one moves at the full step.
+    """
+
+    def __init__(self, base=None, scale: float = 30.0):
+        self.base = base or ProportionalStep()
+        self.scale = scale
+
+    def step(self, drift: np.ndarray, spread: np.ndarray) -> np.ndarray:
+        return self.base.step(drift, spread) * (self.scale / (self.scale + spread))
+
+
+POLICIES = {"fixed": FixedStep, "proportional": ProportionalStep, "variance": VarianceAwareStep}
+
+
+@dataclass
+class Adjustment:
+    user_id: int
+    task_name: str
+    scheduled_time: time
+    new_scheduled_time: time
+    step_minutes: int
+    drift_minutes: Optional[float]
+    spread_minutes: Optional[float]
+    samples: int
+    reason: str
+
+
+def ewm_circular_stats(groups: np.ndarray, minutes: np.ndarray, ages: np.ndarray, n_groups: int, halflife_days: float):
+    """Exponentially weighted circular mean & spread of completion minutes per group.
+
+    Each completion is a unit vector on the 24h circle weighted by 0.5 ** (age / halflife), so
+    23:50 and 00:10 average to midnight instead of noon. Returns (mean_minutes, spread_minutes,
+    counts); spread is the circular standard deviation sqrt(-2 ln R) in minutes.
+    """
+    weights = np.power(0.5, ages / halflife_days) if np.isfinite(halflife_days) else np.ones_like(minutes)
+    angles = minutes * (2 * np.pi / MINUTES_PER_DAY)
+
+    cos_sum = np.bincount(groups, weights * np.cos(angles), minlength=n_groups)
+    sin_sum = np.bincount(groups, weights * np.sin(angles), minlength=n_groups)
+    weight_sum = np.bincount(groups, weights, minlength=n_groups)
+    counts = np.bincount(groups, minlength=n_groups)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean = (np.arctan2(sin_sum, cos_sum) * MINUTES_PER_DAY / (2 * np.pi)) % MINUTES_PER_DAY
+        resultant = np.clip(np.hypot(cos_sum, sin_sum) / weight_sum, 1e-12, 1.0)
+        spread = np.sqrt(-2 * np.log(resultant)) * MINUTES_PER_DAY / (2 * np.pi)
+
+    return mean, spread, counts
+
+
+class SchedulingEngine:
+    """Computes schedule adjustments for many users' habits in one vectorised pass."""
+
+    def __init__(self, policy=None, halflife_days: float = SCHEDULING_HALFLIFE_DAYS, window_days: int = SCHEDULING_WINDOW_DAYS):
+        self.policy = policy or POLICIES.get(SCHEDULING_POLICY, FixedStep)()
+        self.halflife_days = halflife_days
+        self.window_days = window_days
+
+    def adjust_batch(self, habits: Iterable[Tuple[int, str, time, Optional[time]]],
+                     completions: Iterable[Tuple[int, str, date, datetime]], as_of: date) -> List[Adjustment]:
+        """Adjusts every habit from its recent completions.
+
+        habits: (user_id, task_name, scheduled_time, goal_time) rows, e.g. from baseline_schedule.
+        completions: (user_id, task_name, log_date, actual_completed_time) rows; rows for unknown
+        habits or outside the window are ignored. Times are UTC, like everything stored.
+        """
+        habits = list(habits)
+        index = {(user_id, task_name): i for i, (user_id, task_name, _, _) in enumerate(habits)}
+        n = len(habits)
+        if n == 0:
+            return []
+
+        groups, minutes, ages = [], [], []
+        for user_id, task_name, log_date, completed_at in completions:
+            i = index.get((user_id, task_name))
+            if i is None or completed_at is None:
+                continue
+            age = (as_of - log_date).days
+            if 0 <= age <= self.window_days:
+                groups.append(i)
+                minutes.append(time_to_minutes(completed_at))
+                ages.append(age)
+
+        mean, spread, counts = ewm_circular_stats(
+            np.asarray(groups, dtype=np.int64), np.asarray(minutes, dtype=float), np.asarray(ages, dtype=float), n, self.halflife_days
+        )
+
+        goals = np.array([time_to_minutes(g) if g is not None else np.nan for _, _, _, g in habits])
+        drift = circular_diff(mean, goals)
+        has_signal = (counts > 0) & ~np.isnan(goals)
+        steps = np.where(has_signal, np.rint(self.policy.step(np.nan_to_num(drift), np.nan_to_num(spread))), 0).astype(int)
+
+        adjustments = []
+        for i, (user_id, task_name, scheduled_time, _) in enumerate(habits):
+            step = int(steps[i])
+            adjustments.append(Adjustment(
+                user_id=user_id,
+                task_name=task_name,
+                scheduled_time=scheduled_time,
+                new_scheduled_time=shift_time(scheduled_time, step) if step else scheduled_time,
+                step_minutes=step,
+                drift_minutes=round(float(drift[i]), 1) if has_signal[i] else None,
+                spread_minutes=round(float(spread[i]), 1) if counts[i] else None,
+                samples=int(counts[i]),
+                reason=REASON_EARLIER if step < 0 else REASON_LATER if step > 0 else REASON_NONE
+            ))
+        return adjustments
+
+
+_engine = None
+
+
+def get_engine() -> SchedulingEngine:
+    """Process-wide engine built from the SCHEDULING_* settings."""
+    global _engine
+    if _engine is None:
+        _engine = SchedulingEngine()
+    return _engine
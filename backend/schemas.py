@@ -0,0 +1,216 @@
+import inspect
+from datetime import date, datetime, time
+from typing import Dict, List, Optional
+
+from pydantic import BaseModel, ConfigDict
+
+
+# ✅ Response class: FastAPI versions that dump response models straight to JSON bytes (pydantic-core)
+# are fastest with the default class; older ones get orjson when it's installed.
+def default_response_class():
+    from fastapi import routing
+    from fastapi.responses import JSONResponse
+
+    if "dump_json" in inspect.signature(routing.serialize_response).parameters:
+        return None
+    try:
+        import orjson  # noqa: F401
+        from fastapi.responses import ORJSONResponse
+        return ORJSONResponse
+    except ImportError:
+        return JSONResponse
+
+
+# ✅ Shared
+class MessageResponse(BaseModel):
+    model_config = ConfigDict(extra="forbid")  # so data payloads never collapse into a bare message
+
+    message: str
+
+
+class HealthResponse(BaseModel):
+    message: str
+    error: Optional[str] = None
+
+
+# ✅ Users
+class UserResponse(BaseModel):
+    id: int
+    username: str
+    email: str
+
+
+class LoginResponse(BaseModel):
+    user_id: int
+
+
+# ✅ Baseline schedule
+class BaselineChanges(BaseModel):
+    inserted: int
+    updated: int
+    deleted: int
+    unchanged: int
+
+
+class BaselineTaskOut(BaseModel):
+    task_name: str
+    scheduled_time: time
+    goal_time: Optional[time] = None
+
+
+class BaselineSetResponse(BaseModel):
+    message: str
+    detected_timezone: str
+    changes: BaselineChanges
+    tasks: List[BaselineTaskOut]
+
+
+class ImportErrorOut(BaseModel):
+    line: Optional[int] = None  # None for errors about a whole user
+    error: str
+
+
+class BaselineImportResponse(BaselineChanges):
+    users: int
+    records: int
+    errors: List[ImportErrorOut]
+    errors_omitted: int = 0  # errors beyond the reported ones
+
+
+class BaselineTaskLocal(BaselineTaskOut):
+    user_timezone: str
+
+
+class BaselineScheduleResponse(BaseModel):
+    user_id: int
+    current_timezone: str
+    tasks: List[BaselineTaskLocal]
+
+
+# ✅ Daily schedule
+class DailyTaskOut(BaseModel):
+    task_name: str
+    scheduled_time: Optional[time] = None
+    goal_time: Optional[time] = None
+    status: Optional[str] = None
+
+
+class DailyScheduleResponse(BaseModel):
+    user_id: int
+    log_date: date
+    current_timezone: str
+    schedule: List[DailyTaskOut]
+
+
+class RangeSummary(BaseModel):
+    dates: List[date]
+    total: List[int]
+    completed: List[int]
+    completion_rate: List[float]
+
+
+class ScheduleRangeResponse(BaseModel):
+    user_id: int
+    start_date: date
+    end_date: date
+    current_timezone: str
+    status_legend: Dict[str, int]
+    dates: List[date]
+    task_names: List[str]
+    ids: List[int]
+    date_idx: List[int]
+    task_idx: List[int]
+    scheduled_minutes: List[Optional[int]]
+    goal_minutes: List[Optional[int]]
+    status_codes: List[int]
+    summary: Optional[RangeSummary] = None
+
+
+# ✅ Analytics
+class OverallAnalytics(BaseModel):
+    scheduled: int
+    completed: int
+    completion_rate: Optional[float] = None
+    on_time_rate: Optional[float] = None
+
+
+class HabitAnalytics(BaseModel):
+    task_name: str
+    scheduled: int
+    completed: int
+    completion_rate: Optional[float] = None
+    on_time_rate: Optional[float] = None
+    mean_drift_minutes: Optional[float] = None
+    mean_abs_drift_minutes: Optional[float] = None
+    drift_trend_minutes_per_day: Optional[float] = None
+    current_streak: int
+    longest_streak: int
+    weekday_completion_rate: Dict[str, Optional[float]]
+    weekday_mean_drift_minutes: Dict[str, Optional[float]]
+
+
+class AnalyticsResponse(BaseModel):
+    user_id: int
+    start_date: date
+    end_date: date
+    on_time_minutes: int
+    overall: OverallAnalytics
+    habits: List[HabitAnalytics]
+
+
+# ✅ Task logging
+class LoggedTask(BaseModel):
+    task_name: str
+    log_date: date
+    status: str
+    actual_completed_time: Optional[time] = None
+
+
+class TaskLogResponse(BaseModel):
+    message: str
+    tasks: List[LoggedTask]
+
+
+# ✅ AI habit adjustments
+class AIRecommendation(BaseModel):
+    habit: str
+    suggested_value: str
+    reason: str
+
+
+class RoutingReport(BaseModel):
+    tier: str
+    model: Optional[str] = None
+    latency_ms: float
+    cost_usd: float
+    fallbacks: List[str]
+
+
+class AIAdjustmentsResponse(BaseModel):
+    ai_recommendations: List[AIRecommendation]
+    routing: RoutingReport
+
+
+class HabitResponseResult(BaseModel):
+    habit: str
+    status: str
+    outcome: Optional[str] = None
+
+
+class HabitBatchResponse(BaseModel):
+    message: str
+    results: List[HabitResponseResult]
+
+
+# ✅ Schedule adjustments
+class ScheduleAdjustmentOut(BaseModel):
+    task_name: str
+    previous_scheduled_time: Optional[time] = None
+    new_scheduled_time: time
+    adjustment_reason: str
+    log_date: datetime
+
+
+class ScheduleAdjustmentsResponse(BaseModel):
+    user_id: int
+    adjustments: List[ScheduleAdjustmentOut]
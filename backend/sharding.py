@@ -0,0 +1,309 @@
+# User-id sharding of per-user schedule data.
+#
+# user_id -> bucket (hash: user_id % SHARD_BUCKETS, or range: user_id // SHARD_RANGE_SIZE) -> shard.
+# The bucket -> shard directory lives in the `shard_buckets` table on the catalog database (DATABASE_URL,
+# which is also shard 0 and keeps the `users` table). Buckets without a directory row use the default
+# placement, so pin the directory (`python sharding.py init`) before adding shards to SHARD_URLS.
+#
+#   python sharding.py status                  # users & rows per shard, buckets being moved
+#   python sharding.py init                    # write the default placement into the directory
+#   python sharding.py move <bucket> <shard>   # move one bucket online
+#   python sharding.py rebalance [--apply]     # plan (and run) bucket moves that even out users per shard
+import argparse
+import contextvars
+import os
+import threading
+import time as clock
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from sqlalchemy import MetaData, create_engine, delete, func, insert, select
+from sqlalchemy.exc import OperationalError, ProgrammingError
+from sqlalchemy.orm import sessionmaker
+
+from database import DATABASE_URL, SQL_ECHO, Base, SessionLocal, engine
+from models import BaselineSchedule, DailySchedule, DailyScheduleView, HabitAdjustment, ScheduleAdjustment, ShardBucket, Task, User
+
+# ✅ Shard settings: SHARD_URLS lists every shard (comma-separated); the first must be DATABASE_URL
+SHARD_URLS = [url.strip() for url in os.getenv("SHARD_URLS", "").split(",") if url.strip()] or [DATABASE_URL]
+SHARD_STRATEGY = os.getenv("SHARD_STRATEGY", "hash")  # hash | range
+SHARD_BUCKETS = int(os.getenv("SHARD_BUCKETS", "256"))
+SHARD_RANGE_SIZE = int(os.getenv("SHARD_RANGE_SIZE", "10000"))  # users per bucket with SHARD_STRATEGY=range
+SHARD_MAP_TTL = float(os.getenv("SHARD_MAP_TTL", "5"))  # seconds a process may serve a stale directory
+SHARD_COPY_BATCH = int(os.getenv("SHARD_COPY_BATCH", "5000"))
+
+if SHARD_URLS[0] != DATABASE_URL:
+    raise ValueError("❌ The first SHARD_URLS entry must be DATABASE_URL (the catalog shard).")
+
+# Every table keyed by user_id moves with its user
+SHARDED_MODELS = (BaselineSchedule, DailySchedule, DailyScheduleView, Task, HabitAdjustment, ScheduleAdjustment)
+
+engines = [engine] + [create_engine(url, echo=SQL_ECHO) for url in SHARD_URLS[1:]]
+sessions = [SessionLocal] + [sessionmaker(autocommit=False, autoflush=False, bind=e) for e in engines[1:]]
+SHARD_COUNT = len(engines)
+
+
+class ShardMoving(Exception):
+    """Raised for writes to a user whose bucket is being moved between shards (retry shortly)."""
+
+    def __init__(self, user_ids):
+        super().__init__(f"Users {sorted(user_ids)[:10]} are being moved between shards; retry shortly.")
+        self.user_ids = user_ids
+
+
+def bucket_for(user_id: int) -> int:
+    if SHARD_STRATEGY == "range":
+        return min(user_id // SHARD_RANGE_SIZE, SHARD_BUCKETS - 1)
+    return user_id % SHARD_BUCKETS
+
+
+def default_shard(bucket: int) -> int:
+    if SHARD_STRATEGY == "range":
+        return bucket * SHARD_COUNT // SHARD_BUCKETS  # contiguous blocks of buckets
+    return bucket % SHARD_COUNT
+
+
+def bucket_filter(column, bucket: int):
+    """SQL predicate selecting the rows of one bucket."""
+    if SHARD_STRATEGY == "range":
+        lower = column >= bucket * SHARD_RANGE_SIZE
+        return lower if bucket == SHARD_BUCKETS - 1 else lower & (column < (bucket + 1) * SHARD_RANGE_SIZE)
+    return column % SHARD_BUCKETS == bucket
+
+
+# ✅ Directory: bucket -> (shard, moving), cached for SHARD_MAP_TTL seconds per process
+_directory = {}
+_directory_loaded = float("-inf")
+_directory_lock = threading.Lock()
+
+
+def _load_directory():
+    global _directory, _directory_loaded
+    with _directory_lock:
+        if clock.monotonic() - _directory_loaded < SHARD_MAP_TTL:
+            return _directory
+        try:
+            with engine.connect() as conn:
+                rows = conn.execute(select(ShardBucket.bucket, ShardBucket.shard, ShardBucket.moving)).all()
+            _directory = {bucket: (shard, bool(moving)) for bucket, shard, moving in rows}
+        except (OperationalError, ProgrammingError):
+            _directory = {}  # directory table not created yet: default placement
+        _directory_loaded = clock.monotonic()
+        return _directory
+
+
+def placement(bucket: int):
+    """(shard, moving) for a bucket."""
+    if SHARD_COUNT == 1:
+        return 0, False
+    return _load_directory().get(bucket, (default_shard(bucket), False))
+
+
+def shard_for(user_id: int) -> int:
+    return placement(bucket_for(user_id))[0]
+
+
+def check_writable(user_ids):
+    moving = {uid for uid in user_ids if placement(bucket_for(uid))[1]}
+    if moving:
+        raise ShardMoving(moving)
+
+
+def open_session(user_id: int, write: bool = False):
+    """Session on the user's shard; writes are refused (ShardMoving) while their bucket moves."""
+    if write:
+        check_writable([user_id])
+    return sessions[shard_for(user_id)]()
+
+
+def group_by_shard(items, key=lambda item: item):
+    """{shard: [items]} for user ids (or records, with `key` returning the user id)."""
+    groups = {}
+    for item in items:
+        groups.setdefault(shard_for(key(item)), []).append(item)
+    return groups
+
+
+def fan_out(fn, user_ids=None):
+    """Runs a batch job on every shard in parallel, each with its own session.
+
+    With `user_ids`, calls fn(db, shard, shard_user_ids) per shard holding any of them (users whose
+    bucket is moving are skipped); without, calls fn(db, shard) on every shard. Returns the results.
+    """
+    if user_ids is None:
+        work = {shard: () for shard in range(SHARD_COUNT)}
+    else:
+        work = group_by_shard(uid for uid in user_ids if not placement(bucket_for(uid))[1])
+        skipped = len(user_ids) - sum(len(uids) for uids in work.values())
+        if skipped:
+            print(f"ℹ️ Skipping {skipped} users whose shard bucket is being moved.")
+
+    def run(shard, uids):
+        with sessions[shard]() as db:
+            return fn(db, shard, uids) if user_ids is not None else fn(db, shard)
+
+    if len(work) <= 1:
+        return [run(shard, uids) for shard, uids in work.items()]
+    with ThreadPoolExecutor(max_workers=len(work), thread_name_prefix="shard") as pool:
+        # copy_context: job-phase metrics & profiling context follow the work into the threads
+        futures = [pool.submit(contextvars.copy_context().run, run, shard, uids) for shard, uids in work.items()]
+        return [f.result() for f in futures]
+
+
+# ✅ Schema: the catalog gets every table, other shards only the sharded ones (no FK to users)
+def create_all():
+    Base.metadata.create_all(bind=engine)
+    shard_metadata = MetaData()
+    for model in SHARDED_MODELS:
+        table = model.__table__.to_metadata(shard_metadata)
+        for constraint in list(table.foreign_key_constraints):
+            table.constraints.discard(constraint)
+        for column in table.columns:
+            column.foreign_keys.clear()
+        table.foreign_keys.clear()
+    for shard_engine in engines[1:]:
+        shard_metadata.create_all(bind=shard_engine)
+
+
+# ✅ Rebalancing (online): reads are served throughout, writes to the moving bucket get 503 for a few seconds
+def set_placement(bucket: int, shard: int, moving: bool):
+    with SessionLocal() as db:
+        row = db.get(ShardBucket, bucket)
+        if row is None:
+            db.add(ShardBucket(bucket=bucket, shard=shard, moving=moving, updated_at=datetime.now(timezone.utc)))
+        else:
+            row.shard, row.moving, row.updated_at = shard, moving, datetime.now(timezone.utc)
+        db.commit()
+
+
+def _wait_for_directory():
+    """Every process reloads the directory within SHARD_MAP_TTL; wait that out."""
+    global _directory_loaded
+    clock.sleep(SHARD_MAP_TTL + 0.5)
+    _directory_loaded = float("-inf")
+
+
+def move_bucket(bucket: int, target: int):
+    """Moves one bucket's rows to `target`: freeze writes, copy, flip the directory, delete the source rows.
+
+    Copied rows get new primary keys on the target shard. Returns rows copied per table.
+    """
+    source, moving = placement(bucket)
+    if moving:
+        raise RuntimeError(f"Bucket {bucket} is already being moved.")
+    if source == target:
+        return {}
+
+    set_placement(bucket, source, True)
+    _wait_for_directory()
+
+    copied = {}
+    try:
+        with engines[source].connect() as src, engines[target].begin() as dst:
+            for model in SHARDED_MODELS:
+                table = model.__table__
+                columns = [c for c in table.columns if c.name != "id"]  # surrogate keys are reassigned
+                dst.execute(delete(table).where(bucket_filter(table.c.user_id, bucket)))  # leftovers of an aborted move
+                result = src.execution_options(stream_results=True).execute(
+                    select(*columns).where(bucket_filter(table.c.user_id, bucket)).order_by(*table.primary_key.columns))
+                copied[table.name] = 0
+                for batch in result.mappings().partitions(SHARD_COPY_BATCH):
+                    dst.execute(insert(table), [dict(row) for row in batch])
+                    copied[table.name] += len(batch)
+    except Exception:
+        set_placement(bucket, source, False)  # unfreeze on the old shard
+        raise
+
+    set_placement(bucket, target, False)
+    _wait_for_directory()  # stale readers of the old placement drain
+
+    with engines[source].begin() as src:
+        for model in SHARDED_MODELS:
+            src.execute(delete(model.__table__).where(bucket_filter(model.__table__.c.user_id, bucket)))
+    print(f"✅ Moved bucket {bucket} from shard {source} to shard {target}: {copied}")
+    return copied
+
+
+def users_per_bucket():
+    with engine.connect() as conn:
+        users = conn.execute(select(User.id)).scalars().all()
+    counts = {}
+    for user_id in users:
+        counts[bucket_for(user_id)] = counts.get(bucket_for(user_id), 0) + 1
+    return counts
+
+
+def plan_rebalance():
+    """Greedy bucket moves from the most to the least loaded shard (by users) while that narrows the gap."""
+    counts = users_per_bucket()
+    buckets = {shard: [] for shard in range(SHARD_COUNT)}
+    for bucket, users in counts.items():
+        buckets[placement(bucket)[0]].append((users, bucket))
+    load = {shard: sum(users for users, _ in items) for shard, items in buckets.items()}
+
+    moves = []
+    while True:
+        heavy = max(load, key=load.get)
+        light = min(load, key=load.get)
+        gap = load[heavy] - load[light]
+        candidates = [(users, bucket) for users, bucket in buckets[heavy] if 0 < users < gap]
+        if not candidates:
+            return moves
+        users, bucket = max(candidates, key=lambda c: min(c[0], gap - c[0]))  # closest to halving the gap
+        buckets[heavy].remove((users, bucket))
+        buckets[light].append((users, bucket))
+        load[heavy] -= users
+        load[light] += users
+        moves.append((bucket, heavy, light, users))
+
+
+def status():
+    counts = users_per_bucket()
+    for shard in range(SHARD_COUNT):
+        owned = [b for b in counts if placement(b)[0] == shard]
+        with engines[shard].connect() as conn:
+            rows = {m.__tablename__: conn.execute(select(func.count()).select_from(m.__table__)).scalar() for m in SHARDED_MODELS}
+        print(f"shard {shard}: {sum(counts[b] for b in owned)} users in {len(owned)} buckets, rows {rows}")
+    moving = [b for b, (_, is_moving) in _load_directory().items() if is_moving]
+    if moving:
+        print(f"⚠️ Buckets being moved: {moving}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect and rebalance user-id shards.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("status")
+    commands.add_parser("init")
+    move = commands.add_parser("move")
+    move.add_argument("bucket", type=int)
+    move.add_argument("shard", type=int)
+    rebalance = commands.add_parser("rebalance")
+    rebalance.add_argument("--apply", action="store_true", help="Run the planned moves (default: print the plan)")
+    args = parser.parse_args(argv)
+
+    if args.command == "init":
+        create_all()
+        pinned = _load_directory()
+        for bucket in range(SHARD_BUCKETS):
+            if bucket not in pinned:
+                set_placement(bucket, default_shard(bucket), False)
+        print(f"✅ Directory pinned for {SHARD_BUCKETS} buckets across {SHARD_COUNT} shards.")
+    elif args.command == "status":
+        status()
+    elif args.command == "move":
+        if not 0 <= args.shard < SHARD_COUNT:
+            parser.error(f"shard must be between 0 and {SHARD_COUNT - 1}")
+        move_bucket(args.bucket, args.shard)
+    elif args.command == "rebalance":
+        moves = plan_rebalance()
+        for bucket, source, target, users in moves:
+            print(f"bucket {bucket}: shard {source} -> {target} ({users} users)")
+        if not moves:
+            print("✅ Shards are balanced.")
+        if args.apply:
+            for bucket, _, target, _ in moves:
+                move_bucket(bucket, target)
+
+
+if __name__ == "__main__":
+    main()
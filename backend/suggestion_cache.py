@@ -0,0 +1,124 @@
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from datetime import time
+from typing import List, Optional
+
+import redis
+
+import metrics
+import runtime
+from scheduling import circular_diff, time_to_minutes
+from utils import shift_time
+
+# ✅ Cross-user suggestion cache: users with the same (bucketed) schedule share one LLM answer
+SUGGESTION_CACHE_ENABLED = os.getenv("SUGGESTION_CACHE_ENABLED", "true").lower() == "true"
+SUGGESTION_CACHE_BUCKET_MINUTES = int(os.getenv("SUGGESTION_CACHE_BUCKET_MINUTES", "15"))
+SUGGESTION_CACHE_TTL = int(os.getenv("SUGGESTION_CACHE_TTL", str(7 * 24 * 3600)))
+SUGGESTION_CACHE_SIZE = int(os.getenv("SUGGESTION_CACHE_SIZE", "1024"))  # in-memory fallback entries
+
+_memory = OrderedDict()
+_memory_lock = threading.Lock()
+
+
+def normalise_name(name: str) -> str:
+    return re.sub(r"\s+", " ", name).strip().lower()
+
+
+def _bucket(value) -> str:
+    if value is None:
+        return "-"
+    return str(int(time_to_minutes(value)) // SUGGESTION_CACHE_BUCKET_MINUTES)
+
+
+def signature(today_rows) -> str:
+    """Stable key for a schedule: normalised habit names with scheduled/goal/actual times in N-minute buckets.
+
+    today_rows: (task_name, scheduled_time, goal_time, actual_completed_time, status) tuples.
+    """
+    parts = sorted(
+        f"{normalise_name(name)}|{_bucket(scheduled)}|{_bucket(goal)}|{_bucket(completed)}"
+        for name, scheduled, goal, completed, _ in today_rows
+    )
+    payload = f"{SUGGESTION_CACHE_BUCKET_MINUTES}\n" + "\n".join(parts)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def relativise(suggestions: List[dict], current_values: dict) -> List[dict]:
+    """Turns parsed suggestions ({"habit", "suggested_value": "HH:MM:SS", "reason"}) into per-habit shifts
+    (minutes) so they can be rebased onto another user's times."""
+    entries = []
+    for s in suggestions:
+        current = current_values.get(s["habit"])
+        if current is None:
+            continue
+        suggested = time.fromisoformat(s["suggested_value"])
+        delta = int(round(float(circular_diff(time_to_minutes(suggested), time_to_minutes(current)))))
+        entries.append({"habit": normalise_name(s["habit"]), "delta_minutes": delta, "reason": s["reason"]})
+    return entries
+
+
+def rebase(entries: List[dict], current_values: dict) -> str:
+    """Applies cached shifts to this user's own scheduled times, in the LLM reply format."""
+    by_name = {normalise_name(name): (name, value) for name, value in current_values.items() if value is not None}
+    lines = []
+    for entry in entries:
+        match = by_name.get(entry["habit"])
+        if match is None:
+            continue
+        name, current = match
+        suggested = shift_time(current, entry["delta_minutes"])
+        lines.append(f"{name}: {suggested.strftime('%H:%M:%S')} - {entry['reason']}")
+    return "\n".join(lines) or "No adjustments needed."
+
+
+def _key(sig: str) -> str:
+    return f"{runtime.CACHE_PREFIX}:suggestions:{sig}"
+
+
+def get(sig: str) -> Optional[List[dict]]:
+    """Cached entries for a signature (Redis, else the in-process LRU); counts hits/misses.
+
+    A Redis error counts as a miss."""
+    if not SUGGESTION_CACHE_ENABLED:
+        return None
+
+    entries = None
+    client = runtime.get_redis()
+    if client is not None:
+        try:
+            raw = client.get(_key(sig))
+        except redis.RedisError as e:
+            print(f"❌ Suggestion cache read failed, treating as a miss: {e}")
+            raw = None
+        entries = json.loads(raw) if raw else None
+    else:
+        with _memory_lock:
+            entries = _memory.get(sig)
+            if entries is not None:
+                _memory.move_to_end(sig)
+
+    metrics.record_cache("suggestions", entries is not None)
+    return entries
+
+
+def put(sig: str, entries: List[dict]):
+    """Stores entries for a signature; never raises on a Redis error (runs after the adjustments are committed)."""
+    if not SUGGESTION_CACHE_ENABLED or not entries:
+        return
+
+    client = runtime.get_redis()
+    if client is not None:
+        try:
+            client.setex(_key(sig), SUGGESTION_CACHE_TTL, json.dumps(entries))
+        except redis.RedisError as e:
+            print(f"❌ Suggestion cache write failed, skipping: {e}")
+        return
+    with _memory_lock:
+        _memory[sig] = entries
+        _memory.move_to_end(sig)
+        while len(_memory) > SUGGESTION_CACHE_SIZE:
+            _memory.popitem(last=False)
@@ -0,0 +1,142 @@
+# Storage encoding for clock times & completion instants, chosen with TIME_STORAGE:
+#
+#   time     (default) TIME columns for clock times, TIMESTAMP WITH TIME ZONE for completions
+#   compact  SMALLINT minute-of-day (UTC) for clock times, BIGINT UTC epoch seconds for completions
+#
+# Either way the mapped attributes hold datetime.time / aware datetime values, so application code is the same;
+# the *_minute hybrid properties on the models give minute-of-day in Python and as a SQL expression (free in
+# compact mode, computed per dialect otherwise), so arithmetic can run in the database.
+# Compact mode drops seconds from clock times. It applies to newly created tables: switching an existing
+# database means creating it afresh (init_db.py) and re-importing (export.py / baseline import).
+import os
+from datetime import datetime, time, timezone
+
+from sqlalchemy import BigInteger, DateTime, Integer, SmallInteger, Time, type_coerce
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy.sql.functions import FunctionElement
+from sqlalchemy.types import TypeDecorator
+
+from utils import minute_of_day
+
+TIME_STORAGE = os.getenv("TIME_STORAGE", "time").lower()  # time | compact
+if TIME_STORAGE not in ("time", "compact"):
+    raise ValueError(f"❌ TIME_STORAGE must be 'time' or 'compact', not {TIME_STORAGE!r}.")
+COMPACT = TIME_STORAGE == "compact"
+
+
+class MinuteOfDay(TypeDecorator):
+    """datetime.time stored as minutes since midnight (0-1439) in a SMALLINT."""
+    impl = SmallInteger
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None or isinstance(value, int):
+            return value
+        return minute_of_day(value)
+
+    def process_result_value(self, value, dialect):
+        return time(value // 60, value % 60) if value is not None else None
+
+
+class UTCEpoch(TypeDecorator):
+    """Aware datetime stored as whole seconds since the Unix epoch (UTC; naive values are taken as UTC).
+
+    An absolute instant, so no local-time ambiguity around DST changes."""
+    impl = BigInteger
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None or isinstance(value, int):
+            return value
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return int(value.timestamp())
+
+    def process_result_value(self, value, dialect):
+        return datetime.fromtimestamp(value, timezone.utc) if value is not None else None
+
+
+def clock_type():
+    """Column type for a UTC clock time (scheduled/goal times)."""
+    return MinuteOfDay() if COMPACT else Time()
+
+
+def instant_type():
+    """Column type for a completion instant."""
+    return UTCEpoch() if COMPACT else DateTime(timezone=True)
+
+
+# ✅ Minute-of-day as SQL (TIME mode): one function element compiled per dialect
+class _clock_minutes(FunctionElement):
+    type = Integer()
+    inherit_cache = True
+    name = "clock_minutes"
+
+
+class _utc_instant_minutes(FunctionElement):
+    type = Integer()
+    inherit_cache = True
+    name = "utc_instant_minutes"
+
+
+@compiles(_clock_minutes)
+@compiles(_utc_instant_minutes)
+def _compile_extract(element, compiler, **kw):
+    value = compiler.process(element.clauses, **kw)
+    if isinstance(element, _utc_instant_minutes):
+        value = f"({value} AT TIME ZONE 'UTC')"
+    return f"CAST(EXTRACT(HOUR FROM {value}) * 60 + EXTRACT(MINUTE FROM {value}) AS INTEGER)"
+
+
+@compiles(_clock_minutes, "sqlite")
+@compiles(_utc_instant_minutes, "sqlite")
+def _compile_sqlite(element, compiler, **kw):
+    value = compiler.process(element.clauses, **kw)  # stored as ISO text; instants are written in UTC
+    return f"(CAST(strftime('%H', {value}) AS INTEGER) * 60 + CAST(strftime('%M', {value}) AS INTEGER))"
+
+
+@compiles(_clock_minutes, "mysql")
+@compiles(_utc_instant_minutes, "mysql")
+def _compile_mysql(element, compiler, **kw):
+    value = compiler.process(element.clauses, **kw)
+    return f"(HOUR({value}) * 60 + MINUTE({value}))"
+
+
+def clock_minutes(column):
+    """SQL minute-of-day of a clock-time column."""
+    return type_coerce(column, SmallInteger) if COMPACT else _clock_minutes(column)
+
+
+def instant_minutes(column):
+    """SQL UTC minute-of-day of a completion-instant column."""
+    return (type_coerce(column, BigInteger) % 86400) // 60 if COMPACT else _utc_instant_minutes(column)
+
+
+# ✅ Hybrid properties: `<name>_minute` alongside each time attribute
+def clock_minute_property(attribute: str):
+    def getter(self):
+        return minute_of_day(getattr(self, attribute))
+
+    def setter(self, minutes):
+        setattr(self, attribute, time(minutes // 60, minutes % 60) if minutes is not None else None)
+
+    def expression(cls):
+        return clock_minutes(getattr(cls, attribute))
+
+    return hybrid_property(getter, setter, expr=expression)
+
+
+def instant_minute_property(attribute: str):
+    def getter(self):
+        value = getattr(self, attribute)
+        if value is None:
+            return None
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc)
+        return minute_of_day(value)
+
+    def expression(cls):
+        return instant_minutes(getattr(cls, attribute))
+
+    return hybrid_property(getter, expr=expression)
@@ -1,4 +1,4 @@
-from datetime import datetime
+from datetime import datetime, date, time
 import pytz
 
 # Define Central Time Zone
@@ -11,3 +11,28 @@ def get_current_time_cst():
 def convert_to_cst(dt: datetime):
     """Converts a given datetime to CST."""
     return dt.astimezone(CST) if dt else None
+
+# Compact status codes used by columnar payloads
+STATUS_CODES = {"pending": 0, "completed": 1, "skipped": 2}
+
+def status_code(status: str):
+    """Maps a schedule status to its compact integer code (-1 if unknown)."""
+    return STATUS_CODES.get(status, -1)
+
+def minute_of_day(t: time):
+    """Returns minutes since midnight for a time (None passes through)."""
+    return t.hour * 60 + t.minute if t is not None else None
+
+def second_of_day(t: time):
+    """Returns seconds since midnight for a time (None passes through)."""
+    return t.hour * 3600 + t.minute * 60 + t.second if t is not None else None
+
+def utc_offset_minutes(tz, day: date):
+    """Returns the UTC offset of `tz` in minutes on `day`, evaluated once at noon UTC."""
+    noon_utc = pytz.utc.localize(datetime.combine(day, time(12, 0)))
+    return int(noon_utc.astimezone(tz).utcoffset().total_seconds() // 60)
+
+def shift_time(t: time, minutes: int):
+    """Shifts a time-of-day by `minutes`, wrapping around midnight (seconds are kept)."""
+    total = (t.hour * 60 + t.minute + minutes) % 1440
+    return t.replace(hour=total // 60, minute=total % 60)
@@ -0,0 +1,137 @@
+import os
+import threading
+import time as clock
+from datetime import datetime, time, timedelta
+from typing import Callable, Dict, List
+
+import pytz
+from sqlalchemy import func
+
+import metrics
+import read_model
+import sharding
+from database import open_read_session
+from models import BaselineSchedule, DailyScheduleView
+
+# ✅ Pre-warming ahead of local-morning peaks: every WARM_INTERVAL_MINUTES, users whose local clock reaches
+# WARM_MORNING_HOUR within the next WARM_LEAD_MINUTES (+ one interval) get today's schedule generated if
+# missing and loaded into the schedule view cache.
+WARMER_ENABLED = os.getenv("WARMER_ENABLED", "true").lower() == "true"
+WARM_MORNING_HOUR = int(os.getenv("WARM_MORNING_HOUR", "7"))
+WARM_LEAD_MINUTES = int(os.getenv("WARM_LEAD_MINUTES", "30"))
+WARM_INTERVAL_MINUTES = int(os.getenv("WARM_INTERVAL_MINUTES", "15"))
+WARM_BATCH = int(os.getenv("WARM_BATCH", "200"))
+# Rate limits keep the warmer from competing with live traffic on the primary
+WARM_USERS_PER_SECOND = float(os.getenv("WARM_USERS_PER_SECOND", "500"))  # view reads (replica when configured)
+WARM_GENERATE_PER_SECOND = float(os.getenv("WARM_GENERATE_PER_SECOND", "10"))  # schedule generations (primary writes)
+WARM_TIMEZONES_TTL = int(os.getenv("WARM_TIMEZONES_TTL", "3600"))  # seconds the user -> timezone map is reused
+
+
+class RateLimiter:
+    """Token bucket (burst: one second's worth). Callers take tokens on credit and sleep off the debt."""
+
+    def __init__(self, per_second: float):
+        self.per_second = per_second
+        self.tokens = per_second
+        self.updated = clock.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, n: int = 1):
+        with self._lock:
+            now = clock.monotonic()
+            self.tokens = min(self.per_second, self.tokens + (now - self.updated) * self.per_second) - n
+            self.updated = now
+            wait = -self.tokens / self.per_second if self.tokens < 0 else 0.0
+        if wait:
+            clock.sleep(wait)
+
+
+def due(tz_name: str, now_utc: datetime) -> bool:
+    """True if WARM_MORNING_HOUR local time falls in [now + lead, now + lead + interval) in the timezone."""
+    try:
+        tz = pytz.timezone(tz_name)
+    except pytz.UnknownTimeZoneError:
+        return False
+    start = now_utc.astimezone(tz) + timedelta(minutes=WARM_LEAD_MINUTES)
+    end = start + timedelta(minutes=WARM_INTERVAL_MINUTES)
+    for day in {start.date(), end.date()}:
+        morning = tz.localize(datetime.combine(day, time(WARM_MORNING_HOUR)))
+        if start <= morning < end:
+            return True
+    return False
+
+
+def _read_session(shard: int):
+    """Replica session for the catalog shard when replicas exist, else the shard itself."""
+    return open_read_session()[0] if shard == 0 else sharding.sessions[shard]()
+
+
+_timezones = {}
+_timezones_loaded = float("-inf")
+
+
+def users_by_timezone() -> Dict[str, List[int]]:
+    """{timezone: user ids}, each user's timezone being that of their first baseline row (as the nightly job)."""
+    global _timezones, _timezones_loaded
+    if clock.monotonic() - _timezones_loaded < WARM_TIMEZONES_TTL:
+        return _timezones
+
+    grouped = {}
+    for shard in range(sharding.SHARD_COUNT):
+        with _read_session(shard) as db:
+            first_rows = db.query(func.min(BaselineSchedule.id)).group_by(BaselineSchedule.user_id)
+            for user_id, tz_name in db.query(BaselineSchedule.user_id, BaselineSchedule.user_timezone).filter(
+                    BaselineSchedule.id.in_(first_rows)):
+                grouped.setdefault(tz_name or "UTC", []).append(user_id)
+    _timezones, _timezones_loaded = grouped, clock.monotonic()
+    return grouped
+
+
+def warm(user_ids: List[int], log_date, generate: Callable[[int, object], bool]) -> Dict[str, int]:
+    """Loads the users' views for `log_date` into the cache, generating missing schedules (rate limited).
+
+    generate(user_id, log_date) creates one user's schedule and returns whether it did.
+    """
+    stats = {"users": 0, "loaded": 0, "generated": 0}
+    read_limiter = RateLimiter(WARM_USERS_PER_SECOND)
+    generate_limiter = RateLimiter(WARM_GENERATE_PER_SECOND)
+
+    for shard, shard_user_ids in sharding.group_by_shard(user_ids).items():
+        for start in range(0, len(shard_user_ids), WARM_BATCH):
+            batch = shard_user_ids[start:start + WARM_BATCH]
+            read_limiter.acquire(len(batch))
+            with _read_session(shard) as db:
+                views = dict(db.query(DailyScheduleView.user_id, DailyScheduleView.schedule).filter(
+                    DailyScheduleView.user_id.in_(batch),
+                    DailyScheduleView.log_date == log_date
+                ))
+            read_model.cache_put({(user_id, log_date): schedule for user_id, schedule in views.items()})
+            stats["loaded"] += len(views)
+            stats["users"] += len(batch)
+
+            # ✅ Missing schedules are generated on the primary (the commit writes the new view through to the cache)
+            for user_id in batch:
+                if user_id in views:
+                    continue
+                generate_limiter.acquire()
+                try:
+                    stats["generated"] += bool(generate(user_id, log_date))
+                except sharding.ShardMoving:
+                    pass  # picked up by the user's own first request instead
+
+    metrics.cache_warm_total.inc(stats["loaded"], result="loaded")
+    metrics.cache_warm_total.inc(stats["generated"], result="generated")
+    return stats
+
+
+def warm_upcoming_mornings(generate: Callable[[int, object], bool], now_utc: datetime = None) -> Dict[str, int]:
+    """One warmer pass: users in timezones whose morning starts shortly. Returns totals."""
+    now_utc = now_utc or datetime.now(pytz.utc)
+    log_date = (now_utc + timedelta(minutes=WARM_LEAD_MINUTES)).date()  # the UTC day they will read
+    by_timezone = users_by_timezone()
+    timezones = [tz for tz in by_timezone if due(tz, now_utc)]
+    user_ids = [uid for tz in timezones for uid in by_timezone[tz]]
+    stats = warm(user_ids, log_date, generate) if user_ids else {"users": 0, "loaded": 0, "generated": 0}
+    if user_ids:
+        print(f"✅ Warmed {stats['users']} users in {len(timezones)} timezones ({stats['generated']} schedules generated).")
+    return stats
@@ -0,0 +1,220 @@
+import json
+import os
+import zlib
+
+# ✅ Wire settings: compress bodies of at least COMPRESSION_MIN_BYTES (gzip, or brotli when installed)
+COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "5"))
+
+# Compact formats a client can ask for with the Accept header
+COMPACT_MEDIA_TYPE = "application/vnd.gradually.compact+json"
+MSGPACK_MEDIA_TYPES = ("application/msgpack", "application/x-msgpack")
+COMPRESSIBLE_TYPES = ("application/json", COMPACT_MEDIA_TYPE, "application/x-ndjson", "text/csv", "text/plain") + MSGPACK_MEDIA_TYPES
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _header(headers, name: bytes) -> str:
+    for key, value in headers:
+        if key.lower() == name:
+            return value.decode("latin-1")
+    return ""
+
+
+def _accepts(header: str):
+    """Tokens of an Accept / Accept-Encoding header, minus parameters and anything with q=0."""
+    tokens = []
+    for part in header.split(","):
+        token, *params = [p.strip() for p in part.split(";")]
+        if token and not any(p.replace(" ", "") in ("q=0", "q=0.0") for p in params):
+            tokens.append(token.lower())
+    return tokens
+
+
+def choose_encoding(accept_encoding: str):
+    accepted = _accepts(accept_encoding)
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+def choose_format(accept: str):
+    accepted = _accepts(accept)
+    if msgpack is not None and any(t in accepted for t in MSGPACK_MEDIA_TYPES):
+        return "msgpack"
+    if COMPACT_MEDIA_TYPE in accepted:
+        return "compact"
+    return None
+
+
+def compact(value):
+    """Replaces every list of same-keyed objects with {"$fields": [...], "$rows": [[...], ...]} (recursively)."""
+    if isinstance(value, list):
+        if value and all(isinstance(v, dict) for v in value):
+            fields = list(value[0])
+            if all(len(v) == len(fields) and all(f in v for f in fields) for v in value):
+                return {"$fields": fields, "$rows": [[compact(v[f]) for f in fields] for v in value]}
+        return [compact(v) for v in value]
+    if isinstance(value, dict):
+        return {k: compact(v) for k, v in value.items()}
+    return value
+
+
+class _Encoder:
+    def __init__(self, encoding):
+        self.encoding = encoding
+        if encoding == "br":
+            self._compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        else:
+            self._compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)  # wbits 31 = gzip container
+
+    def compress(self, chunk: bytes) -> bytes:
+        if self.encoding == "br":
+            return self._compressor.process(chunk)
+        return self._compressor.compress(chunk)
+
+    def flush(self) -> bytes:
+        """Emits everything compressed so far without ending the stream."""
+        if self.encoding == "br":
+            return self._compressor.flush()
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        if self.encoding == "br":
+            return self._compressor.finish()
+        return self._compressor.flush()
+
+
+def _set_header(headers, name: bytes, value: str):
+    headers[:] = [(k, v) for k, v in headers if k.lower() != name] + [(name, value.encode("latin-1"))]
+
+
+def _add_vary(headers, value: str):
+    vary = _header(headers, b"vary")
+    _set_header(headers, b"vary", f"{vary}, {value}" if vary else value)
+
+
+class CompactFormatMiddleware:
+    """ASGI middleware re-encoding JSON responses as the compact field-dictionary form or MessagePack on request.
+
+    Clients opt in with `Accept: application/vnd.gradually.compact+json` (or application/msgpack when the
+    msgpack package is installed); everyone else gets the usual JSON untouched. Streaming bodies pass through.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        fmt = choose_format(_header(scope.get("headers", ()), b"accept")) if scope["type"] == "http" else None
+        if fmt is None:
+            await self.app(scope, receive, send)
+            return
+
+        state = {"start": None, "passthrough": False}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                state["start"] = message
+                return
+            if message["type"] != "http.response.body" or state["passthrough"]:
+                await send(message)
+                return
+
+            start = state["start"]
+            headers = list(start.get("headers", ()))
+            if message.get("more_body") or not _header(headers, b"content-type").startswith("application/json"):
+                state["passthrough"] = True
+                await send(start)
+                await send(message)
+                return
+
+            payload = compact((orjson.loads if orjson else json.loads)(message.get("body", b"") or b"null"))
+            if fmt == "msgpack":
+                body, media_type = msgpack.packb(payload), MSGPACK_MEDIA_TYPES[0]
+            else:
+                body = orjson.dumps(payload) if orjson else json.dumps(payload, separators=(",", ":")).encode("utf-8")
+                media_type = COMPACT_MEDIA_TYPE
+
+            _set_header(headers, b"content-type", media_type)
+            _set_header(headers, b"content-length", str(len(body)))
+            _add_vary(headers, "Accept")
+            await send({**start, "headers": headers})
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, send_wrapper)
+
+
+class CompressionMiddleware:
+    """ASGI middleware applying negotiated brotli/gzip to compressible responses of at least `minimum_size` bytes.
+
+    Streaming bodies (export, NDJSON) are compressed chunk by chunk regardless of size; event streams and
+    responses that already carry a Content-Encoding are left alone.
+    """
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_BYTES):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        encoding = choose_encoding(_header(scope.get("headers", ()), b"accept-encoding")) if scope["type"] == "http" else None
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        state = {"start": None, "encoder": None, "passthrough": False}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                state["start"] = message
+                return
+            if message["type"] != "http.response.body" or state["passthrough"]:
+                await send(message)
+                return
+
+            body, more_body = message.get("body", b""), message.get("more_body", False)
+            encoder = state["encoder"]
+            if encoder is None:
+                start = state["start"]
+                headers = list(start.get("headers", ()))
+                content_type = _header(headers, b"content-type")
+                compressible = any(content_type.startswith(t) for t in COMPRESSIBLE_TYPES)
+                if not compressible or _header(headers, b"content-encoding") or (not more_body and len(body) < self.minimum_size):
+                    state["passthrough"] = True
+                    await send(start)
+                    await send(message)
+                    return
+
+                encoder = state["encoder"] = _Encoder(encoding)
+                _set_header(headers, b"content-encoding", encoding)
+                _add_vary(headers, "Accept-Encoding")
+                if more_body:
+                    headers = [(k, v) for k, v in headers if k.lower() != b"content-length"]
+                else:
+                    body = encoder.compress(body) + encoder.finish()
+                    _set_header(headers, b"content-length", str(len(body)))
+                    await send({**start, "headers": headers})
+                    await send({"type": "http.response.body", "body": body})
+                    return
+                await send({**start, "headers": headers})
+
+            chunk = encoder.compress(body)
+            chunk += encoder.flush() if more_body else encoder.finish()  # ✅ sync flush so streamed chunks go out as they come
+            await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+        await self.app(scope, receive, send_wrapper)
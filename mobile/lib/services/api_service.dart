@@ -4,6 +4,37 @@ import 'package:http/http.dart' as http;
 class ApiService {
   static const String baseUrl = "http://127.0.0.1:8000"; // Change this for deployment
 
+  // Compact wire format: lists of objects arrive as {"$fields": [...], "$rows": [[...]]}.
+  // gzip is negotiated automatically by the HTTP client.
+  static const String compactMediaType = "application/vnd.gradually.compact+json";
+
+  // Expands compact tables back into lists of maps (recursively)
+  static dynamic expandCompact(dynamic value) {
+    if (value is Map) {
+      if (value.containsKey(r"$fields") && value.containsKey(r"$rows")) {
+        final fields = List<String>.from(value[r"$fields"]);
+        return (value[r"$rows"] as List).map((row) {
+          final cells = row as List;
+          return {for (var i = 0; i < fields.length; i++) fields[i]: expandCompact(cells[i])};
+        }).toList();
+      }
+      return value.map((key, v) => MapEntry(key, expandCompact(v)));
+    }
+    if (value is List) {
+      return value.map(expandCompact).toList();
+    }
+    return value;
+  }
+
+  // GET requesting the compact format; returns the decoded, expanded JSON body
+  static Future<dynamic> _getCompact(String path) async {
+    final response = await http.get(Uri.parse("$baseUrl$path"), headers: {"Accept": compactMediaType});
+    if (response.statusCode != 200) {
+      throw Exception("Request to $path failed (${response.statusCode})");
+    }
+    return expandCompact(json.decode(utf8.decode(response.bodyBytes)));
+  }
+
   // Fetch habit adjustments
   static Future<List<dynamic>> fetchHabitAdjustments(int userId) async {
     final response = await http.get(Uri.parse("$baseUrl/adjust_habits/$userId"));
@@ -45,4 +76,62 @@ class ApiService {
       throw Exception("Failed to load upcoming tasks");
     }
   }
-}
\ No newline at end of file
+
+  // Fetch a multi-day schedule window (columnar payload)
+  static Future<Map<String, dynamic>> fetchScheduleRange(int userId, DateTime start, DateTime end, {bool includeSummary = false}) async {
+    String fmt(DateTime d) => d.toIso8601String().substring(0, 10);
+    final response = await http.get(Uri.parse(
+        "$baseUrl/daily_schedule/$userId/range?start_date=${fmt(start)}&end_date=${fmt(end)}&include_summary=$includeSummary"));
+
+    if (response.statusCode == 200) {
+      return Map<String, dynamic>.from(json.decode(response.body));
+    } else {
+      throw Exception("Failed to load schedule range");
+    }
+  }
+
+  // Accept or reject several habit adjustments at once
+  static Future<List<dynamic>> respondToHabitAdjustments(int userId, Map<String, String> decisions) async {
+    final response = await http.post(
+      Uri.parse("$baseUrl/ai/habit_adjustments/respond_batch/$userId"),
+      headers: {"Content-Type": "application/json"},
+      body: json.encode({
+        "responses": decisions.entries.map((e) => {"habit": e.key, "status": e.value}).toList()
+      }),
+    );
+
+    if (response.statusCode == 200) {
+      return json.decode(response.body)['results'];
+    } else {
+      throw Exception("Failed to submit habit responses");
+    }
+  }
+
+  // Fetch today's schedule (compact wire format)
+  static Future<Map<String, dynamic>> fetchDailySchedule(int userId) async {
+    return Map<String, dynamic>.from(await _getCompact("/daily_schedule/$userId"));
+  }
+
+  // Fetch the schedule adjustment history (compact wire format)
+  static Future<List<dynamic>> fetchScheduleAdjustments(int userId) async {
+    final body = await _getCompact("/schedule_adjustments/$userId");
+    return body['adjustments'] ?? [];
+  }
+
+  // Server-pushed events (schedule_generated, tasks_logged, habit_adjustments, schedule_updated)
+  // over SSE; listen instead of polling the endpoints above.
+  static Stream<Map<String, dynamic>> scheduleUpdates(int userId) async* {
+    final client = http.Client();
+    try {
+      final response = await client.send(http.Request("GET", Uri.parse("$baseUrl/events/$userId")));
+      final lines = response.stream.transform(utf8.decoder).transform(const LineSplitter());
+      await for (final line in lines) {
+        if (line.startsWith("data: ")) {
+          yield Map<String, dynamic>.from(json.decode(line.substring(6)));
+        }
+      }
+    } finally {
+      client.close();
+    }
+  }
+}